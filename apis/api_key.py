@@ -0,0 +1,78 @@
+from typing import List
+from uuid import UUID
+
+from auth.dependencias import requerir_admin
+from auth.tokens import UsuarioToken
+from crud.api_key_crud import ApiKeyCRUD
+from database.config import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from schemas import ApiKeyCreada, ApiKeyCreate, ApiKeyResponse, RespuestaAPI
+from sqlalchemy.orm import Session
+from utils.error_handler import APIErrorHandler
+from utils.tiempos_servidor import RutaMedida
+
+# Solo los administradores (con token Bearer) administran las API keys
+router = APIRouter(
+    prefix="/api-keys",
+    tags=["api keys"],
+    dependencies=[Depends(requerir_admin)],
+    route_class=RutaMedida,
+)
+
+
+@router.post("/", response_model=ApiKeyCreada, status_code=status.HTTP_201_CREATED)
+async def crear_api_key(
+    datos: ApiKeyCreate,
+    usuario: UsuarioToken = Depends(requerir_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Crear una API key para un cliente de integración.
+
+    La clave completa solo se devuelve en esta respuesta.
+    """
+    try:
+        api_key, clave = ApiKeyCRUD(db).crear_api_key(
+            nombre=datos.nombre,
+            scopes=datos.scopes,
+            limite_por_minuto=datos.limite_por_minuto,
+            id_usuario_creacion=usuario.id,
+        )
+        return ApiKeyCreada(
+            **ApiKeyResponse.model_validate(api_key).model_dump(), clave=clave
+        )
+    except ValueError as e:
+        raise APIErrorHandler.validation_error(str(e))
+    except Exception as e:
+        raise APIErrorHandler.server_error("crear API key", str(e))
+
+
+@router.get("/", response_model=List[ApiKeyResponse])
+async def obtener_api_keys(
+    include_inactive: bool = Query(False, description="Incluir API keys revocadas"),
+    db: Session = Depends(get_db),
+):
+    """Obtener las API keys (sin sus secretos)."""
+    try:
+        return ApiKeyCRUD(db).obtener_api_keys(include_inactive=include_inactive)
+    except Exception as e:
+        raise APIErrorHandler.server_error("obtener API keys", str(e))
+
+
+@router.delete("/{api_key_id}", response_model=RespuestaAPI)
+async def revocar_api_key(
+    api_key_id: UUID,
+    usuario: UsuarioToken = Depends(requerir_admin),
+    db: Session = Depends(get_db),
+):
+    """Revocar una API key; deja de aceptarse en todos los procesos."""
+    try:
+        if not ApiKeyCRUD(db).revocar_api_key(
+            api_key_id, id_usuario_edicion=usuario.id
+        ):
+            raise APIErrorHandler.not_found_error("API key", str(api_key_id))
+        return RespuestaAPI(mensaje="API key revocada exitosamente", success=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise APIErrorHandler.server_error("revocar API key", str(e))
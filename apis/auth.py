@@ -1,65 +1,131 @@
-import os
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+from typing import Optional
 from uuid import UUID
 
+from auth.dependencias import obtener_usuario_opcional, requerir_admin
+from auth.limite_login import LoginBloqueadoError, ip_cliente, limite_login
+from auth.tokens import TOKEN_MINUTOS, UsuarioToken, crear_token_acceso
+from crud.refresh_token_crud import RefreshTokenCRUD
+from crud.token_revocado_crud import TokenRevocadoCRUD
 from crud.usuario_crud import UsuarioCRUD
 from database.config import get_db
-from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException, status
-from jose import jwt
-from schemas import LoginResponse, RespuestaAPI, UsuarioLogin, UsuarioResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from schemas import (
+    LoginResponse,
+    RefreshTokenRequest,
+    RespuestaAPI,
+    UsuarioLogin,
+    UsuarioResponse,
+)
 from sqlalchemy.orm import Session
 from utils.error_handler import APIErrorHandler
+from utils.tiempos_servidor import RutaMedida
 
-load_dotenv()
+router = APIRouter(prefix="/auth", tags=["autenticación"], route_class=RutaMedida)
 
-SECRET_KEY = os.getenv("SECRET_KEY", "tu-secret-key-super-segura-cambiar-en-produccion")
-ALGORITHM = "HS256"
 
-router = APIRouter(prefix="/auth", tags=["autenticación"])
+def _respuesta_login(usuario, refresh_token: str) -> LoginResponse:
+    return LoginResponse(
+        access_token=crear_token_acceso(usuario),
+        token_type="bearer",
+        refresh_token=refresh_token,
+        expires_in=TOKEN_MINUTOS * 60,
+        user={
+            "id": str(usuario.id),
+            "email": usuario.email,
+            "nombre": usuario.nombre,
+            "nombre_usuario": usuario.nombre_usuario,
+            "es_admin": usuario.es_admin,
+            "activo": usuario.activo,
+        },
+    )
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login(login_data: UsuarioLogin, db: Session = Depends(get_db)):
+async def login(
+    login_data: UsuarioLogin, request: Request, db: Session = Depends(get_db)
+):
     """Autenticar un usuario con nombre de usuario/email y contraseña."""
+    ip = ip_cliente(request)
     try:
+        # Antes de calcular el hash de la contraseña
+        await limite_login.verificar(login_data.nombre_usuario, ip)
+
         usuario_crud = UsuarioCRUD(db)
         usuario = usuario_crud.autenticar_usuario(
             login_data.nombre_usuario, login_data.contraseña
         )
 
         if not usuario:
+            await limite_login.registrar_fallo(login_data.nombre_usuario, ip)
             raise APIErrorHandler.authentication_error(
                 "Credenciales incorrectas o usuario inactivo"
             )
 
-        expire = datetime.utcnow() + timedelta(minutes=30)
-        token_data = {
-            "sub": str(usuario.id),
-            "email": usuario.email,
-            "es_admin": usuario.es_admin,
-            "exp": expire,
-        }
-        access_token = jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
-
-        return LoginResponse(
-            access_token=access_token,
-            token_type="bearer",
-            user={
-                "id": str(usuario.id),
-                "email": usuario.email,
-                "nombre": usuario.nombre,
-                "nombre_usuario": usuario.nombre_usuario,
-                "es_admin": usuario.es_admin,
-                "activo": usuario.activo,
-            },
-        )
+        await limite_login.registrar_exito(login_data.nombre_usuario)
+        refresh_token = RefreshTokenCRUD(db).emitir_refresh_token(usuario.id)
+        return _respuesta_login(usuario, refresh_token)
+    except LoginBloqueadoError as e:
+        raise APIErrorHandler.rate_limit_error(e.espera, str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise APIErrorHandler.server_error("autenticar usuario", str(e))
 
 
+@router.post("/refresh", response_model=LoginResponse)
+async def renovar_token(datos: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """Canjear un token de renovación por un token de acceso y uno de renovación nuevos."""
+    try:
+        usuario, refresh_token = RefreshTokenCRUD(db).rotar_refresh_token(
+            datos.refresh_token
+        )
+        return _respuesta_login(usuario, refresh_token)
+    except ValueError as e:
+        raise APIErrorHandler.authentication_error(str(e))
+    except Exception as e:
+        raise APIErrorHandler.server_error("renovar token", str(e))
+
+
+@router.post("/logout", response_model=RespuestaAPI)
+async def cerrar_sesion(
+    datos: RefreshTokenRequest,
+    usuario_actual: Optional[UsuarioToken] = Depends(obtener_usuario_opcional),
+    db: Session = Depends(get_db),
+):
+    """Revocar el token de renovación de la sesión y el token de acceso enviado."""
+    try:
+        RefreshTokenCRUD(db).revocar_refresh_token(datos.refresh_token)
+        if usuario_actual is not None and usuario_actual.jti:
+            TokenRevocadoCRUD(db).revocar_token(
+                usuario_actual.jti,
+                datetime.fromtimestamp(usuario_actual.expira, timezone.utc),
+                id_usuario_creacion=usuario_actual.id,
+            )
+        return RespuestaAPI(mensaje="Sesión cerrada exitosamente", success=True)
+    except Exception as e:
+        raise APIErrorHandler.server_error("cerrar sesión", str(e))
+
+
+@router.post("/revocar/{usuario_id}", response_model=RespuestaAPI)
+async def revocar_tokens_usuario(
+    usuario_id: UUID,
+    administrador: UsuarioToken = Depends(requerir_admin),
+    db: Session = Depends(get_db),
+):
+    """Revocar todos los tokens de acceso y de renovación de un usuario."""
+    try:
+        TokenRevocadoCRUD(db).revocar_tokens_usuario(usuario_id, administrador.id)
+        RefreshTokenCRUD(db).revocar_tokens_usuario(usuario_id)
+        db.commit()
+        return RespuestaAPI(
+            mensaje="Tokens del usuario revocados exitosamente", success=True
+        )
+    except Exception as e:
+        db.rollback()
+        raise APIErrorHandler.server_error("revocar tokens", str(e))
+
+
 @router.post("/crear-admin", response_model=RespuestaAPI)
 async def crear_usuario_admin(db: Session = Depends(get_db)):
     """Crear usuario administrador por defecto."""
@@ -105,8 +171,25 @@ async def crear_usuario_admin(db: Session = Depends(get_db)):
 
 
 @router.get("/verificar/{usuario_id}", response_model=RespuestaAPI)
-async def verificar_usuario(usuario_id: UUID, db: Session = Depends(get_db)):
+async def verificar_usuario(
+    usuario_id: UUID,
+    usuario_actual: Optional[UsuarioToken] = Depends(obtener_usuario_opcional),
+    db: Session = Depends(get_db),
+):
     """Verificar si un usuario existe y está activo."""
+    # El token de un usuario ya acredita que existe y estaba activo al iniciar sesión
+    if usuario_actual is not None and usuario_actual.id == usuario_id:
+        return RespuestaAPI(
+            mensaje="Usuario verificado exitosamente",
+            success=True,
+            datos={
+                "usuario_id": str(usuario_actual.id),
+                "nombre": usuario_actual.nombre,
+                "email": usuario_actual.email,
+                "activo": True,
+                "es_admin": usuario_actual.es_admin,
+            },
+        )
     try:
         usuario_crud = UsuarioCRUD(db)
         usuario = usuario_crud.obtener_usuario(usuario_id)
@@ -3,23 +3,52 @@ from uuid import UUID
 
 from crud.cita_crud import CitaCRUD
 from database.config import get_db
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from database.replicas import get_read_db
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from schemas import CitaCreate, CitaResponse, CitaUpdate, RespuestaAPI
 from sqlalchemy.orm import Session
+from utils.cache_respuestas import cachear_respuesta
+from utils.condicional import (
+    ConflictoVersionError,
+    agregar_version,
+    responder_condicional,
+    respuesta_conflicto,
+    version_if_match,
+)
+from utils.tiempos_servidor import RutaMedida
 
-router = APIRouter(prefix="/citas", tags=["citas"])
+router = APIRouter(prefix="/citas", tags=["citas"], route_class=RutaMedida)
 
 
 @router.get("/", response_model=List[CitaResponse])
 async def obtener_citas(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(1000, ge=1, le=1000),
     include_inactive: bool = Query(False, description="Incluir citas inactivas"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
 ):
     """Obtener todas las citas con paginación y opción de incluir inactivas."""
     try:
         cita_crud = CitaCRUD(db)
+        no_modificado = responder_condicional(
+            request,
+            response,
+            cita_crud.version_citas(
+                include_inactive=include_inactive, skip=skip, limit=limit
+            ),
+        )
+        if no_modificado:
+            return no_modificado
         citas = cita_crud.obtener_citas(
             skip=skip, limit=limit, include_inactive=include_inactive
         )
@@ -34,10 +63,20 @@ async def obtener_citas(
 
 
 @router.get("/{cita_id}", response_model=CitaResponse)
-async def obtener_cita(cita_id: UUID, db: Session = Depends(get_db)):
+async def obtener_cita(
+    cita_id: UUID,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+):
     """Obtener una cita por ID."""
     try:
         cita_crud = CitaCRUD(db)
+        version = cita_crud.version_cita(cita_id)
+        if version is not None:
+            no_modificado = responder_condicional(request, response, version)
+            if no_modificado:
+                return no_modificado
         cita = cita_crud.obtener_cita(cita_id)
         if not cita:
             raise HTTPException(
@@ -54,7 +93,7 @@ async def obtener_cita(cita_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/paciente/{paciente_id}", response_model=List[CitaResponse])
-async def obtener_citas_por_paciente(paciente_id: UUID, db: Session = Depends(get_db)):
+async def obtener_citas_por_paciente(paciente_id: UUID, db: Session = Depends(get_read_db)):
     """Obtener citas por paciente."""
     try:
         cita_crud = CitaCRUD(db)
@@ -68,7 +107,8 @@ async def obtener_citas_por_paciente(paciente_id: UUID, db: Session = Depends(ge
 
 
 @router.get("/medico/{medico_id}", response_model=List[CitaResponse])
-async def obtener_citas_por_medico(medico_id: UUID, db: Session = Depends(get_db)):
+@cachear_respuesta(ttl=120, etiquetas=["citas", "citas:medico:{medico_id}"])
+async def obtener_citas_por_medico(medico_id: UUID, db: Session = Depends(get_read_db)):
     """Obtener citas por médico."""
     try:
         cita_crud = CitaCRUD(db)
@@ -82,7 +122,7 @@ async def obtener_citas_por_medico(medico_id: UUID, db: Session = Depends(get_db
 
 
 @router.get("/fecha/{fecha}", response_model=List[CitaResponse])
-async def obtener_citas_por_fecha(fecha: str, db: Session = Depends(get_db)):
+async def obtener_citas_por_fecha(fecha: str, db: Session = Depends(get_read_db)):
     """Obtener citas por fecha."""
     try:
         cita_crud = CitaCRUD(db)
@@ -96,7 +136,7 @@ async def obtener_citas_por_fecha(fecha: str, db: Session = Depends(get_db)):
 
 
 @router.get("/estado/{estado}", response_model=List[CitaResponse])
-async def obtener_citas_por_estado(estado: str, db: Session = Depends(get_db)):
+async def obtener_citas_por_estado(estado: str, db: Session = Depends(get_read_db)):
     """Obtener citas por estado."""
     try:
         cita_crud = CitaCRUD(db)
@@ -136,7 +176,11 @@ async def crear_cita(cita_data: CitaCreate, db: Session = Depends(get_db)):
 
 @router.put("/{cita_id}", response_model=CitaResponse)
 async def actualizar_cita(
-    cita_id: UUID, cita_data: CitaUpdate, db: Session = Depends(get_db)
+    cita_id: UUID,
+    cita_data: CitaUpdate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
 ):
     """Actualizar una cita existente."""
     try:
@@ -155,16 +199,21 @@ async def actualizar_cita(
         }
 
         if not campos_actualizacion and not cita_data.id_usuario_edicion:
+            agregar_version(response, cita_existente)
             return cita_existente
 
         cita_actualizada = cita_crud.actualizar_cita(
             cita_id,
             cita_data.id_usuario_edicion if cita_data.id_usuario_edicion else None,
+            version_esperada=version_if_match(request),
             **campos_actualizacion,
         )
+        agregar_version(response, cita_actualizada)
         return cita_actualizada
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, CitaResponse)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
@@ -3,25 +3,59 @@ from uuid import UUID
 
 from crud.enfermera_crud import EnfermeraCRUD
 from database.config import get_db
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from database.replicas import get_read_db
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from schemas import EnfermeraCreate, EnfermeraResponse, EnfermeraUpdate, RespuestaAPI
 from sqlalchemy.orm import Session
+from utils.condicional import (
+    ConflictoVersionError,
+    agregar_version,
+    responder_condicional,
+    respuesta_conflicto,
+    version_de,
+    version_if_match,
+)
+from utils.directorio_personal import omitir_cache
+from utils.tiempos_servidor import RutaMedida
 
-router = APIRouter(prefix="/enfermeras", tags=["enfermeras"])
+router = APIRouter(prefix="/enfermeras", tags=["enfermeras"], route_class=RutaMedida)
 
 
 @router.get("/", response_model=List[EnfermeraResponse])
 async def obtener_enfermeras(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(1000, ge=1, le=1000),
     include_inactive: bool = Query(False, description="Incluir enfermeras inactivas"),
     nombre: str = Query(None, description="Filtrar por nombre (búsqueda parcial)"),
     activo: bool = Query(None, description="Filtrar por estado activo/inactivo"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
 ):
     """Obtener todas las enfermeras con paginación, opción de incluir inactivas y filtros de búsqueda."""
     try:
         enfermera_crud = EnfermeraCRUD(db)
+        no_modificado = responder_condicional(
+            request,
+            response,
+            enfermera_crud.version_enfermeras(
+                include_inactive=include_inactive,
+                nombre=nombre,
+                activo=activo,
+                skip=skip,
+                limit=limit,
+            ),
+        )
+        if no_modificado:
+            return no_modificado
         enfermeras = enfermera_crud.obtener_enfermeras(
             skip=skip, 
             limit=limit, 
@@ -40,15 +74,39 @@ async def obtener_enfermeras(
 
 
 @router.get("/{enfermera_id}", response_model=EnfermeraResponse)
-async def obtener_enfermera(enfermera_id: UUID, db: Session = Depends(get_db)):
+async def obtener_enfermera(
+    enfermera_id: UUID,
+    request: Request,
+    response: Response,
+    sin_cache: bool = Depends(omitir_cache),
+    db: Session = Depends(get_read_db),
+):
     """Obtener una enfermera por ID."""
     try:
         enfermera_crud = EnfermeraCRUD(db)
-        enfermera = enfermera_crud.obtener_enfermera(enfermera_id)
+        version = enfermera_crud.version_enfermera(enfermera_id)
+        if version is not None:
+            no_modificado = responder_condicional(request, response, version)
+            if no_modificado:
+                return no_modificado
+        enfermera = enfermera_crud.obtener_del_directorio(
+            "id", enfermera_id, usar_cache=not sin_cache
+        )
+        if (
+            enfermera
+            and version is not None
+            and version_de(enfermera).etag != version.etag
+        ):
+            # El directorio tenía una copia de otra versión: se recarga
+            enfermera = enfermera_crud.obtener_del_directorio(
+                "id", enfermera_id, usar_cache=False
+            )
         if not enfermera:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Enfermera no encontrada"
             )
+        # El ETag es siempre el del registro devuelto
+        agregar_version(response, enfermera)
         return enfermera
     except HTTPException:
         raise
@@ -60,11 +118,17 @@ async def obtener_enfermera(enfermera_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/email/{email}", response_model=EnfermeraResponse)
-async def obtener_enfermera_por_email(email: str, db: Session = Depends(get_db)):
+async def obtener_enfermera_por_email(
+    email: str,
+    sin_cache: bool = Depends(omitir_cache),
+    db: Session = Depends(get_read_db),
+):
     """Obtener una enfermera por email."""
     try:
         enfermera_crud = EnfermeraCRUD(db)
-        enfermera = enfermera_crud.obtener_enfermera_por_email(email)
+        enfermera = enfermera_crud.obtener_del_directorio(
+            "email", email, usar_cache=not sin_cache
+        )
         if not enfermera:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Enfermera no encontrada"
@@ -81,12 +145,16 @@ async def obtener_enfermera_por_email(email: str, db: Session = Depends(get_db))
 
 @router.get("/licencia/{numero_licencia}", response_model=EnfermeraResponse)
 async def obtener_enfermera_por_licencia(
-    numero_licencia: str, db: Session = Depends(get_db)
+    numero_licencia: str,
+    sin_cache: bool = Depends(omitir_cache),
+    db: Session = Depends(get_read_db),
 ):
     """Obtener una enfermera por número de licencia."""
     try:
         enfermera_crud = EnfermeraCRUD(db)
-        enfermera = enfermera_crud.obtener_enfermera_por_licencia(numero_licencia)
+        enfermera = enfermera_crud.obtener_del_directorio(
+            "numero_licencia", numero_licencia, usar_cache=not sin_cache
+        )
         if not enfermera:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Enfermera no encontrada"
@@ -102,11 +170,17 @@ async def obtener_enfermera_por_licencia(
 
 
 @router.get("/turno/{turno}", response_model=List[EnfermeraResponse])
-async def obtener_enfermeras_por_turno(turno: str, db: Session = Depends(get_db)):
+async def obtener_enfermeras_por_turno(
+    turno: str,
+    sin_cache: bool = Depends(omitir_cache),
+    db: Session = Depends(get_read_db),
+):
     """Obtener enfermeras por turno."""
     try:
         enfermera_crud = EnfermeraCRUD(db)
-        enfermeras = enfermera_crud.obtener_enfermeras_por_turno(turno)
+        enfermeras = enfermera_crud.listar_por_turno_directorio(
+            turno, usar_cache=not sin_cache
+        )
         return enfermeras
     except Exception as e:
         raise HTTPException(
@@ -116,7 +190,7 @@ async def obtener_enfermeras_por_turno(turno: str, db: Session = Depends(get_db)
 
 
 @router.get("/buscar/{nombre}", response_model=List[EnfermeraResponse])
-async def buscar_enfermeras_por_nombre(nombre: str, db: Session = Depends(get_db)):
+async def buscar_enfermeras_por_nombre(nombre: str, db: Session = Depends(get_read_db)):
     """Buscar enfermeras por nombre (búsqueda parcial)."""
     try:
         enfermera_crud = EnfermeraCRUD(db)
@@ -159,7 +233,11 @@ async def crear_enfermera(
 
 @router.put("/{enfermera_id}", response_model=EnfermeraResponse)
 async def actualizar_enfermera(
-    enfermera_id: UUID, enfermera_data: EnfermeraUpdate, db: Session = Depends(get_db)
+    enfermera_id: UUID,
+    enfermera_data: EnfermeraUpdate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
 ):
     """Actualizar una enfermera existente."""
     try:
@@ -178,6 +256,7 @@ async def actualizar_enfermera(
         }
 
         if not campos_actualizacion and not enfermera_data.id_usuario_edicion:
+            agregar_version(response, enfermera_existente)
             return enfermera_existente
 
         enfermera_actualizada = enfermera_crud.actualizar_enfermera(
@@ -185,15 +264,19 @@ async def actualizar_enfermera(
             enfermera_data.id_usuario_edicion
             if enfermera_data.id_usuario_edicion
             else None,
+            version_esperada=version_if_match(request),
             **campos_actualizacion,
         )
         if not enfermera_actualizada:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Enfermera no encontrada"
             )
+        agregar_version(response, enfermera_actualizada)
         return enfermera_actualizada
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, EnfermeraResponse)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
@@ -1,25 +1,74 @@
-from typing import List
+import csv
+import io
+from datetime import date
+from typing import List, Optional
 from uuid import UUID
 
 from crud.factura_crud import FacturaCRUD
+from crud.factura_resumen_crud import FacturaResumenCRUD
 from database.config import get_db
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from schemas import FacturaCreate, FacturaResponse, FacturaUpdate, RespuestaAPI
+from database.replicas import en_primaria, get_read_db, leer_de_primaria
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import FileResponse, StreamingResponse
+from schemas import (
+    AntiguedadSaldosResponse,
+    ConciliacionResponse,
+    FacturaCreate,
+    FacturaResponse,
+    FacturaResumenResponse,
+    FacturaUpdate,
+    RespuestaAPI,
+)
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from utils.cache import cache
+from utils.cache_respuestas import cachear_respuesta
+from utils.condicional import (
+    ConflictoVersionError,
+    agregar_version,
+    responder_condicional,
+    respuesta_conflicto,
+    version_if_match,
+)
+from utils.pdf_facturas import datos_para_pdf, generar_zip_facturas, obtener_pdf_factura
+from utils.tiempos_servidor import RutaMedida
+from utils.timeout_sql import timeout_sql
 
-router = APIRouter(prefix="/facturas", tags=["facturas"])
+router = APIRouter(prefix="/facturas", tags=["facturas"], route_class=RutaMedida)
 
 
 @router.get("/", response_model=List[FacturaResponse])
 async def obtener_facturas(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(1000, ge=1, le=1000),
     include_inactive: bool = Query(False, description="Incluir facturas inactivas"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
 ):
     """Obtener todas las facturas con paginación y opción de incluir inactivas."""
     try:
         factura_crud = FacturaCRUD(db)
+        no_modificado = responder_condicional(
+            request,
+            response,
+            factura_crud.version_facturas(
+                include_inactive=include_inactive, skip=skip, limit=limit
+            ),
+        )
+        if no_modificado:
+            return no_modificado
         facturas = factura_crud.obtener_facturas(
             skip=skip, limit=limit, include_inactive=include_inactive
         )
@@ -33,11 +82,168 @@ async def obtener_facturas(
         )
 
 
+@router.get("/resumen", response_model=FacturaResumenResponse)
+async def obtener_resumen_facturas(
+    agrupacion: str = Query(
+        "mes", description="Agrupar por: dia, mes, estado o paciente"
+    ),
+    fecha_desde: Optional[date] = Query(None, description="Fecha de emisión inicial"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha de emisión final"),
+    paciente_id: Optional[UUID] = Query(None, description="Filtrar por paciente"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+):
+    """Obtener montos facturados, pendientes y pagados desde los acumulados."""
+    try:
+        resumen_crud = FacturaResumenCRUD(db)
+        items = resumen_crud.obtener_resumen(
+            agrupacion,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            paciente_id=paciente_id,
+            skip=skip,
+            limit=limit,
+        )
+        return FacturaResumenResponse(agrupacion=agrupacion, items=items)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener resumen de facturas: {str(e)}",
+        )
+
+
+@router.post("/resumen/recalcular", response_model=RespuestaAPI)
+@timeout_sql("exportacion")
+async def recalcular_resumen_facturas(db: Session = Depends(get_db)):
+    """Reconstruir los acumulados del resumen desde las facturas."""
+    try:
+        resultado = FacturaResumenCRUD(db).recalcular()
+        return RespuestaAPI(
+            mensaje="Resumen de facturas recalculado", success=True, datos=resultado
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al recalcular resumen de facturas: {str(e)}",
+        )
+
+
+@router.get("/antiguedad", response_model=AntiguedadSaldosResponse)
+@timeout_sql("exportacion")
+async def obtener_antiguedad_saldos(
+    despues_de: Optional[UUID] = Query(
+        None, description="Cursor: último paciente_id de la página anterior"
+    ),
+    limit: int = Query(1000, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+):
+    """Obtener saldos vencidos por tramos de antigüedad, por paciente y en total."""
+    try:
+        factura_crud = FacturaCRUD(db)
+        totales, items, siguiente = factura_crud.obtener_antiguedad_saldos(
+            despues_de=despues_de, limit=limit
+        )
+        return AntiguedadSaldosResponse(
+            totales=totales, items=items, siguiente_cursor=siguiente
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener antigüedad de saldos: {str(e)}",
+        )
+
+
+@router.get("/antiguedad/csv")
+@timeout_sql("exportacion")
+async def exportar_antiguedad_saldos_csv(db: Session = Depends(get_read_db)):
+    """Exportar la antigüedad de saldos en CSV, paginando internamente por cursor."""
+    columnas = [
+        "paciente_id",
+        "nombre",
+        "cantidad",
+        "dias_0_30",
+        "dias_31_60",
+        "dias_61_90",
+        "dias_90_mas",
+        "total",
+    ]
+
+    def generar():
+        buffer = io.StringIO()
+        escritor = csv.DictWriter(buffer, fieldnames=columnas)
+        escritor.writeheader()
+        factura_crud = FacturaCRUD(db)
+        cursor = None
+        totales_generales = None
+        while True:
+            totales, filas, cursor = factura_crud.obtener_antiguedad_saldos(
+                despues_de=cursor, limit=1000
+            )
+            if totales is not None:
+                totales_generales = totales
+            escritor.writerows(filas)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            if cursor is None:
+                break
+        if totales_generales is not None:
+            escritor.writerow({**totales_generales, "paciente_id": "TOTAL"})
+            yield buffer.getvalue()
+
+    return StreamingResponse(
+        generar(),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=antiguedad_saldos.csv"},
+    )
+
+
+@router.get("/pdf/mensual")
+@timeout_sql("exportacion")
+async def exportar_facturas_pdf_mensual(
+    periodo: str = Query(..., description="Periodo de emisión (AAAA-MM)"),
+    db: Session = Depends(get_read_db),
+):
+    """Descargar en un ZIP los PDF de las facturas emitidas en un periodo."""
+    try:
+        factura_crud = FacturaCRUD(db)
+        facturas = await run_in_threadpool(
+            factura_crud.obtener_facturas_periodo_con_detalles, periodo
+        )
+        lista_datos = [datos_para_pdf(factura) for factura in facturas]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al exportar facturas en PDF: {str(e)}",
+        )
+
+    return StreamingResponse(
+        generar_zip_facturas(lista_datos),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=facturas_{periodo}.zip"},
+    )
+
+
 @router.get("/{factura_id}", response_model=FacturaResponse)
-async def obtener_factura(factura_id: UUID, db: Session = Depends(get_db)):
+async def obtener_factura(
+    factura_id: UUID,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+):
     """Obtener una factura por ID."""
     try:
         factura_crud = FacturaCRUD(db)
+        version = factura_crud.version_factura(factura_id)
+        if version is not None:
+            no_modificado = responder_condicional(request, response, version)
+            if no_modificado:
+                return no_modificado
         factura = factura_crud.obtener_factura(factura_id)
         if not factura:
             raise HTTPException(
@@ -53,14 +259,73 @@ async def obtener_factura(factura_id: UUID, db: Session = Depends(get_db)):
         )
 
 
+@router.get("/{factura_id}/pdf")
+@timeout_sql("exportacion")
+async def obtener_factura_pdf(
+    factura_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Obtener una factura en PDF.
+
+    El PDF se genera una sola vez por versión de la factura y se guarda en
+    caché; el ETag permite a los clientes revalidar sin descargarlo de nuevo.
+    """
+    try:
+        factura_crud = FacturaCRUD(db)
+        factura = factura_crud.obtener_factura_con_detalles(factura_id)
+        if not factura:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Factura no encontrada"
+            )
+        ruta, clave = await obtener_pdf_factura(datos_para_pdf(factura))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al generar PDF de la factura: {str(e)}",
+        )
+
+    etag = f'"{clave}"'
+    cabeceras = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [e.strip() for e in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+    return FileResponse(
+        ruta,
+        media_type="application/pdf",
+        filename=f"{factura.numero_factura}.pdf",
+        headers=cabeceras,
+    )
+
+
 @router.get("/numero/{numero_factura}", response_model=FacturaResponse)
 async def obtener_factura_por_numero(
-    numero_factura: str, db: Session = Depends(get_db)
+    numero_factura: str, request: Request, db: Session = Depends(get_read_db)
 ):
     """Obtener una factura por número de factura."""
     try:
-        factura_crud = FacturaCRUD(db)
-        factura = factura_crud.obtener_factura_por_numero(numero_factura)
+
+        def serializar(primaria: Session):
+            factura = FacturaCRUD(primaria).obtener_factura_por_numero(numero_factura)
+            if not factura:
+                return None
+            return FacturaResponse.model_validate(factura).model_dump(mode="json")
+
+        def cargar():
+            # La caché es compartida: una réplica atrasada la dejaría vieja
+            return en_primaria(db, serializar)
+
+        if leer_de_primaria(request):
+            # El cliente acaba de escribir: debe ver su cambio, no la caché
+            factura = cargar()
+        else:
+            factura = await cache.aobtener_o_calcular(
+                f"factura:numero:{numero_factura}",
+                [f"factura:{numero_factura}"],
+                cargar,
+            )
         if not factura:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Factura no encontrada"
@@ -77,7 +342,7 @@ async def obtener_factura_por_numero(
 
 @router.get("/paciente/{paciente_id}", response_model=List[FacturaResponse])
 async def obtener_facturas_por_paciente(
-    paciente_id: UUID, db: Session = Depends(get_db)
+    paciente_id: UUID, db: Session = Depends(get_read_db)
 ):
     """Obtener facturas por paciente."""
     try:
@@ -92,7 +357,7 @@ async def obtener_facturas_por_paciente(
 
 
 @router.get("/estado/{estado}", response_model=List[FacturaResponse])
-async def obtener_facturas_por_estado(estado: str, db: Session = Depends(get_db)):
+async def obtener_facturas_por_estado(estado: str, db: Session = Depends(get_read_db)):
     """Obtener facturas por estado."""
     try:
         factura_crud = FacturaCRUD(db)
@@ -106,7 +371,7 @@ async def obtener_facturas_por_estado(estado: str, db: Session = Depends(get_db)
 
 
 @router.get("/fecha/{fecha}", response_model=List[FacturaResponse])
-async def obtener_facturas_por_fecha(fecha: str, db: Session = Depends(get_db)):
+async def obtener_facturas_por_fecha(fecha: str, db: Session = Depends(get_read_db)):
     """Obtener facturas por fecha de emisión."""
     try:
         factura_crud = FacturaCRUD(db)
@@ -120,7 +385,8 @@ async def obtener_facturas_por_fecha(fecha: str, db: Session = Depends(get_db)):
 
 
 @router.get("/vencidas/lista", response_model=List[FacturaResponse])
-async def obtener_facturas_vencidas(db: Session = Depends(get_db)):
+@cachear_respuesta(ttl=60, etiquetas=["facturas"])
+async def obtener_facturas_vencidas(db: Session = Depends(get_read_db)):
     """Obtener facturas vencidas."""
     try:
         factura_crud = FacturaCRUD(db)
@@ -165,7 +431,11 @@ async def crear_factura(factura_data: FacturaCreate, db: Session = Depends(get_d
 
 @router.put("/{factura_id}", response_model=FacturaResponse)
 async def actualizar_factura(
-    factura_id: UUID, factura_data: FacturaUpdate, db: Session = Depends(get_db)
+    factura_id: UUID,
+    factura_data: FacturaUpdate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
 ):
     """Actualizar una factura existente."""
     try:
@@ -184,6 +454,7 @@ async def actualizar_factura(
         }
 
         if not campos_actualizacion and not factura_data.id_usuario_edicion:
+            agregar_version(response, factura_existente)
             return factura_existente
 
         factura_actualizada = factura_crud.actualizar_factura(
@@ -193,11 +464,15 @@ async def actualizar_factura(
                 if factura_data.id_usuario_edicion
                 else None
             ),
+            version_esperada=version_if_match(request),
             **campos_actualizacion,
         )
+        agregar_version(response, factura_actualizada)
         return factura_actualizada
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, FacturaResponse)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
@@ -253,7 +528,37 @@ async def cancelar_factura(
         )
 
 
+@router.post("/conciliacion", response_model=ConciliacionResponse)
+@timeout_sql("exportacion")
+async def conciliar_pagos(
+    archivo: UploadFile = File(..., description="Extracto bancario CSV (numero_factura, monto)"),
+    id_usuario_edicion: Optional[UUID] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """Conciliar un extracto bancario y marcar como pagadas las facturas cubiertas."""
+    try:
+        factura_crud = FacturaCRUD(db)
+        lineas = io.TextIOWrapper(archivo.file, encoding="utf-8-sig", newline="")
+        return await run_in_threadpool(
+            factura_crud.conciliar_pagos, lineas, id_usuario_edicion
+        )
+    except UnicodeDecodeError:
+        # Antes que ValueError, de la que es subclase
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo debe estar codificado en UTF-8",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al conciliar pagos: {str(e)}",
+        )
+
+
 @router.post("/marcar-vencidas", response_model=RespuestaAPI)
+@timeout_sql("exportacion")
 async def marcar_facturas_vencidas(db: Session = Depends(get_db)):
     """Marcar facturas vencidas automáticamente."""
     try:
@@ -3,6 +3,7 @@ from uuid import UUID
 
 from crud.factura_detalle_crud import FacturaDetalleCRUD
 from database.config import get_db
+from database.replicas import get_read_db
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from schemas import (
     FacturaDetalleCreate,
@@ -11,8 +12,14 @@ from schemas import (
     RespuestaAPI,
 )
 from sqlalchemy.orm import Session
+from utils.condicional import ConflictoVersionError, respuesta_conflicto
+from utils.tiempos_servidor import RutaMedida
 
-router = APIRouter(prefix="/factura-detalles", tags=["factura-detalles"])
+router = APIRouter(
+    prefix="/factura-detalles",
+    tags=["factura-detalles"],
+    route_class=RutaMedida,
+)
 
 
 @router.get("/", response_model=List[FacturaDetalleResponse])
@@ -20,7 +27,7 @@ async def obtener_detalles(
     skip: int = Query(0, ge=0),
     limit: int = Query(1000, ge=1, le=1000),
     include_inactive: bool = Query(False, description="Incluir detalles inactivos"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Obtener todos los detalles de factura con paginación y opción de incluir inactivos."""
     try:
@@ -39,7 +46,7 @@ async def obtener_detalles(
 
 
 @router.get("/{detalle_id}", response_model=FacturaDetalleResponse)
-async def obtener_detalle(detalle_id: UUID, db: Session = Depends(get_db)):
+async def obtener_detalle(detalle_id: UUID, db: Session = Depends(get_read_db)):
     """Obtener un detalle de factura por ID."""
     try:
         detalle_crud = FacturaDetalleCRUD(db)
@@ -60,7 +67,7 @@ async def obtener_detalle(detalle_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/factura/{factura_id}", response_model=List[FacturaDetalleResponse])
-async def obtener_detalles_por_factura(factura_id: UUID, db: Session = Depends(get_db)):
+async def obtener_detalles_por_factura(factura_id: UUID, db: Session = Depends(get_read_db)):
     """Obtener detalles por factura."""
     try:
         detalle_crud = FacturaDetalleCRUD(db)
@@ -140,6 +147,8 @@ async def actualizar_detalle(
         return detalle_actualizado
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, FacturaDetalleResponse)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
@@ -0,0 +1,175 @@
+from typing import List, Optional
+from uuid import UUID
+
+from crud.facturacion_crud import FacturacionCRUD, ejecutar_corrida_facturacion
+from crud.tarifa_crud import TarifaCRUD
+from database.config import get_db
+from database.replicas import get_read_db
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from schemas import (
+    CorridaFacturacionResponse,
+    RespuestaAPI,
+    TarifaCreate,
+    TarifaResponse,
+    TarifaUpdate,
+)
+from sqlalchemy.orm import Session
+from utils.condicional import ConflictoVersionError, respuesta_conflicto
+from utils.tiempos_servidor import RutaMedida
+
+router = APIRouter(prefix="/facturacion", tags=["facturación"], route_class=RutaMedida)
+
+
+@router.post(
+    "/corridas",
+    response_model=CorridaFacturacionResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def ejecutar_corrida(
+    background_tasks: BackgroundTasks,
+    periodo: str = Query(..., description="Periodo a facturar (AAAA-MM)"),
+    id_usuario_creacion: Optional[UUID] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Iniciar la corrida de facturación de un periodo.
+
+    La corrida se ejecuta en segundo plano; consultar su avance con
+    GET /facturacion/corridas/{periodo}. Repetirla es seguro: una corrida
+    completada no genera nada nuevo y una interrumpida continúa donde quedó.
+    """
+    try:
+        facturacion_crud = FacturacionCRUD(db)
+        corrida = facturacion_crud.iniciar_corrida(periodo, id_usuario_creacion)
+        if corrida.estado != "completada":
+            background_tasks.add_task(
+                ejecutar_corrida_facturacion, periodo, id_usuario_creacion
+            )
+        return corrida
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al iniciar corrida de facturación: {str(e)}",
+        )
+
+
+@router.get("/corridas/{periodo}", response_model=CorridaFacturacionResponse)
+async def obtener_corrida(periodo: str, db: Session = Depends(get_read_db)):
+    """Obtener el estado de la corrida de facturación de un periodo."""
+    try:
+        corrida = FacturacionCRUD(db).obtener_corrida(periodo)
+        if not corrida:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Corrida no encontrada"
+            )
+        return corrida
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener corrida de facturación: {str(e)}",
+        )
+
+
+@router.get("/tarifas", response_model=List[TarifaResponse])
+async def obtener_tarifas(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=1000),
+    include_inactive: bool = Query(False, description="Incluir tarifas inactivas"),
+    db: Session = Depends(get_read_db),
+):
+    """Obtener todas las tarifas."""
+    try:
+        tarifa_crud = TarifaCRUD(db)
+        return tarifa_crud.obtener_tarifas(
+            skip=skip, limit=limit, include_inactive=include_inactive
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener tarifas: {str(e)}",
+        )
+
+
+@router.post(
+    "/tarifas", response_model=TarifaResponse, status_code=status.HTTP_201_CREATED
+)
+async def crear_tarifa(tarifa_data: TarifaCreate, db: Session = Depends(get_db)):
+    """Crear una nueva tarifa."""
+    try:
+        tarifa_crud = TarifaCRUD(db)
+        return tarifa_crud.crear_tarifa(
+            codigo=tarifa_data.codigo,
+            descripcion=tarifa_data.descripcion,
+            tipo_origen=tarifa_data.tipo_origen,
+            precio_unitario=tarifa_data.precio_unitario,
+            id_usuario_creacion=tarifa_data.id_usuario_creacion,
+            especialidad=tarifa_data.especialidad,
+            porcentaje_impuesto=tarifa_data.porcentaje_impuesto,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al crear tarifa: {str(e)}",
+        )
+
+
+@router.put("/tarifas/{tarifa_id}", response_model=TarifaResponse)
+async def actualizar_tarifa(
+    tarifa_id: UUID, tarifa_data: TarifaUpdate, db: Session = Depends(get_db)
+):
+    """Actualizar una tarifa existente."""
+    try:
+        tarifa_crud = TarifaCRUD(db)
+        campos_actualizacion = {
+            k: v
+            for k, v in tarifa_data.dict(exclude={"id_usuario_edicion"}).items()
+            if v is not None
+        }
+        tarifa = tarifa_crud.actualizar_tarifa(
+            tarifa_id, tarifa_data.id_usuario_edicion, **campos_actualizacion
+        )
+        if not tarifa:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Tarifa no encontrada"
+            )
+        return tarifa
+    except HTTPException:
+        raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, TarifaResponse)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al actualizar tarifa: {str(e)}",
+        )
+
+
+@router.patch(
+    "/tarifas/{tarifa_id}/inactivar",
+    response_model=RespuestaAPI,
+    status_code=status.HTTP_200_OK,
+)
+async def inactivar_tarifa(tarifa_id: UUID, db: Session = Depends(get_db)):
+    """Inactivar una tarifa (soft delete)."""
+    try:
+        tarifa_crud = TarifaCRUD(db)
+        if not tarifa_crud.inactivar_tarifa(tarifa_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Tarifa no encontrada"
+            )
+        return RespuestaAPI(mensaje="Tarifa inactivada exitosamente", success=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al inactivar tarifa: {str(e)}",
+        )
@@ -3,6 +3,7 @@ from uuid import UUID
 
 from crud.historial_entrada_crud import HistorialEntradaCRUD
 from database.config import get_db
+from database.replicas import get_read_db
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from schemas import (
     HistorialEntradaCreate,
@@ -11,8 +12,14 @@ from schemas import (
     RespuestaAPI,
 )
 from sqlalchemy.orm import Session
+from utils.condicional import ConflictoVersionError, respuesta_conflicto
+from utils.tiempos_servidor import RutaMedida
 
-router = APIRouter(prefix="/historial-entradas", tags=["historial-entradas"])
+router = APIRouter(
+    prefix="/historial-entradas",
+    tags=["historial-entradas"],
+    route_class=RutaMedida,
+)
 
 
 @router.get("/", response_model=List[HistorialEntradaResponse])
@@ -20,7 +27,7 @@ async def obtener_entradas(
     skip: int = Query(0, ge=0),
     limit: int = Query(1000, ge=1, le=1000),
     include_inactive: bool = Query(False, description="Incluir entradas inactivas"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Obtener todas las entradas del historial con paginación y opción de incluir inactivas."""
     try:
@@ -39,7 +46,7 @@ async def obtener_entradas(
 
 
 @router.get("/{entrada_id}", response_model=HistorialEntradaResponse)
-async def obtener_entrada(entrada_id: UUID, db: Session = Depends(get_db)):
+async def obtener_entrada(entrada_id: UUID, db: Session = Depends(get_read_db)):
     """Obtener una entrada del historial por ID."""
     try:
         entrada_crud = HistorialEntradaCRUD(db)
@@ -61,7 +68,7 @@ async def obtener_entrada(entrada_id: UUID, db: Session = Depends(get_db)):
 
 @router.get("/historial/{historial_id}", response_model=List[HistorialEntradaResponse])
 async def obtener_entradas_por_historial(
-    historial_id: UUID, db: Session = Depends(get_db)
+    historial_id: UUID, db: Session = Depends(get_read_db)
 ):
     """Obtener entradas por historial médico."""
     try:
@@ -76,7 +83,7 @@ async def obtener_entradas_por_historial(
 
 
 @router.get("/medico/{medico_id}", response_model=List[HistorialEntradaResponse])
-async def obtener_entradas_por_medico(medico_id: UUID, db: Session = Depends(get_db)):
+async def obtener_entradas_por_medico(medico_id: UUID, db: Session = Depends(get_read_db)):
     """Obtener entradas por médico."""
     try:
         entrada_crud = HistorialEntradaCRUD(db)
@@ -91,7 +98,7 @@ async def obtener_entradas_por_medico(medico_id: UUID, db: Session = Depends(get
 
 @router.get("/buscar/{diagnostico}", response_model=List[HistorialEntradaResponse])
 async def buscar_entradas_por_diagnostico(
-    diagnostico: str, db: Session = Depends(get_db)
+    diagnostico: str, db: Session = Depends(get_read_db)
 ):
     """Buscar entradas por diagnóstico (búsqueda parcial)."""
     try:
@@ -175,6 +182,8 @@ async def actualizar_entrada(
         return entrada_actualizada
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, HistorialEntradaResponse)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
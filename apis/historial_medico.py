@@ -3,7 +3,16 @@ from uuid import UUID
 
 from crud.historial_medico_crud import HistorialMedicoCRUD
 from database.config import get_db
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from database.replicas import en_primaria, get_read_db, leer_de_primaria
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from schemas import (
     HistorialMedicoCreate,
     HistorialMedicoResponse,
@@ -11,20 +20,44 @@ from schemas import (
     RespuestaAPI,
 )
 from sqlalchemy.orm import Session
+from utils.cache import cache
+from utils.condicional import (
+    ConflictoVersionError,
+    agregar_version,
+    responder_condicional,
+    respuesta_conflicto,
+    version_if_match,
+)
+from utils.tiempos_servidor import RutaMedida
 
-router = APIRouter(prefix="/historiales-medicos", tags=["historiales-medicos"])
+router = APIRouter(
+    prefix="/historiales-medicos",
+    tags=["historiales-medicos"],
+    route_class=RutaMedida,
+)
 
 
 @router.get("/", response_model=List[HistorialMedicoResponse])
 async def obtener_historiales(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(1000, ge=1, le=1000),
     include_inactive: bool = Query(False, description="Incluir historiales inactivos"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
 ):
     """Obtener todos los historiales médicos con paginación y opción de incluir inactivos."""
     try:
         historial_crud = HistorialMedicoCRUD(db)
+        no_modificado = responder_condicional(
+            request,
+            response,
+            historial_crud.version_historiales(
+                include_inactive=include_inactive, skip=skip, limit=limit
+            ),
+        )
+        if no_modificado:
+            return no_modificado
         historiales = historial_crud.obtener_historiales(
             skip=skip, limit=limit, include_inactive=include_inactive
         )
@@ -39,10 +72,20 @@ async def obtener_historiales(
 
 
 @router.get("/{historial_id}", response_model=HistorialMedicoResponse)
-async def obtener_historial(historial_id: UUID, db: Session = Depends(get_db)):
+async def obtener_historial(
+    historial_id: UUID,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+):
     """Obtener un historial médico por ID."""
     try:
         historial_crud = HistorialMedicoCRUD(db)
+        version = historial_crud.version_historial(historial_id)
+        if version is not None:
+            no_modificado = responder_condicional(request, response, version)
+            if no_modificado:
+                return no_modificado
         historial = historial_crud.obtener_historial(historial_id)
         if not historial:
             raise HTTPException(
@@ -61,7 +104,7 @@ async def obtener_historial(historial_id: UUID, db: Session = Depends(get_db)):
 
 @router.get("/numero/{numero_historial}", response_model=HistorialMedicoResponse)
 async def obtener_historial_por_numero(
-    numero_historial: str, db: Session = Depends(get_db)
+    numero_historial: str, db: Session = Depends(get_read_db)
 ):
     """Obtener un historial médico por número de historial."""
     try:
@@ -84,12 +127,34 @@ async def obtener_historial_por_numero(
 
 @router.get("/paciente/{paciente_id}", response_model=HistorialMedicoResponse)
 async def obtener_historial_por_paciente(
-    paciente_id: UUID, db: Session = Depends(get_db)
+    paciente_id: UUID, request: Request, db: Session = Depends(get_read_db)
 ):
     """Obtener historial médico por paciente."""
     try:
-        historial_crud = HistorialMedicoCRUD(db)
-        historial = historial_crud.obtener_historial_por_paciente(paciente_id)
+
+        def serializar(primaria: Session):
+            historial = HistorialMedicoCRUD(primaria).obtener_historial_por_paciente(
+                paciente_id
+            )
+            if not historial:
+                return None
+            return HistorialMedicoResponse.model_validate(historial).model_dump(
+                mode="json"
+            )
+
+        def cargar():
+            # La caché es compartida: una réplica atrasada la dejaría vieja
+            return en_primaria(db, serializar)
+
+        if leer_de_primaria(request):
+            # El cliente acaba de escribir: debe ver su cambio, no la caché
+            historial = cargar()
+        else:
+            historial = await cache.aobtener_o_calcular(
+                f"historial:paciente:{paciente_id}",
+                [f"historiales:paciente:{paciente_id}"],
+                cargar,
+            )
         if not historial:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -106,7 +171,7 @@ async def obtener_historial_por_paciente(
 
 
 @router.get("/estado/{estado}", response_model=List[HistorialMedicoResponse])
-async def obtener_historiales_por_estado(estado: str, db: Session = Depends(get_db)):
+async def obtener_historiales_por_estado(estado: str, db: Session = Depends(get_read_db)):
     """Obtener historiales médicos por estado."""
     try:
         historial_crud = HistorialMedicoCRUD(db)
@@ -120,7 +185,7 @@ async def obtener_historiales_por_estado(estado: str, db: Session = Depends(get_
 
 
 @router.get("/buscar/{numero}", response_model=List[HistorialMedicoResponse])
-async def buscar_historiales_por_numero(numero: str, db: Session = Depends(get_db)):
+async def buscar_historiales_por_numero(numero: str, db: Session = Depends(get_read_db)):
     """Buscar historiales médicos por número (búsqueda parcial)."""
     try:
         historial_crud = HistorialMedicoCRUD(db)
@@ -166,6 +231,8 @@ async def crear_historial(
 async def actualizar_historial(
     historial_id: UUID,
     historial_data: HistorialMedicoUpdate,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
 ):
     """Actualizar un historial médico existente."""
@@ -186,6 +253,7 @@ async def actualizar_historial(
         }
 
         if not campos_actualizacion and not historial_data.id_usuario_edicion:
+            agregar_version(response, historial_existente)
             return historial_existente
 
         historial_actualizado = historial_crud.actualizar_historial(
@@ -195,11 +263,15 @@ async def actualizar_historial(
                 if historial_data.id_usuario_edicion
                 else None
             ),
+            version_esperada=version_if_match(request),
             **campos_actualizacion,
         )
+        agregar_version(response, historial_actualizado)
         return historial_actualizado
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, HistorialMedicoResponse)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
@@ -3,7 +3,16 @@ from uuid import UUID
 
 from crud.hospitalizacion_crud import HospitalizacionCRUD
 from database.config import get_db
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from database.replicas import get_read_db
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from schemas import (
     HospitalizacionCreate,
     HospitalizacionResponse,
@@ -11,20 +20,44 @@ from schemas import (
     RespuestaAPI,
 )
 from sqlalchemy.orm import Session
+from utils.cache_respuestas import cachear_respuesta
+from utils.condicional import (
+    ConflictoVersionError,
+    agregar_version,
+    responder_condicional,
+    respuesta_conflicto,
+    version_if_match,
+)
+from utils.tiempos_servidor import RutaMedida
 
-router = APIRouter(prefix="/hospitalizaciones", tags=["hospitalizaciones"])
+router = APIRouter(
+    prefix="/hospitalizaciones",
+    tags=["hospitalizaciones"],
+    route_class=RutaMedida,
+)
 
 
 @router.get("/", response_model=List[HospitalizacionResponse])
 async def obtener_hospitalizaciones(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(1000, ge=1, le=1000),
     include_inactive: bool = Query(False, description="Incluir hospitalizaciones inactivas"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
 ):
     """Obtener todas las hospitalizaciones con paginación y opción de incluir inactivas."""
     try:
         hospitalizacion_crud = HospitalizacionCRUD(db)
+        no_modificado = responder_condicional(
+            request,
+            response,
+            hospitalizacion_crud.version_hospitalizaciones(
+                include_inactive=include_inactive, skip=skip, limit=limit
+            ),
+        )
+        if no_modificado:
+            return no_modificado
         hospitalizaciones = hospitalizacion_crud.obtener_hospitalizaciones(
             skip=skip, limit=limit, include_inactive=include_inactive
         )
@@ -40,11 +73,19 @@ async def obtener_hospitalizaciones(
 
 @router.get("/{hospitalizacion_id}", response_model=HospitalizacionResponse)
 async def obtener_hospitalizacion(
-    hospitalizacion_id: UUID, db: Session = Depends(get_db)
+    hospitalizacion_id: UUID,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
 ):
     """Obtener una hospitalización por ID."""
     try:
         hospitalizacion_crud = HospitalizacionCRUD(db)
+        version = hospitalizacion_crud.version_hospitalizacion(hospitalizacion_id)
+        if version is not None:
+            no_modificado = responder_condicional(request, response, version)
+            if no_modificado:
+                return no_modificado
         hospitalizacion = hospitalizacion_crud.obtener_hospitalizacion(
             hospitalizacion_id
         )
@@ -65,7 +106,7 @@ async def obtener_hospitalizacion(
 
 @router.get("/paciente/{paciente_id}", response_model=List[HospitalizacionResponse])
 async def obtener_hospitalizaciones_por_paciente(
-    paciente_id: UUID, db: Session = Depends(get_db)
+    paciente_id: UUID, db: Session = Depends(get_read_db)
 ):
     """Obtener hospitalizaciones por paciente."""
     try:
@@ -83,7 +124,7 @@ async def obtener_hospitalizaciones_por_paciente(
 
 @router.get("/medico/{medico_id}", response_model=List[HospitalizacionResponse])
 async def obtener_hospitalizaciones_por_medico(
-    medico_id: UUID, db: Session = Depends(get_db)
+    medico_id: UUID, db: Session = Depends(get_read_db)
 ):
     """Obtener hospitalizaciones por médico responsable."""
     try:
@@ -100,8 +141,9 @@ async def obtener_hospitalizaciones_por_medico(
 
 
 @router.get("/estado/{estado}", response_model=List[HospitalizacionResponse])
+@cachear_respuesta(ttl=60, etiquetas=["hospitalizaciones"])
 async def obtener_hospitalizaciones_por_estado(
-    estado: str, db: Session = Depends(get_db)
+    estado: str, db: Session = Depends(get_read_db)
 ):
     """Obtener hospitalizaciones por estado."""
     try:
@@ -121,7 +163,7 @@ async def obtener_hospitalizaciones_por_estado(
     "/habitacion/{numero_habitacion}", response_model=List[HospitalizacionResponse]
 )
 async def obtener_hospitalizaciones_por_habitacion(
-    numero_habitacion: str, db: Session = Depends(get_db)
+    numero_habitacion: str, db: Session = Depends(get_read_db)
 ):
     """Obtener hospitalizaciones por número de habitación."""
     try:
@@ -177,6 +219,8 @@ async def crear_hospitalizacion(
 async def actualizar_hospitalizacion(
     hospitalizacion_id: UUID,
     hospitalizacion_data: HospitalizacionUpdate,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
 ):
     """Actualizar una hospitalización existente."""
@@ -201,6 +245,7 @@ async def actualizar_hospitalizacion(
         }
 
         if not campos_actualizacion and not hospitalizacion_data.id_usuario_edicion:
+            agregar_version(response, hospitalizacion_existente)
             return hospitalizacion_existente
 
         hospitalizacion_actualizada = hospitalizacion_crud.actualizar_hospitalizacion(
@@ -210,11 +255,15 @@ async def actualizar_hospitalizacion(
                 if hospitalizacion_data.id_usuario_edicion
                 else None
             ),
+            version_esperada=version_if_match(request),
             **campos_actualizacion,
         )
+        agregar_version(response, hospitalizacion_actualizada)
         return hospitalizacion_actualizada
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, HospitalizacionResponse)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
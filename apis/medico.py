@@ -3,26 +3,61 @@ from uuid import UUID
 
 from crud.medico_crud import MedicoCRUD
 from database.config import get_db
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from database.replicas import get_read_db
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from schemas import MedicoCreate, MedicoResponse, MedicoUpdate, RespuestaAPI
 from sqlalchemy.orm import Session
+from utils.condicional import (
+    ConflictoVersionError,
+    agregar_version,
+    responder_condicional,
+    respuesta_conflicto,
+    version_de,
+    version_if_match,
+)
+from utils.directorio_personal import omitir_cache
+from utils.tiempos_servidor import RutaMedida
 
-router = APIRouter(prefix="/medicos", tags=["medicos"])
+router = APIRouter(prefix="/medicos", tags=["medicos"], route_class=RutaMedida)
 
 
 @router.get("/", response_model=List[MedicoResponse])
 async def obtener_medicos(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(1000, ge=1, le=1000),
     include_inactive: bool = Query(False, description="Incluir médicos inactivos"),
     nombre: str = Query(None, description="Filtrar por nombre (búsqueda parcial)"),
     especialidad: str = Query(None, description="Filtrar por especialidad (búsqueda parcial)"),
     activo: bool = Query(None, description="Filtrar por estado activo/inactivo"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
 ):
     """Obtener todos los médicos con paginación, opción de incluir inactivos y filtros de búsqueda."""
     try:
         medico_crud = MedicoCRUD(db)
+        no_modificado = responder_condicional(
+            request,
+            response,
+            medico_crud.version_medicos(
+                include_inactive=include_inactive,
+                nombre=nombre,
+                especialidad=especialidad,
+                activo=activo,
+                skip=skip,
+                limit=limit,
+            ),
+        )
+        if no_modificado:
+            return no_modificado
         medicos = medico_crud.obtener_medicos(
             skip=skip, 
             limit=limit, 
@@ -50,15 +85,35 @@ async def obtener_medicos(
 
 
 @router.get("/{medico_id}", response_model=MedicoResponse)
-async def obtener_medico(medico_id: UUID, db: Session = Depends(get_db)):
+async def obtener_medico(
+    medico_id: UUID,
+    request: Request,
+    response: Response,
+    sin_cache: bool = Depends(omitir_cache),
+    db: Session = Depends(get_read_db),
+):
     """Obtener un médico por ID."""
     try:
         medico_crud = MedicoCRUD(db)
-        medico = medico_crud.obtener_medico(medico_id)
+        version = medico_crud.version_medico(medico_id)
+        if version is not None:
+            no_modificado = responder_condicional(request, response, version)
+            if no_modificado:
+                return no_modificado
+        medico = medico_crud.obtener_del_directorio(
+            "id", medico_id, usar_cache=not sin_cache
+        )
+        if medico and version is not None and version_de(medico).etag != version.etag:
+            # El directorio tenía una copia de otra versión: se recarga
+            medico = medico_crud.obtener_del_directorio(
+                "id", medico_id, usar_cache=False
+            )
         if not medico:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Médico no encontrado"
             )
+        # El ETag es siempre el del registro devuelto
+        agregar_version(response, medico)
         return medico
     except HTTPException:
         raise
@@ -70,11 +125,17 @@ async def obtener_medico(medico_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/email/{email}", response_model=MedicoResponse)
-async def obtener_medico_por_email(email: str, db: Session = Depends(get_db)):
+async def obtener_medico_por_email(
+    email: str,
+    sin_cache: bool = Depends(omitir_cache),
+    db: Session = Depends(get_read_db),
+):
     """Obtener un médico por email."""
     try:
         medico_crud = MedicoCRUD(db)
-        medico = medico_crud.obtener_medico_por_email(email)
+        medico = medico_crud.obtener_del_directorio(
+            "email", email, usar_cache=not sin_cache
+        )
         if not medico:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Médico no encontrado"
@@ -91,12 +152,16 @@ async def obtener_medico_por_email(email: str, db: Session = Depends(get_db)):
 
 @router.get("/licencia/{numero_licencia}", response_model=MedicoResponse)
 async def obtener_medico_por_licencia(
-    numero_licencia: str, db: Session = Depends(get_db)
+    numero_licencia: str,
+    sin_cache: bool = Depends(omitir_cache),
+    db: Session = Depends(get_read_db),
 ):
     """Obtener un médico por número de licencia."""
     try:
         medico_crud = MedicoCRUD(db)
-        medico = medico_crud.obtener_medico_por_licencia(numero_licencia)
+        medico = medico_crud.obtener_del_directorio(
+            "numero_licencia", numero_licencia, usar_cache=not sin_cache
+        )
         if not medico:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Médico no encontrado"
@@ -113,12 +178,16 @@ async def obtener_medico_por_licencia(
 
 @router.get("/especialidad/{especialidad}", response_model=List[MedicoResponse])
 async def obtener_medicos_por_especialidad(
-    especialidad: str, db: Session = Depends(get_db)
+    especialidad: str,
+    sin_cache: bool = Depends(omitir_cache),
+    db: Session = Depends(get_read_db),
 ):
     """Obtener médicos por especialidad."""
     try:
         medico_crud = MedicoCRUD(db)
-        medicos = medico_crud.obtener_medicos_por_especialidad(especialidad)
+        medicos = medico_crud.listar_por_especialidad_directorio(
+            especialidad, usar_cache=not sin_cache
+        )
         return medicos
     except Exception as e:
         raise HTTPException(
@@ -128,7 +197,7 @@ async def obtener_medicos_por_especialidad(
 
 
 @router.get("/buscar/{nombre}", response_model=List[MedicoResponse])
-async def buscar_medicos_por_nombre(nombre: str, db: Session = Depends(get_db)):
+async def buscar_medicos_por_nombre(nombre: str, db: Session = Depends(get_read_db)):
     """Buscar médicos por nombre (búsqueda parcial)."""
     try:
         medico_crud = MedicoCRUD(db)
@@ -174,7 +243,11 @@ async def crear_medico(medico_data: MedicoCreate, db: Session = Depends(get_db))
 
 @router.put("/{medico_id}", response_model=MedicoResponse)
 async def actualizar_medico(
-    medico_id: UUID, medico_data: MedicoUpdate, db: Session = Depends(get_db)
+    medico_id: UUID,
+    medico_data: MedicoUpdate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
 ):
     """Actualizar un médico existente."""
     try:
@@ -193,16 +266,21 @@ async def actualizar_medico(
         }
 
         if not campos_actualizacion and not medico_data.id_usuario_edicion:
+            agregar_version(response, medico_existente)
             return medico_existente
 
         medico_actualizado = medico_crud.actualizar_medico(
             medico_id,
             medico_data.id_usuario_edicion if medico_data.id_usuario_edicion else None,
+            version_esperada=version_if_match(request),
             **campos_actualizacion,
         )
+        agregar_version(response, medico_actualizado)
         return medico_actualizado
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, MedicoResponse)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
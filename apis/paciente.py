@@ -3,25 +3,58 @@ from uuid import UUID
 
 from crud.paciente_crud import PacienteCRUD
 from database.config import get_db
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from database.replicas import en_primaria, get_read_db, leer_de_primaria
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from schemas import PacienteCreate, PacienteResponse, PacienteUpdate, RespuestaAPI
 from sqlalchemy.orm import Session
+from utils.cache import cache
+from utils.condicional import (
+    ConflictoVersionError,
+    agregar_version,
+    responder_condicional,
+    respuesta_conflicto,
+    version_if_match,
+)
+from utils.tiempos_servidor import RutaMedida
 
-router = APIRouter(prefix="/pacientes", tags=["pacientes"])
+router = APIRouter(prefix="/pacientes", tags=["pacientes"], route_class=RutaMedida)
 
 
 @router.get("/", response_model=List[PacienteResponse])
 async def obtener_pacientes(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(1000, ge=1, le=1000),
     include_inactive: bool = Query(False, description="Incluir pacientes inactivos"),
     nombre: str = Query(None, description="Filtrar por nombre (búsqueda parcial)"),
     activo: bool = Query(None, description="Filtrar por estado activo/inactivo"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
 ):
     """Obtener todos los pacientes con paginación, opción de incluir inactivos y filtros de búsqueda."""
     try:
         paciente_crud = PacienteCRUD(db)
+        no_modificado = responder_condicional(
+            request,
+            response,
+            paciente_crud.version_pacientes(
+                include_inactive=include_inactive,
+                nombre=nombre,
+                activo=activo,
+                skip=skip,
+                limit=limit,
+            ),
+        )
+        if no_modificado:
+            return no_modificado
         pacientes = paciente_crud.obtener_pacientes(
             skip=skip, 
             limit=limit, 
@@ -48,11 +81,38 @@ async def obtener_pacientes(
 
 
 @router.get("/{paciente_id}", response_model=PacienteResponse)
-async def obtener_paciente(paciente_id: UUID, db: Session = Depends(get_db)):
+async def obtener_paciente(
+    paciente_id: UUID,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+):
     """Obtener un paciente por ID."""
     try:
         paciente_crud = PacienteCRUD(db)
-        paciente = paciente_crud.obtener_paciente(paciente_id)
+        version = paciente_crud.version_paciente(paciente_id)
+        if version is not None:
+            no_modificado = responder_condicional(request, response, version)
+            if no_modificado:
+                return no_modificado
+
+        def serializar(primaria: Session):
+            paciente = PacienteCRUD(primaria).obtener_paciente(paciente_id)
+            if not paciente:
+                return None
+            return PacienteResponse.model_validate(paciente).model_dump(mode="json")
+
+        def cargar():
+            # La caché es compartida: una réplica atrasada la dejaría vieja
+            return en_primaria(db, serializar)
+
+        if leer_de_primaria(request):
+            # El cliente acaba de escribir: debe ver su cambio, no la caché
+            paciente = cargar()
+        else:
+            paciente = await cache.aobtener_o_calcular(
+                f"paciente:{paciente_id}", [f"paciente:{paciente_id}"], cargar
+            )
         if not paciente:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Paciente no encontrado"
@@ -68,7 +128,7 @@ async def obtener_paciente(paciente_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/email/{email}", response_model=PacienteResponse)
-async def obtener_paciente_por_email(email: str, db: Session = Depends(get_db)):
+async def obtener_paciente_por_email(email: str, db: Session = Depends(get_read_db)):
     """Obtener un paciente por email."""
     try:
         paciente_crud = PacienteCRUD(db)
@@ -88,7 +148,7 @@ async def obtener_paciente_por_email(email: str, db: Session = Depends(get_db)):
 
 
 @router.get("/buscar/{nombre}", response_model=List[PacienteResponse])
-async def buscar_pacientes_por_nombre(nombre: str, db: Session = Depends(get_db)):
+async def buscar_pacientes_por_nombre(nombre: str, db: Session = Depends(get_read_db)):
     """Buscar pacientes por nombre (búsqueda parcial)."""
     try:
         paciente_crud = PacienteCRUD(db)
@@ -131,7 +191,11 @@ async def crear_paciente(paciente_data: PacienteCreate, db: Session = Depends(ge
 
 @router.put("/{paciente_id}", response_model=PacienteResponse)
 async def actualizar_paciente(
-    paciente_id: UUID, paciente_data: PacienteUpdate, db: Session = Depends(get_db)
+    paciente_id: UUID,
+    paciente_data: PacienteUpdate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
 ):
     """Actualizar un paciente existente."""
     try:
@@ -150,6 +214,7 @@ async def actualizar_paciente(
         }
 
         if not campos_actualizacion and not paciente_data.id_usuario_edicion:
+            agregar_version(response, paciente_existente)
             return paciente_existente
 
         paciente_actualizado = paciente_crud.actualizar_paciente(
@@ -159,11 +224,15 @@ async def actualizar_paciente(
                 if paciente_data.id_usuario_edicion
                 else None
             ),
+            version_esperada=version_if_match(request),
             **campos_actualizacion,
         )
+        agregar_version(response, paciente_actualizado)
         return paciente_actualizado
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, PacienteResponse)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
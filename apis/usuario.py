@@ -1,8 +1,11 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
+from auth.dependencias import obtener_usuario_opcional
+from auth.tokens import UsuarioToken
 from crud.usuario_crud import UsuarioCRUD
 from database.config import get_db
+from database.replicas import get_read_db
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from schemas import (
     RespuestaAPI,
@@ -11,9 +14,11 @@ from schemas import (
     UsuarioUpdate,
 )
 from sqlalchemy.orm import Session
+from utils.condicional import ConflictoVersionError, respuesta_conflicto
 from utils.error_handler import APIErrorHandler
+from utils.tiempos_servidor import RutaMedida
 
-router = APIRouter(prefix="/usuarios", tags=["usuarios"])
+router = APIRouter(prefix="/usuarios", tags=["usuarios"], route_class=RutaMedida)
 
 
 @router.get("/", response_model=List[UsuarioResponse])
@@ -24,7 +29,7 @@ async def obtener_usuarios(
     email: str = Query(None, description="Filtrar por email (búsqueda parcial)"),
     nombre: str = Query(None, description="Filtrar por nombre (búsqueda parcial)"),
     activo: bool = Query(None, description="Filtrar por estado activo/inactivo"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Obtener todos los usuarios con paginación, opción de incluir inactivos y filtros de búsqueda."""
     try:
@@ -48,7 +53,7 @@ async def obtener_usuarios(
 
 
 @router.get("/email/{email}", response_model=UsuarioResponse)
-async def obtener_usuario_por_email(email: str, db: Session = Depends(get_db)):
+async def obtener_usuario_por_email(email: str, db: Session = Depends(get_read_db)):
     """Obtener un usuario por email."""
     try:
         usuario_crud = UsuarioCRUD(db)
@@ -69,7 +74,7 @@ async def obtener_usuario_por_email(email: str, db: Session = Depends(get_db)):
 
 @router.get("/username/{nombre_usuario}", response_model=UsuarioResponse)
 async def obtener_usuario_por_nombre_usuario(
-    nombre_usuario: str, db: Session = Depends(get_db)
+    nombre_usuario: str, db: Session = Depends(get_read_db)
 ):
     """Obtener un usuario por nombre de usuario."""
     try:
@@ -90,7 +95,7 @@ async def obtener_usuario_por_nombre_usuario(
 
 
 @router.get("/admin/lista", response_model=List[UsuarioResponse])
-async def obtener_usuarios_admin(db: Session = Depends(get_db)):
+async def obtener_usuarios_admin(db: Session = Depends(get_read_db)):
     """Obtener todos los usuarios administradores."""
     try:
         usuario_crud = UsuarioCRUD(db)
@@ -177,6 +182,8 @@ async def actualizar_usuario(
         return usuario_actualizado
     except HTTPException:
         raise
+    except ConflictoVersionError as e:
+        return respuesta_conflicto(e, UsuarioResponse)
     except ValueError as e:
         error_message = str(e)
         if "nombre de usuario ya está registrado" in error_message:
@@ -301,11 +308,19 @@ async def eliminar_usuario_permanente(usuario_id: UUID, db: Session = Depends(ge
 
 
 @router.get("/{usuario_id}/es-admin", response_model=RespuestaAPI)
-async def verificar_es_admin(usuario_id: UUID, db: Session = Depends(get_db)):
+async def verificar_es_admin(
+    usuario_id: UUID,
+    usuario_actual: Optional[UsuarioToken] = Depends(obtener_usuario_opcional),
+    db: Session = Depends(get_db),
+):
     """Verificar si un usuario es administrador."""
     try:
-        usuario_crud = UsuarioCRUD(db)
-        es_admin = usuario_crud.es_admin(usuario_id)
+        # Para el propio usuario basta el claim es_admin del token
+        if usuario_actual is not None and usuario_actual.id == usuario_id:
+            es_admin = usuario_actual.es_admin
+        else:
+            usuario_crud = UsuarioCRUD(db)
+            es_admin = usuario_crud.es_admin(usuario_id)
         return RespuestaAPI(
             mensaje=f"El usuario {'es' if es_admin else 'no es'} administrador",
             success=True,
@@ -319,7 +334,7 @@ async def verificar_es_admin(usuario_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/{usuario_id}", response_model=UsuarioResponse)
-async def obtener_usuario(usuario_id: UUID, db: Session = Depends(get_db)):
+async def obtener_usuario(usuario_id: UUID, db: Session = Depends(get_read_db)):
     """Obtener un usuario por ID."""
     try:
         usuario_crud = UsuarioCRUD(db)
@@ -0,0 +1,159 @@
+"""
+API keys para clientes de integración (laboratorio, exportador de facturación)
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+from uuid import UUID
+
+from utils.bus_invalidacion import registrar_manejador
+
+PREFIJO_CLAVE = "hsp"
+API_KEYS_CACHE_TTL = float(os.getenv("API_KEYS_CACHE_TTL", 60))
+
+
+class ApiKeyInvalidaError(ValueError):
+    """La API key no existe, está revocada o su secreto no coincide"""
+
+
+class ClienteApiKey:
+    """Cliente autenticado con una API key"""
+
+    __slots__ = ("id", "nombre", "prefijo", "scopes", "limite_por_minuto")
+
+    def __init__(
+        self,
+        id: UUID,
+        nombre: str,
+        prefijo: str,
+        scopes: FrozenSet[str],
+        limite_por_minuto: Optional[int],
+    ):
+        self.id = id
+        self.nombre = nombre
+        self.prefijo = prefijo
+        self.scopes = scopes
+        self.limite_por_minuto = limite_por_minuto
+
+    def permite(self, recurso: str, accion: str) -> bool:
+        """Scopes aceptados: "*", "<recurso>:*" y "<recurso>:<accion>" """
+        return (
+            "*" in self.scopes
+            or f"{recurso}:*" in self.scopes
+            or f"{recurso}:{accion}" in self.scopes
+        )
+
+
+def digest_secreto(secreto: str) -> str:
+    """SHA-256 de la parte secreta (aleatoria, así que no necesita sal)"""
+    return hashlib.sha256(secreto.encode("utf-8")).hexdigest()
+
+
+def generar_api_key() -> Tuple[str, str, str]:
+    """Generar una clave nueva: (clave completa, prefijo, digest del secreto)"""
+    prefijo = secrets.token_hex(6)
+    secreto = secrets.token_urlsafe(32)
+    return f"{PREFIJO_CLAVE}_{prefijo}_{secreto}", prefijo, digest_secreto(secreto)
+
+
+def separar_api_key(clave: str) -> Tuple[str, str]:
+    """Separar una clave en (prefijo, secreto)"""
+    partes = clave.split("_", 2)
+    if len(partes) != 3 or partes[0] != PREFIJO_CLAVE or not partes[1] or not partes[2]:
+        raise ApiKeyInvalidaError("Formato de API key inválido")
+    return partes[1], partes[2]
+
+
+def normalizar_scopes(scopes) -> FrozenSet[str]:
+    """Scopes de un texto separado por espacios o de una lista"""
+    if isinstance(scopes, str):
+        scopes = scopes.split()
+    return frozenset(s.strip() for s in scopes if s and s.strip())
+
+
+class _CacheApiKeys:
+    """
+    Caché por proceso de las API keys leídas de la base de datos, por prefijo
+
+    Guarda el digest del secreto, así que un acierto valida la clave sin
+    consultar la base de datos. Las revocaciones se avisan a los demás
+    procesos por el bus de invalidación y además cada entrada vence a los
+    `ttl` segundos.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entradas: Dict[str, Tuple[float, str, ClienteApiKey]] = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, prefijo: str) -> Optional[Tuple[str, ClienteApiKey]]:
+        with self._lock:
+            entrada = self._entradas.get(prefijo)
+            if entrada is None:
+                return None
+            if entrada[0] <= time.monotonic():
+                del self._entradas[prefijo]
+                return None
+            return entrada[1], entrada[2]
+
+    def guardar(self, prefijo: str, secreto_hash: str, cliente: ClienteApiKey):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entradas[prefijo] = (
+                time.monotonic() + self.ttl,
+                secreto_hash,
+                cliente,
+            )
+
+    def invalidar(self, prefijo: Optional[str] = None) -> None:
+        with self._lock:
+            if prefijo is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(prefijo, None)
+
+
+cache_api_keys = _CacheApiKeys(API_KEYS_CACHE_TTL)
+
+# Revocaciones hechas por otros procesos (ver utils/bus_invalidacion.py)
+registrar_manejador("api_key", cache_api_keys.invalidar)
+
+
+def verificar_api_key(clave: str, cargar: Callable[[str], object]) -> ClienteApiKey:
+    """
+    Validar una API key y devolver su cliente
+
+    Args:
+        clave: Clave completa recibida en X-API-Key
+        cargar: Función que busca la ApiKey activa por prefijo en la base de datos
+
+    Raises:
+        ApiKeyInvalidaError: Si la clave no es válida
+    """
+    prefijo, secreto = separar_api_key(clave)
+    entrada = cache_api_keys.obtener(prefijo)
+    if entrada is None:
+        api_key = cargar(prefijo)
+        if api_key is None:
+            raise ApiKeyInvalidaError("API key inválida o revocada")
+        entrada = (
+            api_key.secreto_hash,
+            ClienteApiKey(
+                id=api_key.id,
+                nombre=api_key.nombre,
+                prefijo=api_key.prefijo,
+                scopes=normalizar_scopes(api_key.scopes),
+                limite_por_minuto=api_key.limite_por_minuto,
+            ),
+        )
+        cache_api_keys.guardar(prefijo, *entrada)
+    secreto_hash, cliente = entrada
+    if not hmac.compare_digest(digest_secreto(secreto), secreto_hash):
+        raise ApiKeyInvalidaError("API key inválida o revocada")
+    return cliente
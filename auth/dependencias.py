@@ -0,0 +1,130 @@
+"""
+Dependencias de FastAPI para autenticar y autorizar con el token de acceso
+"""
+
+import os
+from typing import Optional, Union
+
+from auth.api_keys import ApiKeyInvalidaError, ClienteApiKey, verificar_api_key
+from auth.revocacion import registro_revocaciones
+from auth.tokens import TokenInvalidoError, UsuarioToken, verificar_token
+from crud.api_key_crud import ApiKeyCRUD
+from crud.token_revocado_crud import TokenRevocadoCRUD
+from database.config import get_db
+from fastapi import Depends, Request
+from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.orm import Session
+from utils.error_handler import APIErrorHandler
+from utils.limitador import LimitadorTokens
+
+# Exigir token en todos los routers (salvo /auth); desactivado por defecto
+# para no romper clientes que todavía no envían Authorization
+AUTH_REQUERIDA = os.getenv("AUTH_REQUERIDA", "false").lower() in ("1", "true", "si")
+
+_bearer = HTTPBearer(auto_error=False)
+_api_key = APIKeyHeader(name="X-API-Key", auto_error=False)
+_limitador_api_keys = LimitadorTokens()
+
+_METODOS_LECTURA = {"GET", "HEAD", "OPTIONS"}
+
+
+def _no_autenticado(mensaje: str):
+    error = APIErrorHandler.authentication_error(mensaje)
+    error.headers = {"WWW-Authenticate": "Bearer"}
+    return error
+
+
+async def obtener_usuario_opcional(
+    credenciales: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+    db: Session = Depends(get_db),
+) -> Optional[UsuarioToken]:
+    """Usuario del token si la petición trae uno; None si no trae ninguno"""
+    if credenciales is None:
+        return None
+    try:
+        usuario = verificar_token(credenciales.credentials)
+    except TokenInvalidoError as e:
+        raise _no_autenticado(str(e))
+    # El filtro de Bloom descarta en memoria casi todos los tokens no revocados
+    if registro_revocaciones.posiblemente_revocado(
+        usuario.jti, usuario.id
+    ) and TokenRevocadoCRUD(db).esta_revocado(usuario.jti, usuario.id, usuario.emitido):
+        raise _no_autenticado("Token revocado")
+    return usuario
+
+
+async def get_current_user(
+    usuario: Optional[UsuarioToken] = Depends(obtener_usuario_opcional),
+) -> UsuarioToken:
+    """Usuario autenticado; responde 401 si falta el token o no es válido"""
+    if usuario is None:
+        raise _no_autenticado("Se requiere un token de acceso")
+    return usuario
+
+
+async def requerir_admin(
+    usuario: UsuarioToken = Depends(get_current_user),
+) -> UsuarioToken:
+    """Usuario autenticado con el claim es_admin; responde 403 si no lo es"""
+    if not usuario.es_admin:
+        raise APIErrorHandler.authorization_error()
+    return usuario
+
+
+def _recurso_y_accion(request: Request):
+    # /api/<recurso>/... -> ("<recurso>", "leer" | "escribir")
+    partes = request.url.path.strip("/").split("/")
+    if partes and partes[0] == "api":
+        partes = partes[1:]
+    recurso = partes[0] if partes else ""
+    accion = "leer" if request.method in _METODOS_LECTURA else "escribir"
+    return recurso, accion
+
+
+def _autorizar_api_key(request: Request, clave: str, db: Session) -> ClienteApiKey:
+    try:
+        cliente = verificar_api_key(
+            clave, ApiKeyCRUD(db).obtener_api_key_activa_por_prefijo
+        )
+    except ApiKeyInvalidaError as e:
+        raise APIErrorHandler.authentication_error(str(e))
+
+    recurso, accion = _recurso_y_accion(request)
+    if not cliente.permite(recurso, accion):
+        raise APIErrorHandler.authorization_error(
+            f"La API key no tiene el scope {recurso}:{accion}"
+        )
+
+    if cliente.limite_por_minuto:
+        espera = _limitador_api_keys.consumir(
+            cliente.prefijo,
+            capacidad=cliente.limite_por_minuto,
+            por_segundo=cliente.limite_por_minuto / 60,
+        )
+        if espera:
+            raise APIErrorHandler.rate_limit_error(espera)
+    return cliente
+
+
+async def autenticar_peticion(
+    request: Request,
+    clave: Optional[str] = Depends(_api_key),
+    usuario: Optional[UsuarioToken] = Depends(obtener_usuario_opcional),
+    db: Session = Depends(get_db),
+) -> Optional[Union[UsuarioToken, ClienteApiKey]]:
+    """
+    Autenticar una petición con X-API-Key o con un token Bearer
+
+    Una API key se valida siempre que se envía (scopes y límite por minuto);
+    sin credenciales solo se rechaza la petición si AUTH_REQUERIDA está activa.
+    """
+    if clave:
+        return _autorizar_api_key(request, clave, db)
+    if usuario is None and AUTH_REQUERIDA:
+        raise _no_autenticado("Se requiere un token de acceso o una API key")
+    return usuario
+
+
+def dependencias_routers() -> list:
+    """Dependencias para include_router de los routers de la API (salvo /auth)"""
+    return [Depends(autenticar_peticion)]
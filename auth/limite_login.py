@@ -0,0 +1,147 @@
+"""
+Límite de intentos de inicio de sesión por usuario y por IP
+
+Cada intento de login cuesta un hash de contraseña completo; estos controles
+se hacen antes de calcularlo para que un cliente insistente no agote la CPU.
+"""
+
+import logging
+import math
+import os
+import time
+from typing import List
+
+from fastapi import Request
+from utils.cache import BackendCache, BackendMemoria, cache
+from utils.limitador import LimitadorTokens
+
+logger = logging.getLogger(__name__)
+
+# memoria: por proceso; cache: contadores compartidos en el backend de
+# utils/cache.py (CACHE_BACKEND=redis para varios nodos)
+LOGIN_LIMITE_BACKEND = os.getenv("LOGIN_LIMITE_BACKEND", "memoria").lower()
+LOGIN_INTENTOS_IP_POR_MINUTO = int(os.getenv("LOGIN_INTENTOS_IP_POR_MINUTO", 30))
+LOGIN_FALLOS_USUARIO = int(os.getenv("LOGIN_FALLOS_USUARIO", 5))
+LOGIN_FALLOS_IP = int(os.getenv("LOGIN_FALLOS_IP", 20))
+LOGIN_VENTANA_FALLOS = int(os.getenv("LOGIN_VENTANA_FALLOS", 900))
+LOGIN_BLOQUEO_INICIAL = float(os.getenv("LOGIN_BLOQUEO_INICIAL", 1))
+LOGIN_BLOQUEO_MAXIMO = float(os.getenv("LOGIN_BLOQUEO_MAXIMO", 900))
+# Usar X-Forwarded-For solo detrás de un proxy que lo reescriba
+CONFIAR_X_FORWARDED_FOR = (
+    os.getenv("CONFIAR_X_FORWARDED_FOR", "false").lower() == "true"
+)
+
+
+class LoginBloqueadoError(Exception):
+    """Demasiados intentos; `espera` son los segundos hasta poder reintentar"""
+
+    def __init__(self, espera: float):
+        super().__init__("Demasiados intentos de inicio de sesión, intente más tarde")
+        self.espera = espera
+
+
+def ip_cliente(request: Request) -> str:
+    """IP del cliente (la primera de X-Forwarded-For si se confía en el proxy)"""
+    if CONFIAR_X_FORWARDED_FOR:
+        reenviada = request.headers.get("x-forwarded-for")
+        if reenviada:
+            return reenviada.split(",")[0].strip()
+    return request.client.host if request.client else "desconocida"
+
+
+class LimiteLogin:
+    """
+    Controles de intentos de login
+
+    - Ráfagas por IP: cubeta de fichas en memoria con
+      LOGIN_INTENTOS_IP_POR_MINUTO intentos por minuto, acierten o no.
+    - Fallos consecutivos por usuario y por IP dentro de
+      LOGIN_VENTANA_FALLOS segundos: al llegar al umbral se bloquea durante
+      LOGIN_BLOQUEO_INICIAL segundos, el doble con cada fallo siguiente, hasta
+      LOGIN_BLOQUEO_MAXIMO. Un login correcto reinicia los fallos del usuario.
+
+    Los contadores de fallos y los bloqueos se guardan en `backend`. Si el
+    backend falla se registra el error y no se bloquea el login.
+    """
+
+    def __init__(self, backend: BackendCache, prefijo: str = "login"):
+        self.backend = backend
+        self.prefijo = prefijo
+        self._rafagas = LimitadorTokens()
+
+    def _claves(self, tipo: str, usuario: str, ip: str) -> List[str]:
+        return [
+            f"{self.prefijo}:{tipo}:usuario:{usuario.strip().lower()}",
+            f"{self.prefijo}:{tipo}:ip:{ip}",
+        ]
+
+    @staticmethod
+    def _bloqueo(fallos: int, umbral: int) -> float:
+        if fallos < umbral:
+            return 0.0
+        return min(LOGIN_BLOQUEO_MAXIMO, LOGIN_BLOQUEO_INICIAL * 2 ** (fallos - umbral))
+
+    async def verificar(self, usuario: str, ip: str) -> None:
+        """
+        Rechazar el intento antes de verificar la contraseña
+
+        Raises:
+            LoginBloqueadoError: Si la IP excede su ritmo o hay un bloqueo vigente
+        """
+        if LOGIN_INTENTOS_IP_POR_MINUTO > 0:
+            espera = self._rafagas.consumir(
+                ip,
+                capacidad=LOGIN_INTENTOS_IP_POR_MINUTO,
+                por_segundo=LOGIN_INTENTOS_IP_POR_MINUTO / 60,
+            )
+            if espera:
+                raise LoginBloqueadoError(espera)
+        try:
+            valores = await self.backend.aleer(self._claves("bloqueo", usuario, ip))
+        except Exception as e:
+            logger.error(f"No se pudo consultar el límite de login: {str(e)}")
+            return
+        ahora = time.time()
+        espera = max((float(v) - ahora for v in valores if v is not None), default=0)
+        if espera > 0:
+            raise LoginBloqueadoError(espera)
+
+    async def registrar_fallo(self, usuario: str, ip: str) -> None:
+        """Contar un fallo y bloquear al usuario o a la IP si llegan al umbral"""
+        try:
+            fallos = await self.backend.aincrementar(
+                self._claves("fallos", usuario, ip), LOGIN_VENTANA_FALLOS
+            )
+            bloqueos = self._claves("bloqueo", usuario, ip)
+            for clave, cantidad, umbral in zip(
+                bloqueos, fallos, (LOGIN_FALLOS_USUARIO, LOGIN_FALLOS_IP)
+            ):
+                espera = self._bloqueo(cantidad, umbral)
+                if espera:
+                    await self.backend.aescribir(
+                        clave, str(time.time() + espera).encode(), math.ceil(espera)
+                    )
+        except Exception as e:
+            logger.error(f"No se pudo registrar el fallo de login: {str(e)}")
+
+    async def registrar_exito(self, usuario: str) -> None:
+        """Reiniciar los fallos y el bloqueo del usuario"""
+        claves = [self._claves(tipo, usuario, "")[0] for tipo in ("fallos", "bloqueo")]
+        try:
+            await self.backend.aeliminar(claves)
+        except Exception as e:
+            logger.error(f"No se pudo reiniciar el límite de login: {str(e)}")
+
+
+def crear_limite_login() -> LimiteLogin:
+    """Crear el límite según LOGIN_LIMITE_BACKEND (memoria o cache)"""
+    if LOGIN_LIMITE_BACKEND == "cache":
+        return LimiteLogin(cache.backend, prefijo=f"{cache.prefijo}:login")
+    if LOGIN_LIMITE_BACKEND != "memoria":
+        raise ValueError(
+            f"LOGIN_LIMITE_BACKEND inválido: {LOGIN_LIMITE_BACKEND} (memoria o cache)"
+        )
+    return LimiteLogin(BackendMemoria())
+
+
+limite_login = crear_limite_login()
@@ -0,0 +1,156 @@
+"""
+Registro en memoria de tokens de acceso revocados (filtro de Bloom por proceso)
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+from uuid import UUID
+
+from auth.tokens import TOKEN_MINUTOS
+from utils.bus_invalidacion import registrar_manejador
+from utils.filtro_bloom import FiltroBloom
+
+REVOCACION_CAPACIDAD = int(os.getenv("REVOCACION_CAPACIDAD", 100000))
+REVOCACION_TASA_FALSOS_POSITIVOS = float(
+    os.getenv("REVOCACION_TASA_FALSOS_POSITIVOS", 0.001)
+)
+
+
+def clave_token(jti: str) -> str:
+    return f"jti:{jti}"
+
+
+def clave_usuario(usuario_id: UUID) -> str:
+    return f"usuario:{usuario_id}"
+
+
+def _es_clave_usuario(clave: str) -> bool:
+    return clave.startswith("usuario:")
+
+
+class RegistroRevocaciones:
+    """
+    Filtro de Bloom con las claves de tbl_tokens_revocados
+
+    Responder "no revocado" (el caso común) cuesta una consulta en memoria; solo
+    los posibles aciertos, incluidos los falsos positivos, se confirman en la
+    base de datos. La tarea programada de crud/token_revocado_crud.py agrega
+    las revocaciones nuevas y reconstruye el filtro para descartar las vencidas.
+
+    Una revocación de usuario hace que todos sus tokens, también los emitidos
+    después, sean posibles aciertos: el filtro se reconstruye en cuanto vence
+    la primera de ellas (vencimiento_usuarios) y no solo periódicamente.
+    """
+
+    def __init__(self, capacidad: int, tasa_falsos_positivos: float):
+        self.capacidad = capacidad
+        self.tasa_falsos_positivos = tasa_falsos_positivos
+        self._filtro = FiltroBloom(capacidad, tasa_falsos_positivos)
+        self._lock = threading.Lock()
+        # Fecha de creación de la revocación más reciente ya cargada
+        self.ultima_carga: Optional[datetime] = None
+        self.reconstruir_pendiente = True
+        self.reconstruido_en = 0.0
+        # Epoch en que vence la primera revocación de usuario del filtro
+        self.vencimiento_usuarios: Optional[float] = None
+        # Claves agregadas mientras se carga un filtro nuevo desde la BD
+        self._durante_reconstruccion: Optional[list] = None
+        self.consultas = 0
+        self.posibles_aciertos = 0
+
+    def _programar_vencimiento(self, vence: float) -> None:
+        if self.vencimiento_usuarios is None or vence < self.vencimiento_usuarios:
+            self.vencimiento_usuarios = vence
+
+    def agregar(self, clave: str) -> None:
+        with self._lock:
+            self._filtro.agregar(clave)
+            if _es_clave_usuario(clave):
+                # Se crea ahora y dura lo que un token de acceso
+                self._programar_vencimiento(time.time() + TOKEN_MINUTOS * 60)
+            if self._durante_reconstruccion is not None:
+                self._durante_reconstruccion.append(clave)
+            if self._filtro.elementos > self._filtro.capacidad:
+                # Con más elementos que la capacidad sube la tasa de falsos positivos
+                self.reconstruir_pendiente = True
+
+    def agregar_cargadas(self, claves: Iterable[str], ultima_carga: datetime):
+        """Agregar las revocaciones nuevas leídas de la BD"""
+        for clave in claves:
+            self.agregar(clave)
+        self.ultima_carga = ultima_carga
+
+    def iniciar_reconstruccion(self) -> None:
+        """Llamar antes de consultar la BD para reemplazar el filtro"""
+        with self._lock:
+            self._durante_reconstruccion = []
+
+    def reemplazar(
+        self,
+        claves: Iterable[str],
+        ultima_carga: Optional[datetime],
+        vencimiento_usuarios: Optional[datetime] = None,
+    ):
+        """
+        Cambiar el filtro por uno nuevo con las revocaciones vigentes
+
+        `vencimiento_usuarios` es el vencimiento más próximo de las
+        revocaciones de usuario cargadas.
+        """
+        claves = list(claves)
+        filtro = FiltroBloom(
+            max(self.capacidad, 2 * len(claves)), self.tasa_falsos_positivos
+        )
+        for clave in claves:
+            filtro.agregar(clave)
+        with self._lock:
+            self.vencimiento_usuarios = (
+                vencimiento_usuarios.timestamp() if vencimiento_usuarios else None
+            )
+            for clave in self._durante_reconstruccion or ():
+                filtro.agregar(clave)
+                if _es_clave_usuario(clave):
+                    self._programar_vencimiento(time.time() + TOKEN_MINUTOS * 60)
+            self._durante_reconstruccion = None
+            self._filtro = filtro
+            self.ultima_carga = ultima_carga
+            self.reconstruir_pendiente = False
+            self.reconstruido_en = time.monotonic()
+
+    def posiblemente_revocado(self, jti: Optional[str], usuario_id: UUID) -> bool:
+        filtro = self._filtro
+        self.consultas += 1
+        if (jti and filtro.contiene(clave_token(jti))) or filtro.contiene(
+            clave_usuario(usuario_id)
+        ):
+            self.posibles_aciertos += 1
+            return True
+        return False
+
+    def marcar_reconstruccion(self) -> None:
+        self.reconstruir_pendiente = True
+
+    def vencio_revocacion_usuario(self) -> bool:
+        """Si el filtro tiene una revocación de usuario que ya venció"""
+        vence = self.vencimiento_usuarios
+        return vence is not None and time.time() >= vence
+
+
+registro_revocaciones = RegistroRevocaciones(
+    REVOCACION_CAPACIDAD, REVOCACION_TASA_FALSOS_POSITIVOS
+)
+
+
+def _al_notificar(clave: Optional[str]) -> None:
+    # Sin clave (reconexión del bus) se pudieron perder revocaciones
+    if clave:
+        registro_revocaciones.agregar(clave)
+    else:
+        registro_revocaciones.marcar_reconstruccion()
+
+
+# Revocaciones hechas por otros procesos (ver utils/bus_invalidacion.py)
+registrar_manejador("token_revocado", _al_notificar)
@@ -2,36 +2,121 @@
 Módulo de seguridad para manejo de contraseñas
 """
 
+import base64
 import hashlib
+import hmac
+import os
 import secrets
-from typing import Tuple
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Algoritmo y parámetros de los hashes nuevos; los hashes guardados llevan los
+# suyos, así que cambiarlos no invalida contraseñas existentes (ver
+# scripts/calibrar_hash_contrasenas.py para elegir los valores)
+ALGORITMO_HASH = os.getenv("PASSWORD_ALGORITMO", "pbkdf2-sha256")
+PBKDF2_ITERACIONES = int(os.getenv("PASSWORD_PBKDF2_ITERACIONES", 100000))
+SCRYPT_LOG_N = int(os.getenv("PASSWORD_SCRYPT_LOG_N", 15))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", 8))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", 1))
+
+# Formato anterior: "<salt hex>:<hash hex>" con PBKDF2-SHA256 de 100.000 iteraciones
+_LEGADO_ITERACIONES = 100000
+_BYTES_SAL = 16
+
+
+def _b64(datos: bytes) -> str:
+    return base64.b64encode(datos).decode("ascii").rstrip("=")
+
+
+def _desde_b64(texto: str) -> bytes:
+    return base64.b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _pbkdf2(password: str, sal: bytes, iteraciones: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), sal, iteraciones)
+
+
+def _scrypt(password: str, sal: bytes, log_n: int, r: int, p: int) -> bytes:
+    n = 1 << log_n
+    return hashlib.scrypt(
+        password.encode("utf-8"),
+        salt=sal,
+        n=n,
+        r=r,
+        p=p,
+        # El límite por defecto (32 MiB) no alcanza para n=2^15, r=8
+        maxmem=128 * r * (n + p + 2) + 1024 * 1024,
+        dklen=32,
+    )
+
+
+def _parametros(texto: str) -> Dict[str, int]:
+    return {k: int(v) for k, v in (par.split("=", 1) for par in texto.split(","))}
+
+
+def _parametros_actuales(algoritmo: str) -> Dict[str, int]:
+    if algoritmo == "scrypt":
+        return {"ln": SCRYPT_LOG_N, "r": SCRYPT_R, "p": SCRYPT_P}
+    return {"i": PBKDF2_ITERACIONES}
+
+
+def _decodificar(password_hash: str) -> Tuple[str, Dict[str, int], bytes, bytes]:
+    """(algoritmo, parámetros, sal, hash) de un hash guardado, en cualquier formato"""
+    if not password_hash.startswith("$"):
+        sal, hash_hex = password_hash.split(":")
+        return (
+            "legado",
+            {"i": _LEGADO_ITERACIONES},
+            sal.encode("utf-8"),
+            bytes.fromhex(hash_hex),
+        )
+    _, algoritmo, parametros, sal, resultado = password_hash.split("$")
+    return algoritmo, _parametros(parametros), _desde_b64(sal), _desde_b64(resultado)
 
 
 class PasswordManager:
     """Gestor de contraseñas con hash seguro"""
 
     @staticmethod
-    def hash_password(password: str) -> str:
+    def hash_password(password: str, algoritmo: Optional[str] = None) -> str:
         """
         Generar hash seguro de una contraseña
 
+        El resultado usa el formato PHC e indica el algoritmo y sus parámetros:
+        "$pbkdf2-sha256$i=100000$<sal>$<hash>" o "$scrypt$ln=15,r=8,p=1$<sal>$<hash>"
+        (sal y hash en base64 sin relleno).
+
         Args:
             password: Contraseña en texto plano
+            algoritmo: "pbkdf2-sha256" o "scrypt" (por defecto PASSWORD_ALGORITMO)
 
         Returns:
             Hash de la contraseña con salt
         """
-        salt = secrets.token_hex(32)
-        password_hash = hashlib.pbkdf2_hmac(
-            "sha256", password.encode("utf-8"), salt.encode("utf-8"), 100000
-        )
-        return f"{salt}:{password_hash.hex()}"
+        algoritmo = algoritmo or ALGORITMO_HASH
+        sal = secrets.token_bytes(_BYTES_SAL)
+        parametros = _parametros_actuales(algoritmo)
+        if algoritmo == "scrypt":
+            resultado = _scrypt(
+                password, sal, parametros["ln"], parametros["r"], parametros["p"]
+            )
+        elif algoritmo == "pbkdf2-sha256":
+            resultado = _pbkdf2(password, sal, parametros["i"])
+        else:
+            raise ValueError(f"Algoritmo de hash no soportado: {algoritmo}")
+        texto_parametros = ",".join(f"{k}={v}" for k, v in parametros.items())
+        return f"${algoritmo}${texto_parametros}${_b64(sal)}${_b64(resultado)}"
 
     @staticmethod
     def verify_password(password: str, password_hash: str) -> bool:
         """
         Verificar si una contraseña coincide con su hash
 
+        Acepta el formato PHC y el formato anterior "salt:hash".
+
         Args:
             password: Contraseña en texto plano
             password_hash: Hash almacenado
@@ -40,14 +125,36 @@ class PasswordManager:
             True si la contraseña es correcta, False en caso contrario
         """
         try:
-            salt, hash_part = password_hash.split(":")
-            password_hash_check = hashlib.pbkdf2_hmac(
-                "sha256", password.encode("utf-8"), salt.encode("utf-8"), 100000
-            )
-            return password_hash_check.hex() == hash_part
-        except (ValueError, AttributeError):
+            algoritmo, parametros, sal, esperado = _decodificar(password_hash)
+            if algoritmo == "scrypt":
+                calculado = _scrypt(
+                    password, sal, parametros["ln"], parametros["r"], parametros["p"]
+                )
+            elif algoritmo in ("pbkdf2-sha256", "legado"):
+                calculado = _pbkdf2(password, sal, parametros["i"])
+            else:
+                return False
+            return hmac.compare_digest(calculado, esperado)
+        except (ValueError, KeyError, AttributeError):
             return False
 
+    @staticmethod
+    def needs_rehash(password_hash: str) -> bool:
+        """
+        Indicar si un hash válido usa otro algoritmo o parámetros que los
+        configurados (o el formato anterior) y conviene recalcularlo
+
+        Solo se puede recalcular al conocer la contraseña, es decir, después
+        de un inicio de sesión correcto.
+        """
+        try:
+            algoritmo, parametros, _, _ = _decodificar(password_hash)
+        except (ValueError, AttributeError):
+            return True
+        return algoritmo != ALGORITMO_HASH or parametros != _parametros_actuales(
+            ALGORITMO_HASH
+        )
+
     @staticmethod
     def validate_password_strength(password: str) -> Tuple[bool, str]:
         """
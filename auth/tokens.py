@@ -0,0 +1,166 @@
+"""
+Emisión y verificación de tokens de acceso JWT (HS256)
+"""
+
+import hashlib
+import os
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from uuid import UUID
+
+from dotenv import load_dotenv
+from jose import JWTError, jwt
+
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY", "tu-secret-key-super-segura-cambiar-en-produccion")
+ALGORITHM = "HS256"
+TOKEN_MINUTOS = int(os.getenv("TOKEN_MINUTOS", 30))
+TOKENS_CACHE_MAX = int(os.getenv("TOKENS_CACHE_MAX", 1024))
+REFRESH_TOKEN_DIAS = int(os.getenv("REFRESH_TOKEN_DIAS", 30))
+
+
+class TokenInvalidoError(ValueError):
+    """El token no es válido, está vencido o no tiene los claims esperados"""
+
+
+class UsuarioToken:
+    """Usuario autenticado según los claims de su token (sin consultar la BD)"""
+
+    __slots__ = ("id", "email", "nombre", "es_admin", "expira", "jti", "emitido")
+
+    def __init__(
+        self,
+        id: UUID,
+        email: str,
+        nombre: str,
+        es_admin: bool,
+        expira: int,
+        jti: Optional[str] = None,
+        emitido: float = 0.0,
+    ):
+        self.id = id
+        self.email = email
+        self.nombre = nombre
+        self.es_admin = es_admin
+        self.expira = expira
+        self.jti = jti
+        self.emitido = emitido
+
+
+def crear_token_acceso(usuario) -> str:
+    """Firmar un token de acceso con los datos que necesita la autorización"""
+    datos = {
+        "sub": str(usuario.id),
+        "email": usuario.email,
+        "nombre": usuario.nombre,
+        "es_admin": usuario.es_admin,
+        "exp": datetime.utcnow() + timedelta(minutes=TOKEN_MINUTOS),
+        # jti identifica al token para revocarlo; iat con fracción de segundo
+        # distingue los tokens emitidos antes y después de una revocación
+        "jti": uuid.uuid4().hex,
+        "iat": time.time(),
+    }
+    return jwt.encode(datos, SECRET_KEY, algorithm=ALGORITHM)
+
+
+class _CacheTokens:
+    """
+    LRU de tokens ya verificados, indexada por su firma
+
+    Un acierto evita el HMAC y la decodificación base64/JSON del token; el
+    vencimiento se sigue comprobando en cada uso. Solo se guardan tokens con
+    firma válida, así que la caché no sirve para probar firmas falsas.
+    """
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max(1, max_entradas)
+        self._entradas: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, firma: str, token: str) -> Optional[UsuarioToken]:
+        with self._lock:
+            entrada = self._entradas.get(firma)
+            if entrada is None:
+                return None
+            # La firma solo identifica al token si el resto también coincide
+            if entrada[0] != token:
+                return None
+            self._entradas.move_to_end(firma)
+            return entrada[1]
+
+    def guardar(self, firma: str, token: str, usuario: UsuarioToken) -> None:
+        with self._lock:
+            self._entradas[firma] = (token, usuario)
+            self._entradas.move_to_end(firma)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def descartar(self, firma: str) -> None:
+        with self._lock:
+            self._entradas.pop(firma, None)
+
+    def vaciar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+
+_cache_tokens = _CacheTokens(TOKENS_CACHE_MAX)
+
+
+def _usuario_desde_claims(claims: dict) -> UsuarioToken:
+    try:
+        return UsuarioToken(
+            id=UUID(claims["sub"]),
+            email=claims.get("email"),
+            nombre=claims.get("nombre"),
+            es_admin=bool(claims.get("es_admin", False)),
+            expira=int(claims["exp"]),
+            jti=claims.get("jti"),
+            emitido=float(claims.get("iat", 0)),
+        )
+    except (KeyError, TypeError, ValueError):
+        raise TokenInvalidoError("El token no contiene los datos del usuario")
+
+
+def verificar_token(token: str) -> UsuarioToken:
+    """
+    Validar firma y vencimiento de un token y devolver su usuario
+
+    Raises:
+        TokenInvalidoError: Si el token no es válido o ya venció
+    """
+    firma = token.rsplit(".", 1)[-1]
+    usuario = _cache_tokens.obtener(firma, token)
+    if usuario is None:
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise TokenInvalidoError("Token inválido o vencido")
+        usuario = _usuario_desde_claims(claims)
+        _cache_tokens.guardar(firma, token, usuario)
+    if usuario.expira <= time.time():
+        _cache_tokens.descartar(firma)
+        raise TokenInvalidoError("Token inválido o vencido")
+    return usuario
+
+
+def digest_refresh_token(token: str) -> str:
+    """SHA-256 de un token de renovación, que es lo único que se guarda"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def generar_refresh_token() -> Tuple[str, str]:
+    """
+    Generar un token de renovación aleatorio y su digest
+
+    Tiene 256 bits de entropía, así que basta un SHA-256 sin sal ni
+    iteraciones (a diferencia de una contraseña) y se busca por igualdad.
+    """
+    token = secrets.token_urlsafe(32)
+    return token, digest_refresh_token(token)
@@ -0,0 +1,91 @@
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from auth.api_keys import cache_api_keys, generar_api_key, normalizar_scopes
+from entities.api_key import ApiKey
+from sqlalchemy.orm import Session
+from utils.bus_invalidacion import publicar
+
+
+class ApiKeyCRUD:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def crear_api_key(
+        self,
+        nombre: str,
+        scopes: List[str],
+        limite_por_minuto: Optional[int] = None,
+        id_usuario_creacion: Optional[UUID] = None,
+    ) -> Tuple[ApiKey, str]:
+        """
+        Crear una API key.
+
+        Devuelve la entidad y la clave completa, que no se guarda y no se
+        puede volver a consultar.
+        """
+        if not nombre or len(nombre.strip()) == 0:
+            raise ValueError("El nombre es obligatorio")
+        if len(nombre) > 100:
+            raise ValueError("El nombre no puede exceder 100 caracteres")
+
+        scopes_normalizados = normalizar_scopes(scopes)
+        if not scopes_normalizados:
+            raise ValueError("Debe indicar al menos un scope")
+        texto_scopes = " ".join(sorted(scopes_normalizados))
+        if len(texto_scopes) > 500:
+            raise ValueError("Los scopes no pueden exceder 500 caracteres")
+
+        if limite_por_minuto is not None and limite_por_minuto < 1:
+            raise ValueError("El límite por minuto debe ser mayor que cero")
+
+        clave, prefijo, secreto_hash = generar_api_key()
+        api_key = ApiKey(
+            nombre=nombre.strip(),
+            prefijo=prefijo,
+            secreto_hash=secreto_hash,
+            scopes=texto_scopes,
+            limite_por_minuto=limite_por_minuto,
+            id_usuario_creacion=id_usuario_creacion,
+        )
+        self.db.add(api_key)
+        self.db.commit()
+        self.db.refresh(api_key)
+        return api_key, clave
+
+    def obtener_api_key(self, api_key_id: UUID) -> Optional[ApiKey]:
+        """Obtener una API key por ID."""
+        return self.db.query(ApiKey).filter(ApiKey.id == api_key_id).first()
+
+    def obtener_api_key_activa_por_prefijo(self, prefijo: str) -> Optional[ApiKey]:
+        """Obtener una API key activa por su prefijo (índice único)."""
+        return (
+            self.db.query(ApiKey)
+            .filter(ApiKey.prefijo == prefijo, ApiKey.activo == True)
+            .first()
+        )
+
+    def obtener_api_keys(self, include_inactive: bool = False) -> List[ApiKey]:
+        """Obtener las API keys."""
+        query = self.db.query(ApiKey)
+        if not include_inactive:
+            query = query.filter(ApiKey.activo == True)
+        return query.order_by(ApiKey.fecha_creacion.desc()).all()
+
+    def revocar_api_key(
+        self, api_key_id: UUID, id_usuario_edicion: Optional[UUID] = None
+    ) -> bool:
+        """Revocar (inactivar) una API key."""
+        api_key = self.obtener_api_key(api_key_id)
+        if not api_key:
+            return False
+        if not api_key.activo:
+            return True
+
+        api_key.activo = False
+        if id_usuario_edicion:
+            api_key.id_usuario_edicion = id_usuario_edicion
+        publicar(self.db, "api_key", api_key.prefijo)
+        self.db.commit()
+        cache_api_keys.invalidar(api_key.prefijo)
+        return True
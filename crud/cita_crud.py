@@ -3,6 +3,14 @@ from uuid import UUID
 
 from entities.cita import Cita
 from sqlalchemy.orm import Session
+from utils.cache import cache
+from utils.condicional import (
+    Version,
+    confirmar_version,
+    verificar_version,
+    version_entidad,
+    version_lista,
+)
 
 
 class CitaCRUD:
@@ -19,14 +27,14 @@ class CitaCRUD:
         notas: str = None,
     ) -> Cita:
         """Crear una nueva cita."""
-        from entities.medico import Medico
+        from crud.medico_crud import MedicoCRUD
         from entities.paciente import Paciente
 
         paciente = self.db.query(Paciente).filter(Paciente.id == paciente_id).first()
         if not paciente:
             raise ValueError("El paciente especificado no existe")
 
-        medico = self.db.query(Medico).filter(Medico.id == medico_id).first()
+        medico = MedicoCRUD(self.db).obtener_del_directorio("id", medico_id)
         if not medico:
             raise ValueError("El médico especificado no existe")
 
@@ -45,6 +53,7 @@ class CitaCRUD:
         )
         self.db.add(cita)
         self.db.commit()
+        cache.invalidar(f"citas:medico:{medico_id}")
         self.db.refresh(cita)
         return cita
 
@@ -52,10 +61,24 @@ class CitaCRUD:
         self, skip: int = 0, limit: int = 1000, include_inactive: bool = False
     ) -> List[Cita]:
         """Obtener todas las citas con opción de incluir inactivas."""
+        query = self._consulta_citas(include_inactive)
+        return query.offset(skip).limit(limit).all()
+
+    def _consulta_citas(self, include_inactive: bool = False):
         query = self.db.query(Cita)
         if not include_inactive:
             query = query.filter(Cita.activo == True)
-        return query.offset(skip).limit(limit).all()
+        return query
+
+    def version_citas(
+        self, include_inactive: bool = False, skip: int = 0, limit: Optional[int] = None
+    ) -> Version:
+        """Versión (ETag) de la página del listado sin cargar citas."""
+        return version_lista(self._consulta_citas(include_inactive), Cita, skip, limit)
+
+    def version_cita(self, cita_id: UUID) -> Optional[Version]:
+        """Versión (ETag) de una cita sin cargarla."""
+        return version_entidad(self.db, Cita, cita_id)
 
     def obtener_cita(self, cita_id: UUID) -> Optional[Cita]:
         """Obtener una cita por ID."""
@@ -92,17 +115,26 @@ class CitaCRUD:
         )
 
     def actualizar_cita(
-        self, cita_id: UUID, id_usuario_edicion: Optional[UUID] = None, **kwargs
+        self,
+        cita_id: UUID,
+        id_usuario_edicion: Optional[UUID] = None,
+        version_esperada: Optional[int] = None,
+        **kwargs
     ) -> Optional[Cita]:
         """Actualizar una cita."""
         cita = self.obtener_cita(cita_id)
         if cita:
+            verificar_version(cita, version_esperada)
+            medico_anterior = cita.medico_id
             for key, value in kwargs.items():
                 if hasattr(cita, key):
                     setattr(cita, key, value)
             if id_usuario_edicion:
                 cita.id_usuario_edicion = id_usuario_edicion
-            self.db.commit()
+            confirmar_version(self.db, lambda: self.obtener_cita(cita_id))
+            cache.invalidar(
+                f"citas:medico:{medico_anterior}", f"citas:medico:{cita.medico_id}"
+            )
             self.db.refresh(cita)
         return cita
 
@@ -123,6 +155,7 @@ class CitaCRUD:
             return True
         cita.activo = False
         self.db.commit()
+        cache.invalidar(f"citas:medico:{cita.medico_id}")
         return True
 
     def reactivar_cita(self, cita_id: UUID) -> bool:
@@ -134,6 +167,7 @@ class CitaCRUD:
             return True
         cita.activo = True
         self.db.commit()
+        cache.invalidar(f"citas:medico:{cita.medico_id}")
         return True
 
     def eliminar_cita_permanente(self, cita_id: UUID) -> bool:
@@ -144,8 +178,10 @@ class CitaCRUD:
             if not cita:
                 raise ValueError(f"Cita con ID {cita_id} no encontrada")
             
+            medico_id = cita.medico_id
             self.db.delete(cita)
             self.db.commit()
+            cache.invalidar(f"citas:medico:{medico_id}")
             
             logging.info(f"Cita {cita_id} eliminada permanentemente")
             return True
@@ -1,8 +1,19 @@
-from typing import List, Optional
+from typing import Callable, List, Optional
 from uuid import UUID
 
+from database.replicas import en_primaria
 from entities.enfermera import Enfermera
 from sqlalchemy.orm import Session
+from utils.bus_invalidacion import publicar
+from utils.cache import cache
+from utils.condicional import (
+    Version,
+    confirmar_version,
+    verificar_version,
+    version_entidad,
+    version_lista,
+)
+from utils.directorio_personal import RegistroEnfermera, directorio_enfermeras
 
 
 class EnfermeraCRUD:
@@ -46,19 +57,18 @@ class EnfermeraCRUD:
             id_usuario_creacion=id_usuario_creacion,
         )
         self.db.add(enfermera)
+        publicar(self.db, "enfermera")
         self.db.commit()
+        directorio_enfermeras.invalidar()
         self.db.refresh(enfermera)
         return enfermera
 
-    def obtener_enfermeras(
-        self, 
-        skip: int = 0, 
-        limit: int = 1000, 
+    def _consulta_enfermeras(
+        self,
         include_inactive: bool = False,
         nombre: Optional[str] = None,
-        activo: Optional[bool] = None
-    ) -> List[Enfermera]:
-        """Obtener todas las enfermeras con opción de incluir inactivas y filtros de búsqueda."""
+        activo: Optional[bool] = None,
+    ):
         query = self.db.query(Enfermera)
         if not include_inactive:
             query = query.filter(Enfermera.activo == True)
@@ -71,9 +81,42 @@ class EnfermeraCRUD:
                 (Enfermera.nombre.ilike(f"%{nombre}%")) | 
                 (Enfermera.apellido.ilike(f"%{nombre}%"))
             )
-        
+        return query
+
+    def obtener_enfermeras(
+        self, 
+        skip: int = 0, 
+        limit: int = 1000, 
+        include_inactive: bool = False,
+        nombre: Optional[str] = None,
+        activo: Optional[bool] = None
+    ) -> List[Enfermera]:
+        """Obtener todas las enfermeras con opción de incluir inactivas y filtros de búsqueda."""
+        query = self._consulta_enfermeras(include_inactive, nombre, activo)
         return query.offset(skip).limit(limit).all()
 
+    def version_enfermeras(
+        self,
+        include_inactive: bool = False,
+        nombre: Optional[str] = None,
+        activo: Optional[bool] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+    ) -> Version:
+        """Versión (ETag) de la página del listado, sin cargar enfermeras."""
+        return version_lista(
+            self._consulta_enfermeras(include_inactive, nombre, activo),
+            Enfermera,
+            skip,
+            limit,
+        )
+
+    def version_enfermera(
+        self, enfermera_id: UUID
+    ) -> Optional[Version]:
+        """Versión (ETag) de una enfermera sin cargarla."""
+        return version_entidad(self.db, Enfermera, enfermera_id)
+
     def obtener_enfermera(self, enfermera_id: UUID) -> Optional[Enfermera]:
         """Obtener una enfermera por ID."""
         return self.db.query(Enfermera).filter(Enfermera.id == enfermera_id).first()
@@ -100,6 +143,43 @@ class EnfermeraCRUD:
             .all()
         )
 
+    def _cargar_en_primaria(self, consulta: Callable, *args):
+        """Ejecutar una consulta del CRUD en la primaria para llenar el directorio."""
+        return en_primaria(self.db, lambda db: consulta(EnfermeraCRUD(db), *args))
+
+    def obtener_del_directorio(
+        self, indice: str, valor, usar_cache: bool = True
+    ) -> Optional[RegistroEnfermera]:
+        """Obtener una enfermera del directorio en caché por id, email o número de licencia."""
+        cargadores = {
+            "id": EnfermeraCRUD.obtener_enfermera,
+            "email": EnfermeraCRUD.obtener_enfermera_por_email,
+            "numero_licencia": EnfermeraCRUD.obtener_enfermera_por_licencia,
+        }
+        if indice not in cargadores:
+            raise ValueError(f"Índice de directorio inválido: {indice}")
+        if indice == "email":
+            valor = valor.lower()
+        return directorio_enfermeras.obtener(
+            indice,
+            valor,
+            lambda: self._cargar_en_primaria(cargadores[indice], valor),
+            omitir=not usar_cache,
+        )
+
+    def listar_por_turno_directorio(
+        self, turno: str, usar_cache: bool = True
+    ) -> List[RegistroEnfermera]:
+        """Obtener las enfermeras activas de un turno desde el directorio en caché."""
+        return directorio_enfermeras.listar(
+            "turno",
+            turno,
+            lambda: self._cargar_en_primaria(
+                EnfermeraCRUD.obtener_enfermeras_por_turno, turno
+            ),
+            omitir=not usar_cache,
+        )
+
     def buscar_enfermeras_por_nombre(self, nombre: str) -> List[Enfermera]:
         """Buscar enfermeras por nombre."""
         return (
@@ -112,12 +192,17 @@ class EnfermeraCRUD:
         )
 
     def actualizar_enfermera(
-        self, enfermera_id: UUID, id_usuario_edicion: Optional[UUID] = None, **kwargs
+        self,
+        enfermera_id: UUID,
+        id_usuario_edicion: Optional[UUID] = None,
+        version_esperada: Optional[int] = None,
+        **kwargs
     ) -> Optional[Enfermera]:
         """Actualizar una enfermera."""
         enfermera = self.obtener_enfermera(enfermera_id)
         if not enfermera:
             return None
+        verificar_version(enfermera, version_esperada)
 
         if "nombre" in kwargs and kwargs["nombre"]:
             if len(kwargs["nombre"].strip()) == 0:
@@ -161,7 +246,9 @@ class EnfermeraCRUD:
         if id_usuario_edicion:
             enfermera.id_usuario_edicion = id_usuario_edicion
 
-        self.db.commit()
+        publicar(self.db, "enfermera", enfermera_id)
+        confirmar_version(self.db, lambda: self.obtener_enfermera(enfermera_id))
+        directorio_enfermeras.invalidar()
         self.db.refresh(enfermera)
         return enfermera
 
@@ -173,7 +260,9 @@ class EnfermeraCRUD:
         if not enfermera.activo:
             return True
         enfermera.activo = False
+        publicar(self.db, "enfermera", enfermera_id)
         self.db.commit()
+        directorio_enfermeras.invalidar()
         self.db.refresh(enfermera)
         return True
 
@@ -185,7 +274,9 @@ class EnfermeraCRUD:
         if enfermera.activo:
             return True
         enfermera.activo = True
+        publicar(self.db, "enfermera", enfermera_id)
         self.db.commit()
+        directorio_enfermeras.invalidar()
         self.db.refresh(enfermera)
         return True
 
@@ -228,7 +319,10 @@ class EnfermeraCRUD:
 
             # Eliminar la enfermera
             self.db.delete(enfermera)
+            publicar(self.db, "enfermera", enfermera_id)
             self.db.commit()
+            directorio_enfermeras.invalidar()
+            cache.invalidar("hospitalizaciones")
             
             logging.info(f"Enfermera {enfermera_id} eliminada permanentemente")
             return True
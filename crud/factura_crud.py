@@ -1,8 +1,53 @@
-from typing import List, Optional
+import csv
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, Optional, Tuple
 from uuid import UUID
 
+from crud.factura_resumen_crud import FacturaResumenCRUD
+from crud.facturacion_crud import _limites_periodo
 from entities.factura import Factura
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from utils.cache import cache
+from utils.condicional import (
+    Version,
+    confirmar_version,
+    verificar_version,
+    version_entidad,
+    version_lista,
+)
+from utils.numeracion import numeros_factura
+
+_SQL_ANTIGUEDAD = """
+    WITH saldos AS (
+        SELECT paciente_id,
+               GROUPING(paciente_id) = 1 AS es_total,
+               COUNT(*) AS cantidad,
+               COALESCE(SUM(total) FILTER (WHERE dias <= 30), 0) AS dias_0_30,
+               COALESCE(SUM(total) FILTER (WHERE dias BETWEEN 31 AND 60), 0) AS dias_31_60,
+               COALESCE(SUM(total) FILTER (WHERE dias BETWEEN 61 AND 90), 0) AS dias_61_90,
+               COALESCE(SUM(total) FILTER (WHERE dias > 90), 0) AS dias_90_mas,
+               COALESCE(SUM(total), 0) AS total
+        FROM (
+            SELECT paciente_id, total,
+                   CURRENT_DATE - CAST(fecha_vencimiento AS DATE) AS dias
+            FROM tbl_facturas
+            WHERE estado IN ('pendiente', 'vencida')
+              AND fecha_vencimiento < now()
+              AND activo IS NOT FALSE
+              {filtro_cursor}
+        ) vencidas
+        GROUP BY {agrupacion}
+        ORDER BY es_total DESC, paciente_id
+        LIMIT :limite
+    )
+    SELECT s.*, p.nombre, p.apellido
+    FROM saldos s
+    LEFT JOIN tbl_pacientes p ON p.id = s.paciente_id
+    ORDER BY s.es_total DESC, s.paciente_id
+"""
 
 
 class FacturaCRUD:
@@ -11,7 +56,7 @@ class FacturaCRUD:
 
     def crear_factura(
         self,
-        numero_factura: str,
+        numero_factura: Optional[str],
         fecha_emision,
         fecha_vencimiento,
         subtotal: float,
@@ -28,12 +73,14 @@ class FacturaCRUD:
         if not paciente:
             raise ValueError("El paciente especificado no existe")
 
-        if not numero_factura or len(numero_factura.strip()) == 0:
-            raise ValueError("El número de factura es obligatorio")
-
-        factura_existente = self.obtener_factura_por_numero(numero_factura)
-        if factura_existente:
-            raise ValueError("El número de factura ya está registrado")
+        if numero_factura is None:
+            numero_factura = numeros_factura.siguiente()
+        else:
+            if len(numero_factura.strip()) == 0:
+                raise ValueError("El número de factura es obligatorio")
+            factura_existente = self.obtener_factura_por_numero(numero_factura)
+            if factura_existente:
+                raise ValueError("El número de factura ya está registrado")
 
         if subtotal < 0:
             raise ValueError("El subtotal no puede ser negativo")
@@ -54,23 +101,79 @@ class FacturaCRUD:
             id_usuario_creacion=id_usuario_creacion,
         )
         self.db.add(factura)
-        self.db.commit()
+        FacturaResumenCRUD(self.db).registrar_cambios(
+            [(None, FacturaResumenCRUD.instantanea(factura))]
+        )
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise ValueError("El número de factura ya está registrado")
+        cache.invalidar("facturas")
         self.db.refresh(factura)
         return factura
 
+    def _registrar_resumen(self, anterior, factura: Factura) -> None:
+        """Propagar a los acumulados el cambio de una factura ya modificada."""
+        nuevo = FacturaResumenCRUD.instantanea(factura)
+        if anterior != nuevo:
+            FacturaResumenCRUD(self.db).registrar_cambios([(anterior, nuevo)])
+
     def obtener_facturas(
         self, skip: int = 0, limit: int = 1000, include_inactive: bool = False
     ) -> List[Factura]:
         """Obtener todas las facturas con opción de incluir inactivas."""
+        query = self._consulta_facturas(include_inactive)
+        return query.offset(skip).limit(limit).all()
+
+    def _consulta_facturas(self, include_inactive: bool = False):
         query = self.db.query(Factura)
         if not include_inactive:
             query = query.filter(Factura.activo == True)
-        return query.offset(skip).limit(limit).all()
+        return query
+
+    def version_facturas(
+        self, include_inactive: bool = False, skip: int = 0, limit: Optional[int] = None
+    ) -> Version:
+        """Versión (ETag) de la página del listado sin cargar facturas."""
+        return version_lista(
+            self._consulta_facturas(include_inactive), Factura, skip, limit
+        )
+
+    def version_factura(
+        self, factura_id: UUID
+    ) -> Optional[Version]:
+        """Versión (ETag) de una factura sin cargarla."""
+        return version_entidad(self.db, Factura, factura_id)
 
     def obtener_factura(self, factura_id: UUID) -> Optional[Factura]:
         """Obtener una factura por ID."""
         return self.db.query(Factura).filter(Factura.id == factura_id).first()
 
+    def obtener_factura_con_detalles(self, factura_id: UUID) -> Optional[Factura]:
+        """Obtener una factura con su paciente y detalles en una sola consulta."""
+        return (
+            self.db.query(Factura)
+            .options(joinedload(Factura.paciente), joinedload(Factura.detalles))
+            .filter(Factura.id == factura_id)
+            .first()
+        )
+
+    def obtener_facturas_periodo_con_detalles(self, periodo: str) -> List[Factura]:
+        """Obtener las facturas activas emitidas en un periodo (AAAA-MM) con sus detalles."""
+        desde, hasta = _limites_periodo(periodo)
+        return (
+            self.db.query(Factura)
+            .options(joinedload(Factura.paciente), selectinload(Factura.detalles))
+            .filter(
+                Factura.fecha_emision >= desde,
+                Factura.fecha_emision < hasta,
+                Factura.activo == True,
+            )
+            .order_by(Factura.numero_factura)
+            .all()
+        )
+
     def obtener_factura_por_numero(self, numero_factura: str) -> Optional[Factura]:
         """Obtener una factura por número."""
         return (
@@ -117,21 +220,239 @@ class FacturaCRUD:
             .all()
         )
 
+    def obtener_antiguedad_saldos(
+        self, despues_de: Optional[UUID] = None, limit: int = 1000
+    ) -> Tuple[Optional[dict], List[dict], Optional[UUID]]:
+        """
+        Obtener saldos vencidos por tramos de antigüedad (0-30, 31-60, 61-90, 90+ días).
+
+        Usa una sola consulta agrupada con paginación por cursor sobre paciente_id.
+        Los totales generales solo se calculan en la primera página.
+
+        Returns:
+            Tupla con (totales, filas por paciente, cursor de la siguiente página)
+        """
+        primera_pagina = despues_de is None
+        sql = _SQL_ANTIGUEDAD.format(
+            filtro_cursor="" if primera_pagina else "AND paciente_id > :despues_de",
+            agrupacion=(
+                "GROUPING SETS ((paciente_id), ())" if primera_pagina else "paciente_id"
+            ),
+        )
+        parametros = {"limite": limit + 1 + (1 if primera_pagina else 0)}
+        if not primera_pagina:
+            parametros["despues_de"] = despues_de
+
+        totales = None
+        filas = []
+        for fila in self.db.execute(text(sql), parametros).mappings():
+            datos = {
+                "paciente_id": fila["paciente_id"],
+                "nombre": (
+                    f"{fila['nombre']} {fila['apellido']}" if fila["nombre"] else None
+                ),
+                "cantidad": fila["cantidad"],
+                "dias_0_30": fila["dias_0_30"],
+                "dias_31_60": fila["dias_31_60"],
+                "dias_61_90": fila["dias_61_90"],
+                "dias_90_mas": fila["dias_90_mas"],
+                "total": fila["total"],
+            }
+            if fila["es_total"]:
+                totales = datos
+            else:
+                filas.append(datos)
+
+        siguiente = None
+        if len(filas) > limit:
+            filas = filas[:limit]
+            siguiente = filas[-1]["paciente_id"]
+        return totales, filas, siguiente
+
     def actualizar_factura(
-        self, factura_id: UUID, id_usuario_edicion: Optional[UUID] = None, **kwargs
+        self,
+        factura_id: UUID,
+        id_usuario_edicion: Optional[UUID] = None,
+        version_esperada: Optional[int] = None,
+        **kwargs
     ) -> Optional[Factura]:
         """Actualizar una factura."""
         factura = self.obtener_factura(factura_id)
         if factura:
+            verificar_version(factura, version_esperada)
+            anterior = FacturaResumenCRUD.instantanea(factura)
+            numero_anterior = factura.numero_factura
             for key, value in kwargs.items():
                 if hasattr(factura, key):
                     setattr(factura, key, value)
             if id_usuario_edicion:
                 factura.id_usuario_edicion = id_usuario_edicion
-            self.db.commit()
+            self._registrar_resumen(anterior, factura)
+            confirmar_version(self.db, lambda: self.obtener_factura(factura_id))
+            cache.invalidar(
+                "facturas",
+                f"factura:{numero_anterior}",
+                f"factura:{factura.numero_factura}",
+            )
             self.db.refresh(factura)
         return factura
 
+    def conciliar_pagos(
+        self, lineas: Iterable[str], id_usuario_edicion: Optional[UUID] = None
+    ) -> dict:
+        """
+        Conciliar un extracto bancario en CSV contra las facturas abiertas.
+
+        El CSV debe tener las columnas numero_factura y monto. Los pagos se
+        agrupan por número de factura en un diccionario, las facturas se
+        buscan por lotes y todas las que quedan cubiertas se marcan como
+        pagadas con un único UPDATE.
+        """
+        pagos = defaultdict(lambda: [Decimal("0"), []])
+        lineas_invalidas = []
+        lineas_procesadas = 0
+
+        lector = csv.DictReader(lineas)
+        if not lector.fieldnames or not {"numero_factura", "monto"} <= {
+            c.strip() for c in lector.fieldnames
+        }:
+            raise ValueError("El CSV debe tener las columnas numero_factura y monto")
+        lector.fieldnames = [c.strip() for c in lector.fieldnames]
+
+        for numero_linea, fila in enumerate(lector, start=2):
+            lineas_procesadas += 1
+            numero = (fila.get("numero_factura") or "").strip()
+            try:
+                monto = Decimal((fila.get("monto") or "").strip().replace(",", "."))
+            except InvalidOperation:
+                monto = None
+            if not numero or monto is None or not monto.is_finite() or monto <= 0:
+                lineas_invalidas.append({"linea": numero_linea, "contenido": fila})
+                continue
+            pagos[numero][0] += monto
+            pagos[numero][1].append(numero_linea)
+
+        facturas = {}
+        numeros = list(pagos)
+        for i in range(0, len(numeros), 10000):
+            for fila in self.db.execute(
+                text(
+                    """
+                    SELECT id, numero_factura, estado, activo, total,
+                           fecha_emision, paciente_id
+                    FROM tbl_facturas
+                    WHERE numero_factura = ANY(:numeros)
+                    """
+                ),
+                {"numeros": numeros[i : i + 10000]},
+            ).mappings():
+                facturas[fila["numero_factura"]] = fila
+
+        no_conciliadas, parciales, sobrepagos, por_pagar = [], [], [], {}
+        for numero, (monto, lineas_pago) in pagos.items():
+            factura = facturas.get(numero)
+            detalle = {
+                "numero_factura": numero,
+                "monto": monto,
+                "total_factura": factura["total"] if factura else None,
+                "lineas": lineas_pago,
+            }
+            if factura is None:
+                no_conciliadas.append({**detalle, "motivo": "factura no encontrada"})
+            elif factura["activo"] is False or factura["estado"] not in (
+                "pendiente",
+                "vencida",
+            ):
+                motivo = (
+                    "factura inactiva"
+                    if factura["activo"] is False
+                    else f"factura {factura['estado']}"
+                )
+                no_conciliadas.append({**detalle, "motivo": motivo})
+            elif monto < factura["total"]:
+                parciales.append({**detalle, "motivo": "pago parcial"})
+            else:
+                por_pagar[factura["id"]] = factura
+                if monto > factura["total"]:
+                    sobrepagos.append({**detalle, "motivo": "pago mayor al total"})
+
+        pagadas = []
+        if por_pagar:
+            try:
+                # El estado previo sale de la fila bloqueada, no de la lectura
+                # anterior: otra transacción pudo pasarla de pendiente a vencida
+                previos = {
+                    fila.id: fila.estado
+                    for fila in self.db.execute(
+                        text(
+                            """
+                            WITH previo AS (
+                                SELECT id, estado
+                                FROM tbl_facturas
+                                WHERE id = ANY(:ids)
+                                  AND estado IN ('pendiente', 'vencida')
+                                FOR UPDATE
+                            )
+                            UPDATE tbl_facturas AS f
+                            SET estado = 'pagada',
+                                fecha_actualizacion = now(),
+                                version = f.version + 1,
+                                id_usuario_edicion = COALESCE(:usuario, f.id_usuario_edicion)
+                            FROM previo
+                            WHERE f.id = previo.id
+                            RETURNING f.id, previo.estado
+                            """
+                        ),
+                        {"ids": list(por_pagar), "usuario": id_usuario_edicion},
+                    )
+                }
+                pagadas = list(previos)
+                cambios = []
+                for factura_id, estado_previo in previos.items():
+                    f = por_pagar[factura_id]
+                    total = Decimal(str(f["total"]))
+                    fecha = f["fecha_emision"].date()
+                    cambios.append(
+                        (
+                            (fecha, f["paciente_id"], estado_previo, total),
+                            (fecha, f["paciente_id"], "pagada", total),
+                        )
+                    )
+                FacturaResumenCRUD(self.db).registrar_cambios(cambios)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+            cache.invalidar(
+                "facturas",
+                *(f"factura:{por_pagar[i]['numero_factura']}" for i in pagadas),
+            )
+
+            for factura_id in set(por_pagar) - set(pagadas):
+                numero = por_pagar[factura_id]["numero_factura"]
+                no_conciliadas.append(
+                    {
+                        "numero_factura": numero,
+                        "monto": pagos[numero][0],
+                        "total_factura": por_pagar[factura_id]["total"],
+                        "lineas": pagos[numero][1],
+                        "motivo": "la factura cambió de estado durante la conciliación",
+                    }
+                )
+
+        return {
+            "lineas_procesadas": lineas_procesadas,
+            "facturas_pagadas": len(pagadas),
+            "monto_aplicado": sum(
+                (pagos[por_pagar[i]["numero_factura"]][0] for i in pagadas),
+                Decimal("0"),
+            ),
+            "no_conciliadas": no_conciliadas,
+            "pagos_parciales": parciales,
+            "sobrepagos": sobrepagos,
+            "lineas_invalidas": lineas_invalidas,
+        }
+
     def pagar_factura(
         self, factura_id: UUID, id_usuario_edicion: UUID
     ) -> Optional[Factura]:
@@ -159,8 +480,11 @@ class FacturaCRUD:
             return False
         if not factura.activo:
             return True
+        anterior = FacturaResumenCRUD.instantanea(factura)
         factura.activo = False
+        self._registrar_resumen(anterior, factura)
         self.db.commit()
+        cache.invalidar("facturas", f"factura:{factura.numero_factura}")
         return True
 
     def reactivar_factura(self, factura_id: UUID) -> bool:
@@ -170,8 +494,11 @@ class FacturaCRUD:
             return False
         if factura.activo:
             return True
+        anterior = FacturaResumenCRUD.instantanea(factura)
         factura.activo = True
+        self._registrar_resumen(anterior, factura)
         self.db.commit()
+        cache.invalidar("facturas", f"factura:{factura.numero_factura}")
         return True
 
     def eliminar_factura_permanente(self, factura_id: UUID) -> bool:
@@ -188,9 +515,20 @@ class FacturaCRUD:
             detalles = self.db.query(FacturaDetalle).filter(FacturaDetalle.factura_id == factura_id).all()
             for detalle in detalles:
                 self.db.delete(detalle)
+
+            # Liberar los servicios facturados para que una corrida pueda volver a facturarlos
+            from entities.factura_origen import FacturaOrigen
+            self.db.query(FacturaOrigen).filter(
+                FacturaOrigen.factura_id == factura_id
+            ).delete(synchronize_session=False)
             
+            FacturaResumenCRUD(self.db).registrar_cambios(
+                [(FacturaResumenCRUD.instantanea(factura), None)]
+            )
+            numero_factura = factura.numero_factura
             self.db.delete(factura)
             self.db.commit()
+            cache.invalidar("facturas", f"factura:{numero_factura}")
             
             logging.info(f"Factura {factura_id} eliminada permanentemente")
             return True
@@ -3,6 +3,7 @@ from uuid import UUID
 
 from entities.factura_detalle import FacturaDetalle
 from sqlalchemy.orm import Session
+from utils.condicional import confirmar_version
 
 
 class FacturaDetalleCRUD:
@@ -86,7 +87,7 @@ class FacturaDetalleCRUD:
                     setattr(detalle, key, value)
             if id_usuario_edicion:
                 detalle.id_usuario_edicion = id_usuario_edicion
-            self.db.commit()
+            confirmar_version(self.db, lambda: self.obtener_detalle(detalle_id))
             self.db.refresh(detalle)
         return detalle
 
@@ -0,0 +1,233 @@
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from database.config import SessionLocal
+from entities.factura import Factura
+from entities.factura_resumen import FacturaResumenDiario, FacturaResumenPaciente
+from sqlalchemy import case, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+AGRUPACIONES_RESUMEN = ("dia", "mes", "estado", "paciente")
+
+
+class FacturaResumenCRUD:
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def instantanea(factura: Factura) -> Optional[Tuple]:
+        """
+        Obtener los datos de una factura que afectan a los acumulados.
+
+        Devuelve None si la factura no cuenta (inactiva).
+        """
+        if factura is None or factura.activo is False:
+            return None
+        return (
+            factura.fecha_emision.date(),
+            factura.paciente_id,
+            factura.estado or "pendiente",
+            Decimal(str(factura.total or 0)),
+        )
+
+    def registrar_cambios(
+        self, cambios: Iterable[Tuple[Optional[Tuple], Optional[Tuple]]]
+    ) -> None:
+        """
+        Aplicar a los acumulados los cambios (anterior, nuevo) de varias facturas.
+
+        Los deltas se agregan en memoria y se escriben con un único upsert por
+        tabla dentro de la transacción actual; el commit lo hace el llamador.
+        """
+        diario = defaultdict(lambda: [0, Decimal("0")])
+        por_paciente = defaultdict(lambda: [0, Decimal("0")])
+
+        for anterior, nuevo in cambios:
+            if anterior == nuevo:
+                continue
+            for datos, signo in ((anterior, -1), (nuevo, 1)):
+                if datos is None:
+                    continue
+                fecha, paciente_id, estado, total = datos
+                for acumulado in (
+                    diario[(fecha, estado)],
+                    por_paciente[(paciente_id, estado)],
+                ):
+                    acumulado[0] += signo
+                    acumulado[1] += signo * total
+
+        self._aplicar_deltas(
+            FacturaResumenDiario,
+            [
+                {"fecha": fecha, "estado": estado, "cantidad": c, "monto_total": m}
+                for (fecha, estado), (c, m) in diario.items()
+                if c or m
+            ],
+        )
+        self._aplicar_deltas(
+            FacturaResumenPaciente,
+            [
+                {"paciente_id": pid, "estado": estado, "cantidad": c, "monto_total": m}
+                for (pid, estado), (c, m) in por_paciente.items()
+                if c or m
+            ],
+        )
+
+    def _aplicar_deltas(self, modelo, filas: List[dict]) -> None:
+        """Sumar deltas a una tabla de acumulados con INSERT ... ON CONFLICT."""
+        if not filas:
+            return
+        stmt = insert(modelo).values(filas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[c.name for c in modelo.__table__.primary_key.columns],
+            set_={
+                "cantidad": modelo.cantidad + stmt.excluded.cantidad,
+                "monto_total": modelo.monto_total + stmt.excluded.monto_total,
+                "fecha_actualizacion": func.now(),
+            },
+        )
+        self.db.execute(stmt)
+
+    def recalcular(self) -> dict:
+        """
+        Reconstruir los acumulados desde tbl_facturas.
+
+        Se ejecuta en una sola transacción con un bloqueo EXCLUSIVE sobre las
+        tablas de acumulados: las lecturas del resumen siguen viendo los datos
+        anteriores hasta el commit y los upserts incrementales esperan.
+        """
+        try:
+            self.db.execute(
+                text(
+                    "LOCK TABLE tbl_facturas_resumen_diario, "
+                    "tbl_facturas_resumen_paciente IN EXCLUSIVE MODE"
+                )
+            )
+            self.db.execute(text("DELETE FROM tbl_facturas_resumen_diario"))
+            self.db.execute(text("DELETE FROM tbl_facturas_resumen_paciente"))
+            diario = self.db.execute(
+                text(
+                    """
+                    INSERT INTO tbl_facturas_resumen_diario
+                        (fecha, estado, cantidad, monto_total, fecha_actualizacion)
+                    SELECT CAST(fecha_emision AS DATE), COALESCE(estado, 'pendiente'),
+                           COUNT(*), COALESCE(SUM(total), 0), now()
+                    FROM tbl_facturas
+                    WHERE activo IS NOT FALSE
+                    GROUP BY 1, 2
+                    """
+                )
+            )
+            pacientes = self.db.execute(
+                text(
+                    """
+                    INSERT INTO tbl_facturas_resumen_paciente
+                        (paciente_id, estado, cantidad, monto_total, fecha_actualizacion)
+                    SELECT paciente_id, COALESCE(estado, 'pendiente'),
+                           COUNT(*), COALESCE(SUM(total), 0), now()
+                    FROM tbl_facturas
+                    WHERE activo IS NOT FALSE
+                    GROUP BY 1, 2
+                    """
+                )
+            )
+            self.db.commit()
+            return {
+                "filas_diario": diario.rowcount,
+                "filas_paciente": pacientes.rowcount,
+            }
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def obtener_resumen(
+        self,
+        agrupacion: str,
+        fecha_desde=None,
+        fecha_hasta=None,
+        paciente_id: Optional[UUID] = None,
+        skip: int = 0,
+        limit: int = 1000,
+    ) -> List[dict]:
+        """Obtener montos facturados, pendientes y pagados desde los acumulados."""
+        if agrupacion not in AGRUPACIONES_RESUMEN:
+            raise ValueError(
+                f"Agrupación inválida. Valores posibles: {', '.join(AGRUPACIONES_RESUMEN)}"
+            )
+
+        if agrupacion == "paciente":
+            modelo = FacturaResumenPaciente
+            clave = FacturaResumenPaciente.paciente_id
+        else:
+            modelo = FacturaResumenDiario
+            if agrupacion == "dia":
+                clave = FacturaResumenDiario.fecha
+            elif agrupacion == "mes":
+                clave = func.to_char(FacturaResumenDiario.fecha, "YYYY-MM")
+            else:
+                clave = FacturaResumenDiario.estado
+
+        query = self.db.query(
+            clave.label("clave"),
+            func.sum(modelo.cantidad).label("cantidad"),
+            func.sum(
+                case((modelo.estado != "cancelada", modelo.monto_total), else_=0)
+            ).label("monto_facturado"),
+            func.sum(
+                case(
+                    (modelo.estado.in_(("pendiente", "vencida")), modelo.monto_total),
+                    else_=0,
+                )
+            ).label("monto_pendiente"),
+            func.sum(
+                case((modelo.estado == "pagada", modelo.monto_total), else_=0)
+            ).label("monto_pagado"),
+        )
+
+        if modelo is FacturaResumenDiario:
+            if paciente_id:
+                raise ValueError(
+                    "El filtro por paciente solo aplica a la agrupación 'paciente'"
+                )
+            if fecha_desde:
+                query = query.filter(FacturaResumenDiario.fecha >= fecha_desde)
+            if fecha_hasta:
+                query = query.filter(FacturaResumenDiario.fecha <= fecha_hasta)
+        else:
+            if fecha_desde or fecha_hasta:
+                raise ValueError("La agrupación 'paciente' no admite filtros de fecha")
+            if paciente_id:
+                query = query.filter(FacturaResumenPaciente.paciente_id == paciente_id)
+
+        filas = (
+            query.group_by(clave)
+            .having(func.sum(modelo.cantidad) != 0)
+            .order_by(clave)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        return [
+            {
+                "clave": str(fila.clave),
+                "cantidad": int(fila.cantidad or 0),
+                "monto_facturado": fila.monto_facturado or 0,
+                "monto_pendiente": fila.monto_pendiente or 0,
+                "monto_pagado": fila.monto_pagado or 0,
+            }
+            for fila in filas
+        ]
+
+
+def recalcular_resumen_facturas() -> None:
+    """Tarea programada: reconstruir los acumulados con una sesión propia."""
+    db = SessionLocal()
+    try:
+        resultado = FacturaResumenCRUD(db).recalcular()
+        logging.info(f"Resumen de facturas recalculado: {resultado}")
+    finally:
+        db.close()
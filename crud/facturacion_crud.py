@@ -0,0 +1,342 @@
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from crud.factura_resumen_crud import FacturaResumenCRUD
+from database.config import SessionLocal
+from entities.corrida_facturacion import CorridaFacturacion
+from entities.factura import Factura
+from entities.factura_detalle import FacturaDetalle
+from entities.factura_origen import FacturaOrigen
+from entities.tarifa import Tarifa
+from sqlalchemy import insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from utils.cache import cache
+from utils.numeracion import numeros_factura
+
+TAMANO_LOTE = int(os.getenv("FACTURACION_TAMANO_LOTE", 500))
+DIAS_VENCIMIENTO = int(os.getenv("FACTURACION_DIAS_VENCIMIENTO", 30))
+
+CENTAVOS = Decimal("0.01")
+
+# Servicios completados del periodo que todavía no tienen factura (anti-join
+# contra tbl_facturas_origen). Se toma un lote de pacientes completos para que
+# cada paciente reciba una sola factura por lote.
+_SQL_PENDIENTES = """
+    WITH pendientes AS (
+        SELECT 'cita' AS tipo_origen, c.id AS origen_id, c.paciente_id,
+               c.fecha_cita AS fecha, c.motivo AS descripcion,
+               1 AS cantidad, m.especialidad
+        FROM tbl_citas c
+        JOIN tbl_medicos m ON m.id = c.medico_id
+        WHERE c.estado = 'completada'
+          AND c.activo IS NOT FALSE
+          AND c.fecha_cita >= :desde AND c.fecha_cita < :hasta
+          AND NOT EXISTS (
+              SELECT 1 FROM tbl_facturas_origen o
+              WHERE o.tipo_origen = 'cita' AND o.origen_id = c.id
+          )
+        UNION ALL
+        SELECT 'hospitalizacion', h.id, h.paciente_id,
+               h.fecha_salida, h.motivo,
+               GREATEST(1, CEIL(EXTRACT(EPOCH FROM h.fecha_salida - h.fecha_ingreso) / 86400)),
+               NULL
+        FROM tbl_hospitalizaciones h
+        WHERE h.estado = 'completada'
+          AND h.activo IS NOT FALSE
+          AND h.fecha_salida >= :desde AND h.fecha_salida < :hasta
+          AND NOT EXISTS (
+              SELECT 1 FROM tbl_facturas_origen o
+              WHERE o.tipo_origen = 'hospitalizacion' AND o.origen_id = h.id
+          )
+    ),
+    lote AS (
+        SELECT DISTINCT paciente_id FROM pendientes ORDER BY paciente_id LIMIT :lote
+    )
+    SELECT p.*
+    FROM pendientes p
+    JOIN lote USING (paciente_id)
+    ORDER BY p.paciente_id, p.fecha
+"""
+
+
+def _limites_periodo(periodo: str) -> Tuple[datetime, datetime]:
+    """Convertir 'AAAA-MM' en el rango [inicio, inicio del mes siguiente)."""
+    try:
+        desde = datetime.strptime(periodo, "%Y-%m")
+    except ValueError:
+        raise ValueError("El periodo debe tener el formato AAAA-MM")
+    if desde.month == 12:
+        hasta = desde.replace(year=desde.year + 1, month=1)
+    else:
+        hasta = desde.replace(month=desde.month + 1)
+    return desde, hasta
+
+
+class FacturacionCRUD:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def obtener_corrida(self, periodo: str) -> Optional[CorridaFacturacion]:
+        """Obtener la corrida de un periodo."""
+        return (
+            self.db.query(CorridaFacturacion)
+            .filter(CorridaFacturacion.periodo == periodo)
+            .first()
+        )
+
+    def iniciar_corrida(
+        self, periodo: str, id_usuario_creacion: Optional[UUID] = None
+    ) -> CorridaFacturacion:
+        """
+        Registrar (o retomar) la corrida de un periodo.
+
+        Una corrida completada no se vuelve a ejecutar; una fallida o
+        interrumpida vuelve a quedar en proceso y continúa donde quedó.
+        """
+        _limites_periodo(periodo)
+        self.db.execute(
+            pg_insert(CorridaFacturacion)
+            .values(
+                id=uuid.uuid4(),
+                periodo=periodo,
+                estado="en_proceso",
+                facturas_generadas=0,
+                items_facturados=0,
+                id_usuario_creacion=id_usuario_creacion,
+            )
+            .on_conflict_do_nothing(index_elements=["periodo"])
+        )
+        corrida = self.obtener_corrida(periodo)
+        if corrida.estado == "fallida":
+            corrida.estado = "en_proceso"
+            corrida.error = None
+            corrida.id_usuario_edicion = id_usuario_creacion
+        self.db.commit()
+        self.db.refresh(corrida)
+        return corrida
+
+    def _cargar_tarifas(self) -> Dict[Tuple[str, Optional[str]], Tarifa]:
+        """
+        Cargar las tarifas activas indexadas por (tipo_origen, especialidad).
+
+        Si varias tarifas activas comparten la clave se usa la creada más
+        recientemente (y, a igual fecha, la de menor código).
+        """
+        tarifas = {}
+        for t in (
+            self.db.query(Tarifa)
+            .filter(Tarifa.activo == True)
+            .order_by(Tarifa.fecha_creacion.desc(), Tarifa.codigo)
+            .all()
+        ):
+            tarifas.setdefault((t.tipo_origen, t.especialidad), t)
+        for tipo in ("cita", "hospitalizacion"):
+            if (tipo, None) not in tarifas:
+                raise ValueError(f"No hay una tarifa general activa para '{tipo}'")
+        return tarifas
+
+    @staticmethod
+    def _calcular_detalles(
+        items: List[dict], tarifas
+    ) -> Tuple[List[dict], Decimal, Decimal]:
+        """
+        Calcular detalles, subtotal e impuestos de los servicios de un paciente.
+
+        Trabaja por columnas (cantidades, precios, porcentajes) con Decimal y
+        redondeo a centavos en cada línea.
+        """
+        tarifas_items = [
+            tarifas.get((i["tipo_origen"], i["especialidad"]))
+            or tarifas[(i["tipo_origen"], None)]
+            for i in items
+        ]
+        cantidades = [Decimal(str(i["cantidad"])) for i in items]
+        precios = [t.precio_unitario for t in tarifas_items]
+        subtotales = [
+            (c * p).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+            for c, p in zip(cantidades, precios)
+        ]
+        impuestos = [
+            (s * t.porcentaje_impuesto / 100).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+            for s, t in zip(subtotales, tarifas_items)
+        ]
+        detalles = [
+            {
+                "descripcion": f"{t.descripcion} - {i['descripcion']}"[:255],
+                "cantidad": c,
+                "precio_unitario": p,
+                "subtotal": s,
+            }
+            for i, t, c, p, s in zip(
+                items, tarifas_items, cantidades, precios, subtotales
+            )
+        ]
+        return detalles, sum(subtotales, Decimal("0")), sum(impuestos, Decimal("0"))
+
+    def _procesar_lote(
+        self, corrida: CorridaFacturacion, desde: datetime, hasta: datetime, tarifas
+    ) -> Tuple[int, int]:
+        """
+        Facturar un lote de pacientes en una transacción.
+
+        El bloqueo consultivo por periodo serializa los lotes de corridas
+        concurrentes, así que el anti-join siempre ve los lotes ya confirmados.
+
+        Returns:
+            Tupla con (facturas generadas, servicios facturados)
+        """
+        try:
+            self.db.execute(
+                text("SELECT pg_advisory_xact_lock(hashtext(:clave))"),
+                {"clave": f"facturacion:{corrida.periodo}"},
+            )
+            items = [
+                dict(fila)
+                for fila in self.db.execute(
+                    text(_SQL_PENDIENTES),
+                    {"desde": desde, "hasta": hasta, "lote": TAMANO_LOTE},
+                ).mappings()
+            ]
+            if not items:
+                self.db.rollback()
+                return 0, 0
+
+            por_paciente = [
+                (paciente_id, list(grupo))
+                for paciente_id, grupo in groupby(items, key=lambda i: i["paciente_id"])
+            ]
+            numeros = numeros_factura.siguientes(len(por_paciente))
+            ahora = datetime.now()
+            vencimiento = ahora + timedelta(days=DIAS_VENCIMIENTO)
+
+            facturas, detalles, origenes, cambios = [], [], [], []
+            for (paciente_id, items_paciente), numero in zip(por_paciente, numeros):
+                factura_id = uuid.uuid4()
+                lineas, subtotal, impuestos = self._calcular_detalles(
+                    items_paciente, tarifas
+                )
+                total = subtotal + impuestos
+                facturas.append(
+                    {
+                        "id": factura_id,
+                        "numero_factura": numero,
+                        "fecha_emision": ahora,
+                        "fecha_vencimiento": vencimiento,
+                        "subtotal": subtotal,
+                        "impuestos": impuestos,
+                        "total": total,
+                        "estado": "pendiente",
+                        "notas": f"Facturación del periodo {corrida.periodo}",
+                        "activo": True,
+                        "paciente_id": paciente_id,
+                        "id_usuario_creacion": corrida.id_usuario_creacion,
+                    }
+                )
+                detalles.extend(
+                    {
+                        **linea,
+                        "id": uuid.uuid4(),
+                        "activo": True,
+                        "factura_id": factura_id,
+                        "id_usuario_creacion": corrida.id_usuario_creacion,
+                    }
+                    for linea in lineas
+                )
+                origenes.extend(
+                    {
+                        "id": uuid.uuid4(),
+                        "tipo_origen": i["tipo_origen"],
+                        "origen_id": i["origen_id"],
+                        "factura_id": factura_id,
+                        "corrida_id": corrida.id,
+                    }
+                    for i in items_paciente
+                )
+                cambios.append((None, (ahora.date(), paciente_id, "pendiente", total)))
+
+            # Inserciones multi-fila (insertmanyvalues agrupa las filas por sentencia)
+            self.db.execute(insert(Factura), facturas)
+            self.db.execute(insert(FacturaDetalle), detalles)
+            self.db.execute(insert(FacturaOrigen), origenes)
+            FacturaResumenCRUD(self.db).registrar_cambios(cambios)
+
+            self.db.execute(
+                text(
+                    """
+                    UPDATE tbl_corridas_facturacion
+                    SET facturas_generadas = facturas_generadas + :facturas,
+                        items_facturados = items_facturados + :items,
+                        fecha_actualizacion = now()
+                    WHERE id = :id
+                    """
+                ),
+                {"facturas": len(facturas), "items": len(origenes), "id": corrida.id},
+            )
+            self.db.commit()
+            if facturas:
+                cache.invalidar("facturas")
+            return len(facturas), len(origenes)
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def ejecutar_corrida(
+        self, periodo: str, id_usuario_creacion: Optional[UUID] = None
+    ) -> CorridaFacturacion:
+        """
+        Facturar todas las citas y hospitalizaciones completadas del periodo.
+
+        Es idempotente por periodo y se puede reanudar: cada lote se confirma
+        por separado y los servicios ya facturados quedan fuera del anti-join.
+        """
+        desde, hasta = _limites_periodo(periodo)
+        corrida = self.iniciar_corrida(periodo, id_usuario_creacion)
+        if corrida.estado == "completada":
+            return corrida
+
+        try:
+            tarifas = self._cargar_tarifas()
+            while True:
+                generadas, _ = self._procesar_lote(corrida, desde, hasta, tarifas)
+                if generadas == 0:
+                    break
+            corrida = self.obtener_corrida(periodo)
+            corrida.estado = "completada"
+            corrida.fecha_fin = datetime.now()
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logging.error(f"Error en la corrida de facturación {periodo}: {str(e)}")
+            corrida = self.obtener_corrida(periodo)
+            corrida.estado = "fallida"
+            corrida.error = str(e)[:1000]
+            self.db.commit()
+            raise
+        self.db.refresh(corrida)
+        return corrida
+
+
+def ejecutar_corrida_facturacion(
+    periodo: str, id_usuario_creacion: Optional[UUID] = None
+) -> None:
+    """Ejecutar una corrida con una sesión propia (tareas en segundo plano)."""
+    db = SessionLocal()
+    try:
+        FacturacionCRUD(db).ejecutar_corrida(periodo, id_usuario_creacion)
+    except Exception as e:
+        logging.error(f"Corrida de facturación {periodo} fallida: {str(e)}")
+    finally:
+        db.close()
+
+
+def facturar_mes_anterior() -> None:
+    """Tarea programada: facturar el mes anterior (no repite periodos completados)."""
+    primer_dia = datetime.now().replace(day=1)
+    ejecutar_corrida_facturacion((primer_dia - timedelta(days=1)).strftime("%Y-%m"))
@@ -3,6 +3,7 @@ from uuid import UUID
 
 from entities.historial_entrada import HistorialEntrada
 from sqlalchemy.orm import Session
+from utils.condicional import confirmar_version
 
 
 class HistorialEntradaCRUD:
@@ -118,7 +119,7 @@ class HistorialEntradaCRUD:
                     setattr(entrada, key, value)
             if id_usuario_edicion:
                 entrada.id_usuario_edicion = id_usuario_edicion
-            self.db.commit()
+            confirmar_version(self.db, lambda: self.obtener_entrada(entrada_id))
             self.db.refresh(entrada)
         return entrada
 
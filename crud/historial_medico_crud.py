@@ -2,7 +2,17 @@ from typing import List, Optional
 from uuid import UUID
 
 from entities.historial_medico import HistorialMedico
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from utils.cache import cache
+from utils.condicional import (
+    Version,
+    confirmar_version,
+    verificar_version,
+    version_entidad,
+    version_lista,
+)
+from utils.numeracion import numeros_historial
 
 
 class HistorialMedicoCRUD:
@@ -11,7 +21,7 @@ class HistorialMedicoCRUD:
 
     def crear_historial(
         self,
-        numero_historial: str,
+        numero_historial: Optional[str],
         paciente_id: UUID,
         id_usuario_creacion: Optional[UUID] = None,
         notas_generales: str = None,
@@ -23,17 +33,19 @@ class HistorialMedicoCRUD:
         if not paciente:
             raise ValueError("El paciente especificado no existe")
 
-        if not numero_historial or len(numero_historial.strip()) == 0:
-            raise ValueError("El número de historial es obligatorio")
-
-        historial_existente = self.obtener_historial_por_numero(numero_historial)
-        if historial_existente:
-            raise ValueError("El número de historial ya está registrado")
-
         historial_paciente = self.obtener_historial_por_paciente(paciente_id)
         if historial_paciente and historial_paciente.activo:
             raise ValueError("El paciente ya tiene un historial médico activo")
 
+        if numero_historial is None:
+            numero_historial = numeros_historial.siguiente()
+        else:
+            if len(numero_historial.strip()) == 0:
+                raise ValueError("El número de historial es obligatorio")
+            historial_existente = self.obtener_historial_por_numero(numero_historial)
+            if historial_existente:
+                raise ValueError("El número de historial ya está registrado")
+
         historial = HistorialMedico(
             numero_historial=numero_historial.strip(),
             paciente_id=paciente_id,
@@ -41,7 +53,12 @@ class HistorialMedicoCRUD:
             id_usuario_creacion=id_usuario_creacion,
         )
         self.db.add(historial)
-        self.db.commit()
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise ValueError("El número de historial ya está registrado")
+        cache.invalidar(f"historiales:paciente:{paciente_id}")
         self.db.refresh(historial)
         return historial
 
@@ -49,10 +66,28 @@ class HistorialMedicoCRUD:
         self, skip: int = 0, limit: int = 1000, include_inactive: bool = False
     ) -> List[HistorialMedico]:
         """Obtener todos los historiales médicos con opción de incluir inactivos."""
+        query = self._consulta_historiales(include_inactive)
+        return query.offset(skip).limit(limit).all()
+
+    def _consulta_historiales(self, include_inactive: bool = False):
         query = self.db.query(HistorialMedico)
         if not include_inactive:
             query = query.filter(HistorialMedico.activo == True)
-        return query.offset(skip).limit(limit).all()
+        return query
+
+    def version_historiales(
+        self, include_inactive: bool = False, skip: int = 0, limit: Optional[int] = None
+    ) -> Version:
+        """Versión (ETag) de la página del listado sin cargar historiales médicos."""
+        return version_lista(
+            self._consulta_historiales(include_inactive), HistorialMedico, skip, limit
+        )
+
+    def version_historial(
+        self, historial_id: UUID
+    ) -> Optional[Version]:
+        """Versión (ETag) de un historial médico sin cargarlo."""
+        return version_entidad(self.db, HistorialMedico, historial_id)
 
     def obtener_historial(self, historial_id: UUID) -> Optional[HistorialMedico]:
         """Obtener un historial médico por ID."""
@@ -105,17 +140,23 @@ class HistorialMedicoCRUD:
         )
 
     def actualizar_historial(
-        self, historial_id: UUID, id_usuario_edicion: Optional[UUID] = None, **kwargs
+        self,
+        historial_id: UUID,
+        id_usuario_edicion: Optional[UUID] = None,
+        version_esperada: Optional[int] = None,
+        **kwargs
     ) -> Optional[HistorialMedico]:
         """Actualizar un historial médico."""
         historial = self.obtener_historial(historial_id)
         if historial:
+            verificar_version(historial, version_esperada)
             for key, value in kwargs.items():
                 if hasattr(historial, key):
                     setattr(historial, key, value)
             if id_usuario_edicion:
                 historial.id_usuario_edicion = id_usuario_edicion
-            self.db.commit()
+            confirmar_version(self.db, lambda: self.obtener_historial(historial_id))
+            cache.invalidar(f"historiales:paciente:{historial.paciente_id}")
             self.db.refresh(historial)
         return historial
 
@@ -144,6 +185,7 @@ class HistorialMedicoCRUD:
             return True
         historial.activo = False
         self.db.commit()
+        cache.invalidar(f"historiales:paciente:{historial.paciente_id}")
         return True
 
     def reactivar_historial(self, historial_id: UUID) -> bool:
@@ -155,6 +197,7 @@ class HistorialMedicoCRUD:
             return True
         historial.activo = True
         self.db.commit()
+        cache.invalidar(f"historiales:paciente:{historial.paciente_id}")
         return True
 
     def eliminar_historial_permanente(self, historial_id: UUID) -> bool:
@@ -166,8 +209,10 @@ class HistorialMedicoCRUD:
                 raise ValueError(f"Historial médico con ID {historial_id} no encontrado")
             
             # Las entradas se eliminan automáticamente por cascade
+            paciente_id = historial.paciente_id
             self.db.delete(historial)
             self.db.commit()
+            cache.invalidar(f"historiales:paciente:{paciente_id}")
             
             logging.info(f"Historial médico {historial_id} eliminado permanentemente")
             return True
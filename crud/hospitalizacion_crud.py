@@ -2,11 +2,19 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
-from entities.enfermera import Enfermera
+from crud.enfermera_crud import EnfermeraCRUD
+from crud.medico_crud import MedicoCRUD
 from entities.hospitalizacion import Hospitalizacion
-from entities.medico import Medico
 from entities.paciente import Paciente
 from sqlalchemy.orm import Session
+from utils.cache import cache
+from utils.condicional import (
+    Version,
+    confirmar_version,
+    verificar_version,
+    version_entidad,
+    version_lista,
+)
 
 
 class HospitalizacionCRUD:
@@ -30,13 +38,13 @@ class HospitalizacionCRUD:
         if not paciente:
             raise ValueError("El paciente especificado no existe")
 
-        medico = self.db.query(Medico).filter(Medico.id == medico_id).first()
+        medico = MedicoCRUD(self.db).obtener_del_directorio("id", medico_id)
         if not medico:
             raise ValueError("El médico especificado no existe")
 
         if enfermera_id:
-            enfermera = (
-                self.db.query(Enfermera).filter(Enfermera.id == enfermera_id).first()
+            enfermera = EnfermeraCRUD(self.db).obtener_del_directorio(
+                "id", enfermera_id
             )
             if not enfermera:
                 raise ValueError("La enfermera especificada no existe")
@@ -76,6 +84,7 @@ class HospitalizacionCRUD:
         )
         self.db.add(hospitalizacion)
         self.db.commit()
+        cache.invalidar("hospitalizaciones")
         self.db.refresh(hospitalizacion)
         return hospitalizacion
 
@@ -83,10 +92,31 @@ class HospitalizacionCRUD:
         self, skip: int = 0, limit: int = 1000, include_inactive: bool = False
     ) -> List[Hospitalizacion]:
         """Obtener todas las hospitalizaciones con opción de incluir inactivas."""
+        query = self._consulta_hospitalizaciones(include_inactive)
+        return query.offset(skip).limit(limit).all()
+
+    def _consulta_hospitalizaciones(self, include_inactive: bool = False):
         query = self.db.query(Hospitalizacion)
         if not include_inactive:
             query = query.filter(Hospitalizacion.activo == True)
-        return query.offset(skip).limit(limit).all()
+        return query
+
+    def version_hospitalizaciones(
+        self, include_inactive: bool = False, skip: int = 0, limit: Optional[int] = None
+    ) -> Version:
+        """Versión (ETag) de la página del listado sin cargar hospitalizaciones."""
+        return version_lista(
+            self._consulta_hospitalizaciones(include_inactive),
+            Hospitalizacion,
+            skip,
+            limit,
+        )
+
+    def version_hospitalizacion(
+        self, hospitalizacion_id: UUID
+    ) -> Optional[Version]:
+        """Versión (ETag) de una hospitalización sin cargarla."""
+        return version_entidad(self.db, Hospitalizacion, hospitalizacion_id)
 
     def obtener_hospitalizacion(
         self, hospitalizacion_id: UUID
@@ -150,12 +180,14 @@ class HospitalizacionCRUD:
         self,
         hospitalizacion_id: UUID,
         id_usuario_edicion: Optional[UUID] = None,
+        version_esperada: Optional[int] = None,
         **kwargs
     ) -> Optional[Hospitalizacion]:
         """Actualizar una hospitalización."""
         hospitalizacion = self.obtener_hospitalizacion(hospitalizacion_id)
         if not hospitalizacion:
             return None
+        verificar_version(hospitalizacion, version_esperada)
 
         if "motivo" in kwargs:
             motivo = kwargs["motivo"]
@@ -181,7 +213,8 @@ class HospitalizacionCRUD:
         for key, value in kwargs.items():
             if hasattr(hospitalizacion, key):
                 setattr(hospitalizacion, key, value)
-        self.db.commit()
+        confirmar_version(self.db, lambda: self.obtener_hospitalizacion(hospitalizacion_id))
+        cache.invalidar("hospitalizaciones")
         self.db.refresh(hospitalizacion)
         return hospitalizacion
 
@@ -213,6 +246,7 @@ class HospitalizacionCRUD:
             return True
         hospitalizacion.activo = False
         self.db.commit()
+        cache.invalidar("hospitalizaciones")
         return True
 
     def reactivar_hospitalizacion(self, hospitalizacion_id: UUID) -> bool:
@@ -224,6 +258,7 @@ class HospitalizacionCRUD:
             return True
         hospitalizacion.activo = True
         self.db.commit()
+        cache.invalidar("hospitalizaciones")
         return True
 
     def eliminar_hospitalizacion_permanente(self, hospitalizacion_id: UUID) -> bool:
@@ -236,6 +271,7 @@ class HospitalizacionCRUD:
             
             self.db.delete(hospitalizacion)
             self.db.commit()
+            cache.invalidar("hospitalizaciones")
             
             logging.info(f"Hospitalización {hospitalizacion_id} eliminada permanentemente")
             return True
@@ -1,9 +1,20 @@
 import re
-from typing import List, Optional
+from typing import Callable, List, Optional
 from uuid import UUID
 
+from database.replicas import en_primaria
 from entities.medico import Medico
 from sqlalchemy.orm import Session
+from utils.bus_invalidacion import publicar
+from utils.cache import cache
+from utils.condicional import (
+    Version,
+    confirmar_version,
+    verificar_version,
+    version_entidad,
+    version_lista,
+)
+from utils.directorio_personal import RegistroMedico, directorio_medicos
 
 
 class MedicoCRUD:
@@ -89,10 +100,36 @@ class MedicoCRUD:
             id_usuario_creacion=id_usuario_creacion,
         )
         self.db.add(medico)
+        publicar(self.db, "medico")
         self.db.commit()
+        directorio_medicos.invalidar()
         self.db.refresh(medico)
         return medico
 
+    def _consulta_medicos(
+        self,
+        include_inactive: bool = False,
+        nombre: Optional[str] = None,
+        especialidad: Optional[str] = None,
+        activo: Optional[bool] = None,
+    ):
+        query = self.db.query(Medico)
+        if not include_inactive:
+            query = query.filter(Medico.activo == True)
+        
+        if activo is not None:
+            query = query.filter(Medico.activo == activo)
+        
+        if nombre:
+            query = query.filter(
+                (Medico.nombre.ilike(f"%{nombre}%")) | 
+                (Medico.apellido.ilike(f"%{nombre}%"))
+            )
+        
+        if especialidad:
+            query = query.filter(Medico.especialidad.ilike(f"%{especialidad}%"))
+        return query
+
     def obtener_medicos(
         self, 
         skip: int = 0, 
@@ -104,22 +141,9 @@ class MedicoCRUD:
     ) -> List[Medico]:
         """Obtener todos los médicos con opción de incluir inactivos y filtros de búsqueda."""
         try:
-            query = self.db.query(Medico)
-            if not include_inactive:
-                query = query.filter(Medico.activo == True)
-            
-            if activo is not None:
-                query = query.filter(Medico.activo == activo)
-            
-            if nombre:
-                query = query.filter(
-                    (Medico.nombre.ilike(f"%{nombre}%")) | 
-                    (Medico.apellido.ilike(f"%{nombre}%"))
-                )
-            
-            if especialidad:
-                query = query.filter(Medico.especialidad.ilike(f"%{especialidad}%"))
-            
+            query = self._consulta_medicos(
+                include_inactive, nombre, especialidad, activo
+            )
             medicos = query.offset(skip).limit(limit).all()
             return medicos if medicos else []
         except Exception as e:
@@ -129,6 +153,29 @@ class MedicoCRUD:
             logging.error(f"Error al obtener médicos: {str(e)}")
             raise ValueError(f"Error al obtener médicos: {str(e)}")
 
+    def version_medicos(
+        self,
+        include_inactive: bool = False,
+        nombre: Optional[str] = None,
+        especialidad: Optional[str] = None,
+        activo: Optional[bool] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+    ) -> Version:
+        """Versión (ETag) de la página del listado, sin cargar médicos."""
+        return version_lista(
+            self._consulta_medicos(include_inactive, nombre, especialidad, activo),
+            Medico,
+            skip,
+            limit,
+        )
+
+    def version_medico(
+        self, medico_id: UUID
+    ) -> Optional[Version]:
+        """Versión (ETag) de un médico sin cargarlo."""
+        return version_entidad(self.db, Medico, medico_id)
+
     def obtener_medico(self, medico_id: UUID) -> Optional[Medico]:
         """Obtener un médico por ID."""
         return self.db.query(Medico).filter(Medico.id == medico_id).first()
@@ -153,6 +200,43 @@ class MedicoCRUD:
             .all()
         )
 
+    def _cargar_en_primaria(self, consulta: Callable, *args):
+        """Ejecutar una consulta del CRUD en la primaria para llenar el directorio."""
+        return en_primaria(self.db, lambda db: consulta(MedicoCRUD(db), *args))
+
+    def obtener_del_directorio(
+        self, indice: str, valor, usar_cache: bool = True
+    ) -> Optional[RegistroMedico]:
+        """Obtener un médico del directorio en caché por id, email o número de licencia."""
+        cargadores = {
+            "id": MedicoCRUD.obtener_medico,
+            "email": MedicoCRUD.obtener_medico_por_email,
+            "numero_licencia": MedicoCRUD.obtener_medico_por_licencia,
+        }
+        if indice not in cargadores:
+            raise ValueError(f"Índice de directorio inválido: {indice}")
+        if indice == "email":
+            valor = valor.lower()
+        return directorio_medicos.obtener(
+            indice,
+            valor,
+            lambda: self._cargar_en_primaria(cargadores[indice], valor),
+            omitir=not usar_cache,
+        )
+
+    def listar_por_especialidad_directorio(
+        self, especialidad: str, usar_cache: bool = True
+    ) -> List[RegistroMedico]:
+        """Obtener los médicos activos de una especialidad desde el directorio en caché."""
+        return directorio_medicos.listar(
+            "especialidad",
+            especialidad,
+            lambda: self._cargar_en_primaria(
+                MedicoCRUD.obtener_medicos_por_especialidad, especialidad
+            ),
+            omitir=not usar_cache,
+        )
+
     def buscar_medicos_por_nombre(self, nombre: str) -> List[Medico]:
         """Buscar médicos por nombre."""
         return (
@@ -165,12 +249,17 @@ class MedicoCRUD:
         )
 
     def actualizar_medico(
-        self, medico_id: UUID, id_usuario_edicion: Optional[UUID] = None, **kwargs
+        self,
+        medico_id: UUID,
+        id_usuario_edicion: Optional[UUID] = None,
+        version_esperada: Optional[int] = None,
+        **kwargs
     ) -> Optional[Medico]:
         """Actualizar un médico."""
         medico = self.obtener_medico(medico_id)
         if not medico:
             return None
+        verificar_version(medico, version_esperada)
 
         if "nombre" in kwargs:
             nombre = kwargs["nombre"]
@@ -240,7 +329,9 @@ class MedicoCRUD:
         for key, value in kwargs.items():
             if hasattr(medico, key):
                 setattr(medico, key, value)
-        self.db.commit()
+        publicar(self.db, "medico", medico_id)
+        confirmar_version(self.db, lambda: self.obtener_medico(medico_id))
+        directorio_medicos.invalidar()
         self.db.refresh(medico)
         return medico
 
@@ -252,7 +343,9 @@ class MedicoCRUD:
         if not medico.activo:
             return True
         medico.activo = False
+        publicar(self.db, "medico", medico_id)
         self.db.commit()
+        directorio_medicos.invalidar()
         return True
 
     def reactivar_medico(self, medico_id: UUID) -> bool:
@@ -263,7 +356,9 @@ class MedicoCRUD:
         if medico.activo:
             return True
         medico.activo = True
+        publicar(self.db, "medico", medico_id)
         self.db.commit()
+        directorio_medicos.invalidar()
         return True
 
     def eliminar_medico_permanente(self, medico_id: UUID) -> bool:
@@ -318,7 +413,10 @@ class MedicoCRUD:
 
             # Eliminar el médico
             self.db.delete(medico)
+            publicar(self.db, "medico", medico_id)
             self.db.commit()
+            directorio_medicos.invalidar()
+            cache.invalidar(f"citas:medico:{medico_id}", "hospitalizaciones")
             
             logging.info(f"Médico {medico_id} eliminado permanentemente")
             return True
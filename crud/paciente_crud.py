@@ -4,6 +4,15 @@ from uuid import UUID
 
 from entities.paciente import Paciente
 from sqlalchemy.orm import Session
+from utils.bus_invalidacion import publicar, registrar_manejador
+from utils.cache import BackendMemoria, cache
+from utils.condicional import (
+    Version,
+    confirmar_version,
+    verificar_version,
+    version_entidad,
+    version_lista,
+)
 
 
 class PacienteCRUD:
@@ -74,6 +83,26 @@ class PacienteCRUD:
         self.db.refresh(paciente)
         return paciente
 
+    def _consulta_pacientes(
+        self,
+        include_inactive: bool = False,
+        nombre: Optional[str] = None,
+        activo: Optional[bool] = None,
+    ):
+        query = self.db.query(Paciente)
+        if not include_inactive:
+            query = query.filter(Paciente.activo == True)
+        
+        if activo is not None:
+            query = query.filter(Paciente.activo == activo)
+        
+        if nombre:
+            query = query.filter(
+                (Paciente.nombre.ilike(f"%{nombre}%")) | 
+                (Paciente.apellido.ilike(f"%{nombre}%"))
+            )
+        return query
+
     def obtener_pacientes(
         self, 
         skip: int = 0, 
@@ -84,19 +113,7 @@ class PacienteCRUD:
     ) -> List[Paciente]:
         """Obtener todos los pacientes con opción de incluir inactivos y filtros de búsqueda."""
         try:
-            query = self.db.query(Paciente)
-            if not include_inactive:
-                query = query.filter(Paciente.activo == True)
-            
-            if activo is not None:
-                query = query.filter(Paciente.activo == activo)
-            
-            if nombre:
-                query = query.filter(
-                    (Paciente.nombre.ilike(f"%{nombre}%")) | 
-                    (Paciente.apellido.ilike(f"%{nombre}%"))
-                )
-            
+            query = self._consulta_pacientes(include_inactive, nombre, activo)
             pacientes = query.offset(skip).limit(limit).all()
             return pacientes if pacientes else []
         except Exception as e:
@@ -106,6 +123,28 @@ class PacienteCRUD:
             logging.error(f"Error al obtener pacientes: {str(e)}")
             raise ValueError(f"Error al obtener pacientes: {str(e)}")
 
+    def version_pacientes(
+        self,
+        include_inactive: bool = False,
+        nombre: Optional[str] = None,
+        activo: Optional[bool] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+    ) -> Version:
+        """Versión (ETag) de la página del listado, sin cargar pacientes."""
+        return version_lista(
+            self._consulta_pacientes(include_inactive, nombre, activo),
+            Paciente,
+            skip,
+            limit,
+        )
+
+    def version_paciente(
+        self, paciente_id: UUID
+    ) -> Optional[Version]:
+        """Versión (ETag) de un paciente sin cargarlo."""
+        return version_entidad(self.db, Paciente, paciente_id)
+
     def obtener_paciente(self, paciente_id: UUID) -> Optional[Paciente]:
         """Obtener un paciente por ID."""
         return self.db.query(Paciente).filter(Paciente.id == paciente_id).first()
@@ -126,12 +165,17 @@ class PacienteCRUD:
         )
 
     def actualizar_paciente(
-        self, paciente_id: UUID, id_usuario_edicion: Optional[UUID] = None, **kwargs
+        self,
+        paciente_id: UUID,
+        id_usuario_edicion: Optional[UUID] = None,
+        version_esperada: Optional[int] = None,
+        **kwargs
     ) -> Optional[Paciente]:
         """Actualizar un paciente."""
         paciente = self.obtener_paciente(paciente_id)
         if not paciente:
             return None
+        verificar_version(paciente, version_esperada)
 
         if "nombre" in kwargs:
             nombre = kwargs["nombre"]
@@ -180,7 +224,9 @@ class PacienteCRUD:
         for key, value in kwargs.items():
             if hasattr(paciente, key):
                 setattr(paciente, key, value)
-        self.db.commit()
+        publicar(self.db, "paciente", paciente_id)
+        confirmar_version(self.db, lambda: self.obtener_paciente(paciente_id))
+        cache.invalidar(f"paciente:{paciente_id}")
         self.db.refresh(paciente)
         return paciente
 
@@ -193,7 +239,9 @@ class PacienteCRUD:
             if not paciente.activo:
                 return True
             paciente.activo = False
+            publicar(self.db, "paciente", paciente_id)
             self.db.commit()
+            cache.invalidar(f"paciente:{paciente_id}")
             self.db.refresh(paciente)
             return True
         except Exception as e:
@@ -211,7 +259,9 @@ class PacienteCRUD:
             if paciente.activo:
                 return True
             paciente.activo = True
+            publicar(self.db, "paciente", paciente_id)
             self.db.commit()
+            cache.invalidar(f"paciente:{paciente_id}")
             self.db.refresh(paciente)
             return True
         except Exception as e:
@@ -264,6 +314,7 @@ class PacienteCRUD:
             # Facturas: eliminar permanentemente las facturas del paciente
             from entities.factura import Factura
             facturas = self.db.query(Factura).filter(Factura.paciente_id == paciente_id).all()
+            etiquetas_cache = [f"factura:{f.numero_factura}" for f in facturas]
             for factura in facturas:
                 # Primero eliminar los detalles de factura
                 from entities.factura_detalle import FacturaDetalle
@@ -288,7 +339,18 @@ class PacienteCRUD:
 
             # Eliminar el paciente
             self.db.delete(paciente)
+            # Se invalidan etiquetas de otras entidades: los demás procesos
+            # vacían su caché local completa
+            publicar(self.db, "paciente")
             self.db.commit()
+            cache.invalidar(
+                f"paciente:{paciente_id}",
+                f"historiales:paciente:{paciente_id}",
+                "citas",
+                "hospitalizaciones",
+                "facturas",
+                *etiquetas_cache,
+            )
             
             logging.info(f"Paciente {paciente_id} eliminado permanentemente")
             return True
@@ -302,3 +364,18 @@ class PacienteCRUD:
     def eliminar_paciente(self, paciente_id: UUID) -> bool:
         """Eliminar un paciente (soft delete) - mantiene compatibilidad."""
         return self.inactivar_paciente(paciente_id)
+
+
+def _al_notificar(paciente_id: Optional[str]) -> None:
+    """Invalidar en este proceso la caché de un paciente que cambió en otro."""
+    if not isinstance(cache.backend, BackendMemoria):
+        # Un backend compartido ya lo invalidó el proceso que escribió
+        return
+    if paciente_id is None:
+        cache.backend.vaciar()
+    else:
+        cache.invalidar(f"paciente:{paciente_id}")
+
+
+# Escrituras de pacientes en otros procesos (ver utils/bus_invalidacion.py)
+registrar_manejador("paciente", _al_notificar)
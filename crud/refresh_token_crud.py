@@ -0,0 +1,111 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from uuid import UUID
+
+from auth.tokens import REFRESH_TOKEN_DIAS, digest_refresh_token, generar_refresh_token
+from entities.refresh_token import RefreshToken
+from entities.usuario import Usuario
+from sqlalchemy.orm import Session
+
+
+class RefreshTokenCRUD:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _agregar(self, usuario_id: UUID, familia: UUID) -> str:
+        token, token_hash = generar_refresh_token()
+        self.db.add(
+            RefreshToken(
+                usuario_id=usuario_id,
+                token_hash=token_hash,
+                familia=familia,
+                expira=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_DIAS),
+            )
+        )
+        return token
+
+    def emitir_refresh_token(self, usuario_id: UUID) -> str:
+        """Emitir el primer token de renovación de una sesión (familia nueva)."""
+        token = self._agregar(usuario_id, uuid.uuid4())
+        self.db.commit()
+        return token
+
+    def obtener_por_token(
+        self, token: str, bloquear: bool = False
+    ) -> Optional[RefreshToken]:
+        """Buscar un token por su digest (índice único de token_hash)."""
+        consulta = self.db.query(RefreshToken).filter(
+            RefreshToken.token_hash == digest_refresh_token(token)
+        )
+        if bloquear:
+            consulta = consulta.with_for_update()
+        return consulta.first()
+
+    def rotar_refresh_token(self, token: str) -> Tuple[Usuario, str]:
+        """
+        Canjear un token de renovación por uno nuevo de la misma familia.
+
+        El token canjeado queda revocado. Si se presenta uno ya revocado (por
+        ejemplo, robado y usado antes por otro cliente) se revoca la familia
+        completa y el usuario debe iniciar sesión de nuevo.
+        """
+        registro = self.obtener_por_token(token, bloquear=True)
+        if not registro:
+            raise ValueError("Token de renovación inválido")
+
+        if registro.revocado:
+            self._revocar_familia(registro.familia)
+            self.db.commit()
+            raise ValueError(
+                "Token de renovación reutilizado; se cerraron las sesiones asociadas"
+            )
+
+        ahora = datetime.now(timezone.utc)
+        if registro.expira <= ahora:
+            self.db.rollback()
+            raise ValueError("Token de renovación vencido")
+
+        usuario = (
+            self.db.query(Usuario).filter(Usuario.id == registro.usuario_id).first()
+        )
+        if not usuario or not usuario.activo:
+            self._revocar_familia(registro.familia)
+            self.db.commit()
+            raise ValueError("Usuario inactivo o inexistente")
+
+        registro.revocado = True
+        registro.fecha_uso = ahora
+        nuevo = self._agregar(registro.usuario_id, registro.familia)
+        self.db.commit()
+        return usuario, nuevo
+
+    def _revocar_familia(self, familia: UUID) -> int:
+        return (
+            self.db.query(RefreshToken)
+            .filter(RefreshToken.familia == familia, RefreshToken.revocado == False)
+            .update({RefreshToken.revocado: True}, synchronize_session=False)
+        )
+
+    def revocar_refresh_token(self, token: str) -> bool:
+        """Cerrar la sesión de un token: revoca toda su familia."""
+        registro = self.obtener_por_token(token)
+        if not registro:
+            return False
+        self._revocar_familia(registro.familia)
+        self.db.commit()
+        return True
+
+    def revocar_tokens_usuario(self, usuario_id: UUID) -> int:
+        """
+        Revocar todos los tokens de renovación vigentes de un usuario.
+
+        No confirma: se aplica con la transacción de quien lo llama.
+        """
+        return (
+            self.db.query(RefreshToken)
+            .filter(
+                RefreshToken.usuario_id == usuario_id, RefreshToken.revocado == False
+            )
+            .update({RefreshToken.revocado: True}, synchronize_session=False)
+        )
@@ -0,0 +1,115 @@
+from typing import List, Optional
+from uuid import UUID
+
+from entities.tarifa import Tarifa
+from sqlalchemy.orm import Session
+from utils.condicional import confirmar_version
+
+TIPOS_ORIGEN = ("cita", "hospitalizacion")
+
+
+class TarifaCRUD:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def crear_tarifa(
+        self,
+        codigo: str,
+        descripcion: str,
+        tipo_origen: str,
+        precio_unitario: float,
+        id_usuario_creacion: Optional[UUID] = None,
+        especialidad: Optional[str] = None,
+        porcentaje_impuesto: float = 0,
+    ) -> Tarifa:
+        """Crear una nueva tarifa."""
+        if not codigo or len(codigo.strip()) == 0:
+            raise ValueError("El código es obligatorio")
+        if len(codigo) > 50:
+            raise ValueError("El código no puede exceder 50 caracteres")
+
+        if not descripcion or len(descripcion.strip()) == 0:
+            raise ValueError("La descripción es obligatoria")
+        if len(descripcion) > 255:
+            raise ValueError("La descripción no puede exceder 255 caracteres")
+
+        if tipo_origen not in TIPOS_ORIGEN:
+            raise ValueError(
+                f"Tipo de origen inválido. Valores posibles: {', '.join(TIPOS_ORIGEN)}"
+            )
+        if especialidad and tipo_origen != "cita":
+            raise ValueError("La especialidad solo aplica a tarifas de citas")
+
+        if precio_unitario < 0:
+            raise ValueError("El precio unitario no puede ser negativo")
+        if porcentaje_impuesto < 0 or porcentaje_impuesto > 100:
+            raise ValueError("El porcentaje de impuesto debe estar entre 0 y 100")
+
+        if self.obtener_tarifa_por_codigo(codigo):
+            raise ValueError("El código de tarifa ya está registrado")
+
+        tarifa = Tarifa(
+            codigo=codigo.strip(),
+            descripcion=descripcion.strip(),
+            tipo_origen=tipo_origen,
+            especialidad=especialidad.strip() if especialidad else None,
+            precio_unitario=precio_unitario,
+            porcentaje_impuesto=porcentaje_impuesto,
+            id_usuario_creacion=id_usuario_creacion,
+        )
+        self.db.add(tarifa)
+        self.db.commit()
+        self.db.refresh(tarifa)
+        return tarifa
+
+    def obtener_tarifas(
+        self, skip: int = 0, limit: int = 1000, include_inactive: bool = False
+    ) -> List[Tarifa]:
+        """Obtener todas las tarifas con opción de incluir inactivas."""
+        query = self.db.query(Tarifa)
+        if not include_inactive:
+            query = query.filter(Tarifa.activo == True)
+        return query.offset(skip).limit(limit).all()
+
+    def obtener_tarifa(self, tarifa_id: UUID) -> Optional[Tarifa]:
+        """Obtener una tarifa por ID."""
+        return self.db.query(Tarifa).filter(Tarifa.id == tarifa_id).first()
+
+    def obtener_tarifa_por_codigo(self, codigo: str) -> Optional[Tarifa]:
+        """Obtener una tarifa por código."""
+        return self.db.query(Tarifa).filter(Tarifa.codigo == codigo.strip()).first()
+
+    def actualizar_tarifa(
+        self, tarifa_id: UUID, id_usuario_edicion: Optional[UUID] = None, **kwargs
+    ) -> Optional[Tarifa]:
+        """Actualizar una tarifa."""
+        tarifa = self.obtener_tarifa(tarifa_id)
+        if not tarifa:
+            return None
+
+        if "precio_unitario" in kwargs and kwargs["precio_unitario"] < 0:
+            raise ValueError("El precio unitario no puede ser negativo")
+        if "porcentaje_impuesto" in kwargs and not (
+            0 <= kwargs["porcentaje_impuesto"] <= 100
+        ):
+            raise ValueError("El porcentaje de impuesto debe estar entre 0 y 100")
+
+        for key, value in kwargs.items():
+            if hasattr(tarifa, key):
+                setattr(tarifa, key, value)
+        if id_usuario_edicion:
+            tarifa.id_usuario_edicion = id_usuario_edicion
+        confirmar_version(self.db, lambda: self.obtener_tarifa(tarifa_id))
+        self.db.refresh(tarifa)
+        return tarifa
+
+    def inactivar_tarifa(self, tarifa_id: UUID) -> bool:
+        """Inactivar una tarifa (soft delete)."""
+        tarifa = self.obtener_tarifa(tarifa_id)
+        if not tarifa:
+            return False
+        if not tarifa.activo:
+            return True
+        tarifa.activo = False
+        self.db.commit()
+        return True
@@ -0,0 +1,148 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from auth.revocacion import clave_token, clave_usuario, registro_revocaciones
+from auth.tokens import TOKEN_MINUTOS
+from database.config import SessionLocal
+from entities.token_revocado import TokenRevocado
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from utils.bus_invalidacion import publicar
+
+REVOCACION_RECONSTRUCCION = float(os.getenv("REVOCACION_RECONSTRUCCION", 3600))
+# fecha_creacion es la hora de inicio de la transacción: una revocación puede
+# confirmarse con una fecha anterior a la última ya cargada
+_MARGEN_CARGA = timedelta(seconds=30)
+
+
+class TokenRevocadoCRUD:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _agregar(self, revocacion: TokenRevocado) -> None:
+        self.db.add(revocacion)
+        publicar(self.db, "token_revocado", revocacion.clave)
+        # Agregarla antes del commit solo puede producir un falso positivo
+        registro_revocaciones.agregar(revocacion.clave)
+
+    def revocar_token(
+        self, jti: str, expira: datetime, id_usuario_creacion: Optional[UUID] = None
+    ) -> None:
+        """Revocar un token de acceso por su jti hasta su vencimiento."""
+        self._agregar(
+            TokenRevocado(
+                clave=clave_token(jti),
+                expira=expira,
+                id_usuario_creacion=id_usuario_creacion,
+            )
+        )
+        self.db.commit()
+
+    def revocar_tokens_usuario(
+        self, usuario_id: UUID, id_usuario_creacion: Optional[UUID] = None
+    ) -> None:
+        """
+        Revocar todos los tokens de acceso emitidos hasta ahora a un usuario.
+
+        No confirma: se aplica con la transacción de quien lo llama.
+        """
+        ahora = datetime.now(timezone.utc)
+        self._agregar(
+            TokenRevocado(
+                clave=clave_usuario(usuario_id),
+                emitidos_antes=ahora,
+                # Ningún token emitido antes de ahora sigue vigente después
+                expira=ahora + timedelta(minutes=TOKEN_MINUTOS),
+                id_usuario_creacion=id_usuario_creacion,
+            )
+        )
+
+    def esta_revocado(
+        self, jti: Optional[str], usuario_id: UUID, emitido: float
+    ) -> bool:
+        """Confirmar en la BD un posible acierto del filtro de Bloom."""
+        condiciones = [
+            (TokenRevocado.clave == clave_usuario(usuario_id))
+            & (
+                TokenRevocado.emitidos_antes
+                > datetime.fromtimestamp(emitido, timezone.utc)
+            )
+        ]
+        if jti:
+            condiciones.append(TokenRevocado.clave == clave_token(jti))
+        return (
+            self.db.query(TokenRevocado.id)
+            .filter(or_(*condiciones), TokenRevocado.expira > func.now())
+            .first()
+            is not None
+        )
+
+    def obtener_claves(
+        self, desde: Optional[datetime] = None
+    ) -> Tuple[List[str], Optional[datetime]]:
+        """Claves de las revocaciones vigentes (creadas desde `desde`) y la fecha de la última."""
+        query = self.db.query(TokenRevocado.clave, TokenRevocado.fecha_creacion).filter(
+            TokenRevocado.expira > func.now()
+        )
+        if desde is not None:
+            query = query.filter(TokenRevocado.fecha_creacion >= desde - _MARGEN_CARGA)
+        filas = query.all()
+        ultima = max((f.fecha_creacion for f in filas), default=desde)
+        return [f.clave for f in filas], ultima
+
+    def primer_vencimiento_usuarios(self) -> Optional[datetime]:
+        """Vencimiento más próximo de las revocaciones de usuario vigentes."""
+        return (
+            self.db.query(func.min(TokenRevocado.expira))
+            .filter(
+                TokenRevocado.clave.like(clave_usuario("%")),
+                TokenRevocado.expira > func.now(),
+            )
+            .scalar()
+        )
+
+    def purgar_vencidas(self) -> int:
+        """Borrar las revocaciones de tokens que ya vencieron."""
+        borradas = (
+            self.db.query(TokenRevocado)
+            .filter(TokenRevocado.expira <= func.now())
+            .delete(synchronize_session=False)
+        )
+        self.db.commit()
+        return borradas
+
+
+def actualizar_revocaciones() -> None:
+    """
+    Tarea programada: cargar las revocaciones nuevas en el filtro de Bloom
+
+    Periódicamente, si se perdieron notificaciones o al vencer una revocación
+    de usuario, reconstruye el filtro completo para descartar las vencidas: la
+    clave de un usuario haría consultar la BD en cada petición con sus tokens
+    nuevos hasta la siguiente reconstrucción.
+    """
+    db = SessionLocal()
+    try:
+        crud = TokenRevocadoCRUD(db)
+        registro = registro_revocaciones
+        if (
+            registro.reconstruir_pendiente
+            or registro.vencio_revocacion_usuario()
+            or time.monotonic() - registro.reconstruido_en > REVOCACION_RECONSTRUCCION
+        ):
+            borradas = crud.purgar_vencidas()
+            registro.iniciar_reconstruccion()
+            claves, ultima = crud.obtener_claves()
+            registro.reemplazar(claves, ultima, crud.primer_vencimiento_usuarios())
+            logging.info(
+                f"Filtro de revocaciones reconstruido: {len(claves)} vigentes, {borradas} purgadas"
+            )
+        else:
+            claves, ultima = crud.obtener_claves(registro.ultima_carga)
+            registro.agregar_cargadas(claves, ultima)
+    finally:
+        db.close()
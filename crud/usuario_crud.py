@@ -1,10 +1,14 @@
+import logging
 from typing import List, Optional
 from uuid import UUID
 
 from auth.security import PasswordManager
+from crud.refresh_token_crud import RefreshTokenCRUD
+from crud.token_revocado_crud import TokenRevocadoCRUD
 from entities.usuario import Usuario
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from utils.condicional import confirmar_version
 
 
 class UsuarioCRUD:
@@ -159,6 +163,11 @@ class UsuarioCRUD:
                 raise ValueError(mensaje)
             kwargs["contraseña_hash"] = PasswordManager.hash_password(contraseña)
             del kwargs["contraseña"]
+            # Cambiar la contraseña cierra las sesiones abiertas en otros clientes
+            RefreshTokenCRUD(self.db).revocar_tokens_usuario(usuario_id)
+            TokenRevocadoCRUD(self.db).revocar_tokens_usuario(
+                usuario_id, id_usuario_edicion
+            )
 
         if "telefono" in kwargs and kwargs["telefono"]:
             telefono = kwargs["telefono"]
@@ -171,10 +180,20 @@ class UsuarioCRUD:
         if id_usuario_edicion:
             usuario.id_usuario_edicion = id_usuario_edicion
 
+        # Los tokens vigentes llevan es_admin como claim: se revocan si cambia,
+        # igual que al inactivar al usuario
+        if "contraseña_hash" not in kwargs and (
+            ("es_admin" in kwargs and kwargs["es_admin"] != usuario.es_admin)
+            or ("activo" in kwargs and kwargs["activo"] is False and usuario.activo)
+        ):
+            TokenRevocadoCRUD(self.db).revocar_tokens_usuario(
+                usuario_id, id_usuario_edicion
+            )
+
         for key, value in kwargs.items():
             if hasattr(usuario, key):
                 setattr(usuario, key, value)
-        self.db.commit()
+        confirmar_version(self.db, lambda: self.obtener_usuario(usuario_id))
         self.db.refresh(usuario)
         return usuario
 
@@ -189,6 +208,7 @@ class UsuarioCRUD:
                 return True
 
             usuario.activo = False
+            TokenRevocadoCRUD(self.db).revocar_tokens_usuario(usuario_id)
             self.db.commit()
             self.db.refresh(usuario)
             return True
@@ -259,6 +279,7 @@ class UsuarioCRUD:
             self.db.refresh(usuario)
             
             # Eliminar el usuario de la base de datos
+            TokenRevocadoCRUD(self.db).revocar_tokens_usuario(usuario_id)
             self.db.delete(usuario)
             self.db.commit()
             
@@ -282,6 +303,10 @@ class UsuarioCRUD:
         """Cambiar el estado activo/inactivo de un usuario."""
         usuario = self.obtener_usuario(usuario_id)
         if usuario:
+            if usuario.activo and not activo:
+                TokenRevocadoCRUD(self.db).revocar_tokens_usuario(
+                    usuario_id, id_usuario_edicion
+                )
             usuario.activo = activo
             usuario.id_usuario_edicion = id_usuario_edicion
             self.db.commit()
@@ -299,10 +324,24 @@ class UsuarioCRUD:
         if not usuario or not usuario.activo:
             return None
 
-        if PasswordManager.verify_password(contraseña, usuario.contraseña_hash):
-            return usuario
+        if not PasswordManager.verify_password(contraseña, usuario.contraseña_hash):
+            return None
+
+        if PasswordManager.needs_rehash(usuario.contraseña_hash):
+            self._actualizar_hash(usuario, contraseña)
+        return usuario
 
-        return None
+    def _actualizar_hash(self, usuario: Usuario, contraseña: str) -> None:
+        """Recalcular el hash con el algoritmo y los parámetros configurados."""
+        try:
+            usuario.contraseña_hash = PasswordManager.hash_password(contraseña)
+            self.db.commit()
+        except Exception as e:
+            # El inicio de sesión ya es válido; se reintenta en el próximo
+            self.db.rollback()
+            logging.warning(
+                f"No se pudo actualizar el hash de contraseña del usuario {usuario.id}: {str(e)}"
+            )
 
     def obtener_usuarios_admin(self) -> List[Usuario]:
         """Obtener todos los usuarios administradores."""
@@ -4,10 +4,12 @@ Configuración de la base de datos PostgreSQL con Neon
 
 import os
 
+from database.pool import configurar_pre_ping, opciones_pool
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from utils.consultas_sql import instrumentar_engine
 
 load_dotenv()
 
@@ -16,13 +18,21 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("Se requiere DATABASE_URL en las variables de entorno")
 
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    connect_args={"sslmode": "require"},
-)
+
+def crear_engine(url: str):
+    """Engine con el pool configurado por entorno (ver database/pool.py)"""
+    nuevo = create_engine(
+        url,
+        echo=False,
+        connect_args={"sslmode": "require"},
+        **opciones_pool(),
+    )
+    configurar_pre_ping(nuevo)
+    instrumentar_engine(nuevo)
+    return nuevo
+
+
+engine = crear_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -0,0 +1,174 @@
+"""
+Pool de conexiones: configuración, verificación, calentamiento y estadísticas
+"""
+
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+from utils.consultas_sql import consultas_peticion
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 300))
+# LIFO reutiliza siempre las mismas conexiones y deja vencer las sobrantes
+DB_POOL_LIFO = os.getenv("DB_POOL_LIFO", "false").lower() == "true"
+# siempre: ping en cada checkout; inactivas: solo si la conexión estuvo
+# libre más de DB_PRE_PING_INACTIVIDAD segundos; nunca: sin ping
+DB_PRE_PING = os.getenv("DB_PRE_PING", "inactivas").lower()
+DB_PRE_PING_INACTIVIDAD = float(os.getenv("DB_PRE_PING_INACTIVIDAD", 30))
+# Conexiones a abrir al iniciar (por defecto DB_POOL_SIZE) y reintentos con
+# espera exponencial mientras la base de datos serverless despierta
+DB_POOL_CALENTAR = int(os.getenv("DB_POOL_CALENTAR", DB_POOL_SIZE))
+DB_CALENTAR_INTENTOS = int(os.getenv("DB_CALENTAR_INTENTOS", 5))
+DB_CALENTAR_ESPERA = float(os.getenv("DB_CALENTAR_ESPERA", 0.5))
+
+if DB_PRE_PING not in ("siempre", "inactivas", "nunca"):
+    raise ValueError(
+        f"DB_PRE_PING inválido: {DB_PRE_PING} (siempre, inactivas o nunca)"
+    )
+
+
+class PoolMedido(QueuePool):
+    """
+    QueuePool que mide cuánto se espera por una conexión
+
+    Suma la espera a la petición en curso (Server-Timing) y lleva los
+    acumulados del pool para /metrics/pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_esperas = threading.Lock()
+        self.checkouts = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        agotado = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            agotado = True
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock_esperas:
+                self.checkouts += 1
+                self.espera_total += espera
+                self.espera_maxima = max(self.espera_maxima, espera)
+                self.timeouts += agotado
+            estadisticas = consultas_peticion.get()
+            if estadisticas is not None:
+                estadisticas.espera_pool += espera
+
+    def recreate(self):
+        # El pool nuevo (tras una desconexión masiva) conserva los acumulados
+        nuevo = super().recreate()
+        nuevo.checkouts = self.checkouts
+        nuevo.espera_total = self.espera_total
+        nuevo.espera_maxima = self.espera_maxima
+        nuevo.timeouts = self.timeouts
+        return nuevo
+
+
+def opciones_pool() -> dict:
+    """Argumentos de create_engine para el pool según la configuración"""
+    return {
+        "poolclass": PoolMedido,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_use_lifo": DB_POOL_LIFO,
+        "pool_pre_ping": DB_PRE_PING == "siempre",
+    }
+
+
+def configurar_pre_ping(engine) -> None:
+    """Con DB_PRE_PING=inactivas, hacer ping solo a las conexiones inactivas"""
+    if DB_PRE_PING != "inactivas":
+        return
+
+    @event.listens_for(engine, "checkin")
+    def _devuelta(dbapi_connection, registro):
+        registro.info["devuelta"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _verificar(dbapi_connection, registro, proxy):
+        devuelta = registro.info.get("devuelta")
+        if devuelta is None or time.monotonic() - devuelta < DB_PRE_PING_INACTIVIDAD:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            # El pool descarta la conexión y reintenta con una nueva
+            raise exc.DisconnectionError(str(e)) from e
+
+
+def calentar_pool(engine, cantidad: int = DB_POOL_CALENTAR) -> int:
+    """
+    Abrir `cantidad` conexiones y devolverlas al pool antes de la primera petición
+
+    Reintenta con espera exponencial (DB_CALENTAR_ESPERA, el doble en cada
+    intento) porque la primera conexión a una base de datos suspendida puede
+    fallar mientras arranca. Si se agotan los intentos se registra el error y
+    el pool abrirá las conexiones a demanda.
+    """
+    cantidad = min(cantidad, engine.pool.size())
+    for intento in range(1, DB_CALENTAR_INTENTOS + 1):
+        conexiones = []
+        try:
+            for _ in range(cantidad):
+                conexion = engine.connect()
+                conexiones.append(conexion)
+                conexion.exec_driver_sql("SELECT 1")
+            return cantidad
+        except exc.SQLAlchemyError as e:
+            if intento == DB_CALENTAR_INTENTOS:
+                logger.error(f"No se pudo calentar el pool: {str(e)}")
+                return len(conexiones)
+            espera = DB_CALENTAR_ESPERA * 2 ** (intento - 1)
+            logger.warning(
+                f"Intento {intento} de conectar a la base de datos falló, "
+                f"reintentando en {espera:.1f} s: {str(e)}"
+            )
+            time.sleep(espera)
+        finally:
+            for conexion in conexiones:
+                conexion.close()
+    return 0
+
+
+def estadisticas_pool(engine) -> dict:
+    """Estado del pool y esperas acumuladas por una conexión"""
+    pool = engine.pool
+    checkouts = getattr(pool, "checkouts", 0)
+    espera_total = getattr(pool, "espera_total", 0.0)
+    return {
+        "tamano": pool.size(),
+        "en_uso": pool.checkedout(),
+        "libres": pool.checkedin(),
+        # QueuePool cuenta el overflow desde -pool_size
+        "overflow": max(0, pool.overflow()),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "timeout_segundos": DB_POOL_TIMEOUT,
+        "pre_ping": DB_PRE_PING,
+        "checkouts": checkouts,
+        "espera_promedio_ms": round(espera_total / checkouts * 1000, 3)
+        if checkouts
+        else 0.0,
+        "espera_maxima_ms": round(getattr(pool, "espera_maxima", 0.0) * 1000, 3),
+        "timeouts": getattr(pool, "timeouts", 0),
+    }
@@ -0,0 +1,185 @@
+"""
+Réplicas de lectura para los endpoints GET
+
+Con DATABASE_READ_URLS (URLs separadas por comas) las rutas de solo lectura
+usan get_read_db, que reparte las sesiones entre las réplicas y vuelve a la
+primaria si una réplica no responde. Después de una escritura el cliente lee
+de la primaria durante LECTURA_PRIMARIA_SEGUNDOS para ver sus propios cambios
+aunque las réplicas vayan atrasadas.
+
+Las cachés compartidas (directorio del personal, caché de respuestas, caché
+de pacientes, facturas e historiales) se llenan siempre desde la primaria y no
+se usan durante esa ventana: una réplica atrasada las dejaría con filas viejas
+hasta que vencieran.
+"""
+
+import itertools
+import logging
+import os
+import time
+from typing import Callable, List, Optional, TypeVar
+
+from database.config import SessionLocal, crear_engine
+from fastapi import Request
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+DATABASE_READ_URLS = [
+    url.strip() for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()
+]
+# Segundos que se deja de usar una réplica que falló al conectar
+REPLICA_REINTENTO = float(os.getenv("REPLICA_REINTENTO", 30))
+LECTURA_PRIMARIA_SEGUNDOS = int(os.getenv("LECTURA_PRIMARIA_SEGUNDOS", 5))
+COOKIE_LECTURA_PRIMARIA = "leer_primaria"
+CABECERA_LECTURA_PRIMARIA = "x-leer-primaria"
+METODOS_LECTURA = ("GET", "HEAD", "OPTIONS")
+# request.state: la petición llena una caché y debe leer de la primaria
+ESTADO_LECTURA_PRIMARIA = "lectura_primaria"
+
+T = TypeVar("T")
+
+
+class Replica:
+    """Engine y fábrica de sesiones de una réplica"""
+
+    def __init__(self, url: str):
+        self.engine = crear_engine(url)
+        # info["replica"] distingue sus sesiones de las de la primaria
+        self.sesiones = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine, info={"replica": True}
+        )
+        self.caida_hasta = 0.0
+
+
+class BalanceadorReplicas:
+    """Reparte las lecturas entre las réplicas disponibles por turnos"""
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._turno = itertools.count()
+
+    def elegir(self) -> Optional[Replica]:
+        """Siguiente réplica disponible, o None para leer de la primaria"""
+        if not self.replicas:
+            return None
+        ahora = time.monotonic()
+        inicio = next(self._turno)
+        for desplazamiento in range(len(self.replicas)):
+            replica = self.replicas[(inicio + desplazamiento) % len(self.replicas)]
+            if replica.caida_hasta <= ahora:
+                return replica
+        return None
+
+    def marcar_caida(self, replica: Replica) -> None:
+        replica.caida_hasta = time.monotonic() + REPLICA_REINTENTO
+
+
+balanceador = BalanceadorReplicas(DATABASE_READ_URLS)
+
+
+def leer_de_primaria(request: Request) -> bool:
+    """Si el cliente escribió hace poco (cookie o cabecera X-Leer-Primaria)"""
+    valor = request.headers.get(CABECERA_LECTURA_PRIMARIA) or request.cookies.get(
+        COOKIE_LECTURA_PRIMARIA
+    )
+    try:
+        hasta = float(valor)
+    except (TypeError, ValueError):
+        return False
+    # Un valor más lejano que la ventana no lo emitió este servidor
+    ahora = time.time()
+    return ahora < hasta <= ahora + LECTURA_PRIMARIA_SEGUNDOS
+
+
+def usar_primaria(scope) -> None:
+    """Hacer que get_read_db use la primaria durante esta petición"""
+    scope.setdefault("state", {})[ESTADO_LECTURA_PRIMARIA] = True
+
+
+def en_primaria(db: Session, cargar: Callable[[Session], T]) -> T:
+    """
+    Ejecutar `cargar` con una sesión de la primaria
+
+    Para las consultas que llenan una caché compartida. Si `db` no es de una
+    réplica se usa la misma sesión.
+    """
+    if not db.info.get("replica"):
+        return cargar(db)
+    primaria = SessionLocal()
+    try:
+        return cargar(primaria)
+    finally:
+        primaria.close()
+
+
+def get_read_db(request: Request):
+    """
+    Generador de sesiones para rutas de solo lectura
+
+    Sin réplicas configuradas, si el cliente escribió hace poco o si la
+    petición llena una caché (usar_primaria), es igual a get_db. La conexión a
+    la réplica se abre aquí para poder volver a la primaria si falla; un error
+    durante la consulta ya no se reintenta.
+    """
+    db = None
+    primaria = leer_de_primaria(request) or getattr(
+        request.state, ESTADO_LECTURA_PRIMARIA, False
+    )
+    replica = None if primaria else balanceador.elegir()
+    if replica is not None:
+        db = replica.sesiones()
+        try:
+            db.connection()
+        except DBAPIError as e:
+            logger.warning(
+                f"Réplica {replica.engine.url.host} no disponible, se usa la primaria: {str(e)}"
+            )
+            balanceador.marcar_caida(replica)
+            db.close()
+            db = None
+    if db is None:
+        db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class LecturaPrimariaMiddleware:
+    """
+    Middleware ASGI que marca al cliente para leer de la primaria tras escribir
+
+    Las respuestas exitosas a métodos de escritura llevan la cookie
+    leer_primaria y la cabecera X-Leer-Primaria con el instante (epoch) hasta
+    el que get_read_db usa la primaria; los clientes sin cookies pueden
+    reenviar la cabecera.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in METODOS_LECTURA
+            or not balanceador.replicas
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start" and mensaje["status"] < 400:
+                hasta = f"{time.time() + LECTURA_PRIMARIA_SEGUNDOS:.3f}"
+                cabeceras = MutableHeaders(scope=mensaje)
+                cabeceras.append(CABECERA_LECTURA_PRIMARIA, hasta)
+                cabeceras.append(
+                    "set-cookie",
+                    f"{COOKIE_LECTURA_PRIMARIA}={hasta}; Max-Age={LECTURA_PRIMARIA_SEGUNDOS}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
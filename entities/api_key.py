@@ -0,0 +1,40 @@
+import uuid
+
+from database.config import Base
+from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+
+class ApiKey(Base):
+    """
+    Entidad que representa una API key de un cliente de integración.
+
+    La clave completa tiene la forma hsp_<prefijo>_<secreto> y solo se muestra
+    al crearla.
+
+    Atributos:
+        prefijo: Parte pública de la clave; identifica el registro
+        secreto_hash: SHA-256 (hexadecimal) de la parte secreta
+        scopes: Permisos separados por espacios, por ejemplo "citas:leer pacientes:*"
+        limite_por_minuto: Peticiones por minuto permitidas; nulo sin límite
+    """
+
+    __tablename__ = "tbl_api_keys"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    nombre = Column(String(100), nullable=False)
+    prefijo = Column(String(16), unique=True, index=True, nullable=False)
+    secreto_hash = Column(String(64), nullable=False)
+    scopes = Column(String(500), nullable=False, default="")
+    limite_por_minuto = Column(Integer, nullable=True)
+    activo = Column(Boolean, default=True)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_actualizacion = Column(DateTime(timezone=True), onupdate=func.now())
+    id_usuario_creacion = Column(UUID(as_uuid=True), nullable=True)
+    id_usuario_edicion = Column(UUID(as_uuid=True), nullable=True)
+
+    def __repr__(self):
+        return (
+            f"<ApiKey(id={self.id}, nombre='{self.nombre}', prefijo='{self.prefijo}')>"
+        )
@@ -1,7 +1,7 @@
 import uuid
 
 from database.config import Base
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -16,6 +16,19 @@ class Cita(Base):
     """
 
     __tablename__ = "tbl_citas"
+    __table_args__ = (
+        # Versión para ETag/304 con index-only scan (ver utils/condicional.py)
+        Index(
+            "ix_tbl_citas_version",
+            "id",
+            postgresql_include=[
+                "activo",
+                "version",
+                "fecha_creacion",
+                "fecha_actualizacion",
+            ],
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     fecha_cita = Column(DateTime, nullable=False)
@@ -27,6 +40,10 @@ class Cita(Base):
     fecha_actualizacion = Column(DateTime(timezone=True), onupdate=func.now())
     id_usuario_creacion = Column(UUID(as_uuid=True), nullable=True)
     id_usuario_edicion = Column(UUID(as_uuid=True), nullable=True)
+    # Control de concurrencia optimista: cada UPDATE exige la versión leída
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     paciente_id = Column(
         UUID(as_uuid=True), ForeignKey("tbl_pacientes.id"), nullable=False
@@ -0,0 +1,33 @@
+import uuid
+
+from database.config import Base
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+
+class CorridaFacturacion(Base):
+    """
+    Entidad que representa una corrida de facturación de un periodo (AAAA-MM).
+
+    Atributos:
+        estado: Estado de la corrida. Valores posibles: en_proceso, completada, fallida
+    """
+
+    __tablename__ = "tbl_corridas_facturacion"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    periodo = Column(String(7), unique=True, index=True, nullable=False)
+    estado = Column(String(20), nullable=False, default="en_proceso")
+    facturas_generadas = Column(Integer, nullable=False, default=0)
+    items_facturados = Column(Integer, nullable=False, default=0)
+    error = Column(String(1000), nullable=True)
+    fecha_inicio = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_fin = Column(DateTime(timezone=True), nullable=True)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_actualizacion = Column(DateTime(timezone=True), onupdate=func.now())
+    id_usuario_creacion = Column(UUID(as_uuid=True), nullable=True)
+    id_usuario_edicion = Column(UUID(as_uuid=True), nullable=True)
+
+    def __repr__(self):
+        return f"<CorridaFacturacion(periodo='{self.periodo}', estado='{self.estado}')>"
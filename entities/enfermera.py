@@ -1,7 +1,7 @@
 import uuid
 
 from database.config import Base
-from sqlalchemy import Boolean, Column, DateTime, String
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -16,6 +16,19 @@ class Enfermera(Base):
     """
 
     __tablename__ = "tbl_enfermeras"
+    __table_args__ = (
+        # Versión para ETag/304 con index-only scan (ver utils/condicional.py)
+        Index(
+            "ix_tbl_enfermeras_version",
+            "id",
+            postgresql_include=[
+                "activo",
+                "version",
+                "fecha_creacion",
+                "fecha_actualizacion",
+            ],
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     nombre = Column(String(100), nullable=False)
@@ -29,6 +42,10 @@ class Enfermera(Base):
     fecha_actualizacion = Column(DateTime(timezone=True), onupdate=func.now())
     id_usuario_creacion = Column(UUID(as_uuid=True), nullable=True)
     id_usuario_edicion = Column(UUID(as_uuid=True), nullable=True)
+    # Control de concurrencia optimista: cada UPDATE exige la versión leída
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     hospitalizaciones = relationship("Hospitalizacion", back_populates="enfermera")
 
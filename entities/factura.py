@@ -1,7 +1,7 @@
 import uuid
 
 from database.config import Base
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Numeric, String
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, Numeric, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -16,6 +16,20 @@ class Factura(Base):
     """
 
     __tablename__ = "tbl_facturas"
+    __table_args__ = (
+        Index("ix_tbl_facturas_estado_vencimiento", "estado", "fecha_vencimiento"),
+        # Versión para ETag/304 con index-only scan (ver utils/condicional.py)
+        Index(
+            "ix_tbl_facturas_version",
+            "id",
+            postgresql_include=[
+                "activo",
+                "version",
+                "fecha_creacion",
+                "fecha_actualizacion",
+            ],
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     numero_factura = Column(String(50), unique=True, index=True, nullable=False)
@@ -31,6 +45,10 @@ class Factura(Base):
     fecha_actualizacion = Column(DateTime(timezone=True), onupdate=func.now())
     id_usuario_creacion = Column(UUID(as_uuid=True), nullable=True)
     id_usuario_edicion = Column(UUID(as_uuid=True), nullable=True)
+    # Control de concurrencia optimista: cada UPDATE exige la versión leída
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     paciente_id = Column(
         UUID(as_uuid=True), ForeignKey("tbl_pacientes.id"), nullable=False
@@ -1,7 +1,7 @@
 import uuid
 
 from database.config import Base
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Numeric, String
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Numeric, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -26,6 +26,10 @@ class FacturaDetalle(Base):
     factura_id = Column(
         UUID(as_uuid=True), ForeignKey("tbl_facturas.id"), nullable=False
     )
+    # Control de concurrencia optimista: cada UPDATE exige la versión leída
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     factura = relationship("Factura", back_populates="detalles")
 
@@ -0,0 +1,39 @@
+import uuid
+
+from database.config import Base
+from sqlalchemy import Column, DateTime, ForeignKey, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+
+class FacturaOrigen(Base):
+    """
+    Vínculo entre una factura y la cita u hospitalización que factura.
+
+    La restricción única sobre (tipo_origen, origen_id) impide facturar dos
+    veces el mismo servicio y sirve de índice para el anti-join de la corrida.
+
+    Atributos:
+        tipo_origen: Valores posibles: cita, hospitalizacion
+    """
+
+    __tablename__ = "tbl_facturas_origen"
+    __table_args__ = (
+        UniqueConstraint(
+            "tipo_origen", "origen_id", name="uq_tbl_facturas_origen_origen"
+        ),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tipo_origen = Column(String(20), nullable=False)
+    origen_id = Column(UUID(as_uuid=True), nullable=False)
+    factura_id = Column(
+        UUID(as_uuid=True), ForeignKey("tbl_facturas.id"), nullable=False, index=True
+    )
+    corrida_id = Column(
+        UUID(as_uuid=True), ForeignKey("tbl_corridas_facturacion.id"), nullable=True
+    )
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<FacturaOrigen(tipo='{self.tipo_origen}', origen_id={self.origen_id}, factura_id={self.factura_id})>"
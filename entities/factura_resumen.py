@@ -0,0 +1,43 @@
+from database.config import Base
+from sqlalchemy import Column, Date, DateTime, Integer, Numeric, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+
+class FacturaResumenDiario(Base):
+    """
+    Acumulado de facturas activas por día de emisión y estado.
+
+    Se mantiene incrementalmente desde FacturaCRUD y se reconstruye
+    periódicamente a partir de tbl_facturas.
+    """
+
+    __tablename__ = "tbl_facturas_resumen_diario"
+
+    fecha = Column(Date, primary_key=True)
+    estado = Column(String(20), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+    monto_total = Column(Numeric(14, 2), nullable=False, default=0)
+    fecha_actualizacion = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    def __repr__(self):
+        return f"<FacturaResumenDiario(fecha={self.fecha}, estado='{self.estado}', cantidad={self.cantidad})>"
+
+
+class FacturaResumenPaciente(Base):
+    """Acumulado de facturas activas por paciente y estado."""
+
+    __tablename__ = "tbl_facturas_resumen_paciente"
+
+    paciente_id = Column(UUID(as_uuid=True), primary_key=True)
+    estado = Column(String(20), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+    monto_total = Column(Numeric(14, 2), nullable=False, default=0)
+    fecha_actualizacion = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    def __repr__(self):
+        return f"<FacturaResumenPaciente(paciente_id={self.paciente_id}, estado='{self.estado}', cantidad={self.cantidad})>"
@@ -1,7 +1,7 @@
 import uuid
 
 from database.config import Base
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -27,6 +27,10 @@ class HistorialEntrada(Base):
         UUID(as_uuid=True), ForeignKey("tbl_historiales_medicos.id"), nullable=False
     )
     medico_id = Column(UUID(as_uuid=True), ForeignKey("tbl_medicos.id"), nullable=False)
+    # Control de concurrencia optimista: cada UPDATE exige la versión leída
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     historial_medico = relationship("HistorialMedico", back_populates="entradas")
     medico = relationship("Medico", back_populates="historiales_entrada")
@@ -0,0 +1,38 @@
+import uuid
+
+from database.config import Base
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+
+class RefreshToken(Base):
+    """
+    Entidad que representa un token de renovación emitido a un usuario.
+
+    Atributos:
+        token_hash: SHA-256 (hexadecimal) del token; el token en claro no se guarda
+        familia: Identificador compartido por los tokens de una misma sesión;
+            cada renovación emite un token nuevo en la misma familia
+        revocado: El token ya se usó o se revocó; volver a presentarlo revoca
+            toda la familia
+    """
+
+    __tablename__ = "tbl_refresh_tokens"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    usuario_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("tbl_usuarios.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    familia = Column(UUID(as_uuid=True), nullable=False, index=True)
+    expira = Column(DateTime(timezone=True), nullable=False)
+    revocado = Column(Boolean, nullable=False, default=False)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_uso = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<RefreshToken(id={self.id}, usuario_id={self.usuario_id}, revocado={self.revocado})>"
@@ -0,0 +1,39 @@
+import uuid
+
+from database.config import Base
+from sqlalchemy import Boolean, Column, DateTime, Integer, Numeric, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+
+class Tarifa(Base):
+    """
+    Entidad que representa una tarifa usada en la facturación automática.
+
+    Atributos:
+        tipo_origen: Servicio al que aplica. Valores posibles: cita, hospitalizacion
+        especialidad: Especialidad del médico (solo citas); nula para la tarifa general
+        precio_unitario: Precio por cita o por día de hospitalización
+    """
+
+    __tablename__ = "tbl_tarifas"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    codigo = Column(String(50), unique=True, index=True, nullable=False)
+    descripcion = Column(String(255), nullable=False)
+    tipo_origen = Column(String(20), nullable=False)
+    especialidad = Column(String(100), nullable=True)
+    precio_unitario = Column(Numeric(10, 2), nullable=False)
+    porcentaje_impuesto = Column(Numeric(5, 2), nullable=False, default=0)
+    activo = Column(Boolean, default=True)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_actualizacion = Column(DateTime(timezone=True), onupdate=func.now())
+    id_usuario_creacion = Column(UUID(as_uuid=True), nullable=True)
+    id_usuario_edicion = Column(UUID(as_uuid=True), nullable=True)
+    # Control de concurrencia optimista: cada UPDATE exige la versión leída
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    def __repr__(self):
+        return f"<Tarifa(id={self.id}, codigo='{self.codigo}', precio={self.precio_unitario})>"
@@ -0,0 +1,32 @@
+import uuid
+
+from database.config import Base
+from sqlalchemy import Column, DateTime, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+
+class TokenRevocado(Base):
+    """
+    Entidad que representa una revocación de tokens de acceso.
+
+    Atributos:
+        clave: "jti:<jti>" revoca un token; "usuario:<id>" revoca todos los
+            tokens del usuario emitidos antes de `emitidos_antes`
+        emitidos_antes: Solo para revocaciones por usuario
+        expira: Cuándo vence el último token afectado; después la fila se puede borrar
+    """
+
+    __tablename__ = "tbl_tokens_revocados"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    clave = Column(String(80), index=True, nullable=False)
+    emitidos_antes = Column(DateTime(timezone=True), nullable=True)
+    expira = Column(DateTime(timezone=True), nullable=False, index=True)
+    fecha_creacion = Column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )
+    id_usuario_creacion = Column(UUID(as_uuid=True), nullable=True)
+
+    def __repr__(self):
+        return f"<TokenRevocado(clave='{self.clave}', expira={self.expira})>"
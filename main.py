@@ -7,11 +7,13 @@ import os
 import socket
 import uvicorn
 from apis import (
+    api_key,
     auth,
     cita,
     enfermera,
     factura,
     factura_detalle,
+    facturacion,
     historial_entrada,
     historial_medico,
     hospitalizacion,
@@ -19,11 +21,40 @@ from apis import (
     paciente,
     usuario,
 )
-from database.config import create_tables
+from auth.dependencias import dependencias_routers
+from crud.factura_resumen_crud import recalcular_resumen_facturas
+from crud.facturacion_crud import facturar_mes_anterior
+from crud.token_revocado_crud import actualizar_revocaciones
+from database.config import create_tables, engine
+from database.pool import calentar_pool, estadisticas_pool
+from database.replicas import LecturaPrimariaMiddleware, balanceador
 from fastapi import FastAPI, Request, status
+from fastapi.exception_handlers import http_exception_handler
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.exc import DBAPIError
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from utils.admision import AdmisionMiddleware, estadisticas_admision
+from utils.bus_invalidacion import detener_escucha, iniciar_escucha
+from utils.cache_respuestas import CacheRespuestasMiddleware
+from utils.consultas_sql import ConsultaCanceladaError, ConsultasMiddleware
+from utils.directorio_personal import directorio_enfermeras, directorio_medicos
+from utils.metricas import (
+    TIPO_CONTENIDO,
+    MetricasMiddleware,
+    detener_volcado,
+    generar_metricas,
+    iniciar_volcado,
+)
+from utils.pdf_facturas import cerrar_pool
+from utils.tareas_programadas import detener_tareas, programar_tarea
+from utils.tiempos_servidor import RutaMedida
+from utils.timeout_sql import (
+    TimeoutSqlMiddleware,
+    consulta_cancelada,
+    error_consulta_cancelada,
+)
 
 app = FastAPI(
     title="Sistema de Gestión Hospitalaria",
@@ -32,6 +63,14 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
 )
+# Las rutas declaradas directamente en la app también llevan Server-Timing
+app.router.route_class = RutaMedida
+
+# Dentro de la caché de respuestas: los aciertos de caché no hacen cola
+app.add_middleware(AdmisionMiddleware)
+
+# Va antes que CORS para que las respuestas en caché también pasen por CORS
+app.add_middleware(CacheRespuestasMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,17 +80,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(LecturaPrimariaMiddleware)
+app.add_middleware(TimeoutSqlMiddleware)
+app.add_middleware(ConsultasMiddleware)
+
+# El último agregado es el más externo: mide también la caché y CORS
+app.add_middleware(MetricasMiddleware)
+
 app.include_router(auth.router, prefix="/api")
-app.include_router(usuario.router, prefix="/api")
-app.include_router(paciente.router, prefix="/api")
-app.include_router(medico.router, prefix="/api")
-app.include_router(enfermera.router, prefix="/api")
-app.include_router(cita.router, prefix="/api")
-app.include_router(hospitalizacion.router, prefix="/api")
-app.include_router(historial_medico.router, prefix="/api")
-app.include_router(historial_entrada.router, prefix="/api")
-app.include_router(factura.router, prefix="/api")
-app.include_router(factura_detalle.router, prefix="/api")
+app.include_router(api_key.router, prefix="/api")
+
+# X-API-Key o token Bearer; con AUTH_REQUERIDA=true todos los routers salvo
+# /auth exigen uno de los dos
+protegidas = dependencias_routers()
+app.include_router(usuario.router, prefix="/api", dependencies=protegidas)
+app.include_router(paciente.router, prefix="/api", dependencies=protegidas)
+app.include_router(medico.router, prefix="/api", dependencies=protegidas)
+app.include_router(enfermera.router, prefix="/api", dependencies=protegidas)
+app.include_router(cita.router, prefix="/api", dependencies=protegidas)
+app.include_router(hospitalizacion.router, prefix="/api", dependencies=protegidas)
+app.include_router(historial_medico.router, prefix="/api", dependencies=protegidas)
+app.include_router(historial_entrada.router, prefix="/api", dependencies=protegidas)
+app.include_router(factura.router, prefix="/api", dependencies=protegidas)
+app.include_router(factura_detalle.router, prefix="/api", dependencies=protegidas)
+app.include_router(facturacion.router, prefix="/api", dependencies=protegidas)
 
 
 @app.exception_handler(RequestValidationError)
@@ -63,16 +115,69 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+@app.exception_handler(StarletteHTTPException)
+async def manejar_http_exception(request: Request, exc: StarletteHTTPException):
+    """
+    Los endpoints convierten cualquier error en un 500 con su texto: si la
+    causa fue una consulta cancelada se responde 503/504 sin el SQL.
+    """
+    error_interno = exc.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    if error_interno and consulta_cancelada(exc):
+        exc = error_consulta_cancelada(request)
+    return await http_exception_handler(request, exc)
+
+
+@app.exception_handler(ConsultaCanceladaError)
+@app.exception_handler(DBAPIError)
+async def manejar_consulta_cancelada(request: Request, exc: Exception):
+    """Consultas canceladas que llegan sin capturar desde el endpoint"""
+    if not consulta_cancelada(exc):
+        raise exc
+    return await http_exception_handler(request, error_consulta_cancelada(request))
+
+
 @app.on_event("startup")
 async def startup_event():
     """Inicio de la aplicación"""
     print("Iniciando sistema...")
     print("Configurando base de datos...")
+    # Absorbe el arranque en frío de la base de datos antes de la primera petición
+    calentar_pool(engine)
+    for replica in balanceador.replicas:
+        calentar_pool(replica.engine)
     create_tables()
+    programar_tarea(
+        "resumen_facturas",
+        float(os.environ.get("RESUMEN_FACTURAS_INTERVALO", 900)),
+        recalcular_resumen_facturas,
+    )
+    programar_tarea(
+        "facturacion_mensual",
+        float(os.environ.get("FACTURACION_INTERVALO", 0)),
+        facturar_mes_anterior,
+    )
+    # El filtro de revocaciones debe estar cargado antes de aceptar tokens
+    actualizar_revocaciones()
+    programar_tarea(
+        "revocaciones",
+        float(os.environ.get("REVOCACION_INTERVALO", 5)),
+        actualizar_revocaciones,
+    )
+    iniciar_escucha()
+    iniciar_volcado()
     print("Sistema listo.")
     print("Documentación: http://localhost:8000/docs")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Cierre de la aplicación"""
+    await detener_tareas()
+    await detener_volcado()
+    detener_escucha()
+    cerrar_pool()
+
+
 @app.get("/", tags=["raíz"])
 async def root():
     """Endpoint raíz"""
@@ -83,6 +188,7 @@ async def root():
         "redoc": "/redoc",
         "endpoints": {
             "autenticacion": "/auth",
+            "api_keys": "/api-keys",
             "usuarios": "/usuarios",
             "pacientes": "/pacientes",
             "medicos": "/medicos",
@@ -93,10 +199,38 @@ async def root():
             "historiales_entrada": "/historial-entradas",
             "facturas": "/facturas",
             "facturas_detalle": "/factura-detalles",
+            "facturacion": "/facturacion",
         },
     }
 
 
+@app.get("/metricas/directorio", tags=["métricas"])
+async def metricas_directorio():
+    """Aciertos y fallos de la caché del directorio de médicos y enfermeras"""
+    return {
+        "medicos": directorio_medicos.estadisticas(),
+        "enfermeras": directorio_enfermeras.estadisticas(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Latencia y volumen de peticiones por ruta en formato de Prometheus"""
+    return PlainTextResponse(generar_metricas(), media_type=TIPO_CONTENIDO)
+
+
+@app.get("/metrics/pool", tags=["métricas"])
+async def metrics_pool():
+    """Conexiones en uso, overflow y esperas del pool de la base de datos"""
+    return estadisticas_pool(engine)
+
+
+@app.get("/metrics/admision", tags=["métricas"])
+async def metrics_admision():
+    """Peticiones en curso, en cola y rechazadas por grupo de rutas"""
+    return estadisticas_admision()
+
+
 def is_port_available(host: str, port: int) -> bool:
     """Verifica si un puerto está disponible"""
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
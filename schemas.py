@@ -3,10 +3,10 @@ Modelos Pydantic para las respuestas de la API
 """
 
 from datetime import date, datetime, time
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 
 
 class UsuarioBase(BaseModel):
@@ -51,6 +51,42 @@ class LoginResponse(BaseModel):
     access_token: str
     token_type: str
     user: dict
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
+class ApiKeyCreate(BaseModel):
+    nombre: str
+    scopes: List[str]
+    limite_por_minuto: Optional[int] = None
+
+
+class ApiKeyResponse(BaseModel):
+    id: UUID
+    nombre: str
+    prefijo: str
+    scopes: List[str]
+    limite_por_minuto: Optional[int] = None
+    activo: bool
+    fecha_creacion: datetime
+    id_usuario_creacion: Optional[UUID] = None
+
+    @field_validator("scopes", mode="before")
+    @classmethod
+    def separar_scopes(cls, valor):
+        # En la base de datos los scopes se guardan separados por espacios
+        return valor.split() if isinstance(valor, str) else valor
+
+    class Config:
+        from_attributes = True
+
+
+class ApiKeyCreada(ApiKeyResponse):
+    clave: str
 
 
 class CambioContraseña(BaseModel):
@@ -262,6 +298,7 @@ class HistorialMedicoBase(BaseModel):
 
 
 class HistorialMedicoCreate(HistorialMedicoBase):
+    numero_historial: Optional[str] = None
     id_usuario_creacion: Optional[UUID] = None
 
 
@@ -330,6 +367,7 @@ class FacturaBase(BaseModel):
 
 
 class FacturaCreate(FacturaBase):
+    numero_factura: Optional[str] = None
     id_usuario_creacion: Optional[UUID] = None
 
 
@@ -358,6 +396,54 @@ class FacturaResponse(FacturaBase):
         from_attributes = True
 
 
+class FacturaResumenItem(BaseModel):
+    clave: str
+    cantidad: int
+    monto_facturado: float
+    monto_pendiente: float
+    monto_pagado: float
+
+
+class FacturaResumenResponse(BaseModel):
+    agrupacion: str
+    items: List[FacturaResumenItem]
+
+
+class AntiguedadSaldoItem(BaseModel):
+    paciente_id: Optional[UUID] = None
+    nombre: Optional[str] = None
+    cantidad: int
+    dias_0_30: float
+    dias_31_60: float
+    dias_61_90: float
+    dias_90_mas: float
+    total: float
+
+
+class AntiguedadSaldosResponse(BaseModel):
+    totales: Optional[AntiguedadSaldoItem] = None
+    items: List[AntiguedadSaldoItem]
+    siguiente_cursor: Optional[UUID] = None
+
+
+class ConciliacionItem(BaseModel):
+    numero_factura: str
+    monto: float
+    total_factura: Optional[float] = None
+    lineas: List[int]
+    motivo: str
+
+
+class ConciliacionResponse(BaseModel):
+    lineas_procesadas: int
+    facturas_pagadas: int
+    monto_aplicado: float
+    no_conciliadas: List[ConciliacionItem]
+    pagos_parciales: List[ConciliacionItem]
+    sobrepagos: List[ConciliacionItem]
+    lineas_invalidas: List[dict]
+
+
 class FacturaDetalleBase(BaseModel):
     descripcion: str
     cantidad: float
@@ -390,9 +476,56 @@ class FacturaDetalleResponse(FacturaDetalleBase):
         from_attributes = True
 
 
+class TarifaBase(BaseModel):
+    codigo: str
+    descripcion: str
+    tipo_origen: str
+    especialidad: Optional[str] = None
+    precio_unitario: float
+    porcentaje_impuesto: float = 0
+
+
+class TarifaCreate(TarifaBase):
+    id_usuario_creacion: Optional[UUID] = None
+
+
+class TarifaUpdate(BaseModel):
+    descripcion: Optional[str] = None
+    precio_unitario: Optional[float] = None
+    porcentaje_impuesto: Optional[float] = None
+    id_usuario_edicion: Optional[UUID] = None
+
+
+class TarifaResponse(TarifaBase):
+    id: UUID
+    activo: bool
+    fecha_creacion: datetime
+    fecha_actualizacion: Optional[datetime] = None
+    id_usuario_creacion: Optional[UUID] = None
+    id_usuario_edicion: Optional[UUID] = None
+
+    class Config:
+        from_attributes = True
+
+
+class CorridaFacturacionResponse(BaseModel):
+    id: UUID
+    periodo: str
+    estado: str
+    facturas_generadas: int
+    items_facturados: int
+    error: Optional[str] = None
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class RespuestaAPI(BaseModel):
     mensaje: str
     success: bool = True
+    datos: Optional[dict] = None
 
 
 class RespuestaError(BaseModel):
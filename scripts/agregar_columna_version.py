@@ -0,0 +1,125 @@
+"""
+Script para agregar la columna version (concurrencia optimista) a las tablas existentes
+Ejecutar este script si las tablas ya existen pero no tienen la columna version
+"""
+
+import os
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL no está configurada en las variables de entorno")
+    sys.exit(1)
+
+engine = create_engine(
+    DATABASE_URL,
+    echo=True,
+    connect_args={"sslmode": "require"},
+)
+
+tablas = [
+    "tbl_usuarios",
+    "tbl_pacientes",
+    "tbl_medicos",
+    "tbl_enfermeras",
+    "tbl_citas",
+    "tbl_hospitalizaciones",
+    "tbl_historiales_medicos",
+    "tbl_historial_entradas",
+    "tbl_facturas",
+    "tbl_factura_detalles",
+    "tbl_tarifas",
+]
+
+# Índices de versión (ETag) que deben incluir la columna nueva
+tablas_con_indice_version = [
+    "tbl_pacientes",
+    "tbl_medicos",
+    "tbl_enfermeras",
+    "tbl_citas",
+    "tbl_hospitalizaciones",
+    "tbl_facturas",
+    "tbl_historiales_medicos",
+]
+
+
+def verificar_columna_existe(conn, tabla, columna):
+    """Verificar si una columna existe en una tabla"""
+    query = text(
+        """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_name = :tabla AND column_name = :columna
+        """
+    )
+    result = conn.execute(query, {"tabla": tabla, "columna": columna})
+    return result.fetchone() is not None
+
+
+def agregar_columna_version():
+    """Agregar la columna version con valor 1 a todas las tablas"""
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            for tabla in tablas:
+                print(f"\nProcesando tabla: {tabla}")
+                if not verificar_columna_existe(conn, tabla, "version"):
+                    print(f"  Agregando version a {tabla}...")
+                    # Con un DEFAULT constante PostgreSQL no reescribe la tabla
+                    conn.execute(
+                        text(
+                            f"""
+                            ALTER TABLE {tabla}
+                            ADD COLUMN version INTEGER NOT NULL DEFAULT 1
+                            """
+                        )
+                    )
+                else:
+                    print(f"  version ya existe en {tabla}")
+            trans.commit()
+        except Exception as e:
+            trans.rollback()
+            print(f"\n❌ Error al agregar la columna version: {e}")
+            raise
+
+
+def recrear_indices_version():
+    """Recrear los índices de versión para que incluyan la columna version"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for tabla in tablas_con_indice_version:
+            nombre = f"ix_{tabla}_version"
+            print(f"\nRecreando índice: {nombre}")
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre}"))
+            conn.execute(
+                text(
+                    f"CREATE INDEX CONCURRENTLY {nombre} ON {tabla} (id) "
+                    "INCLUDE (activo, version, fecha_creacion, fecha_actualizacion)"
+                )
+            )
+            print(f"  ✓ Índice {nombre} listo")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("AGREGANDO COLUMNA VERSION A LAS TABLAS")
+    print("=" * 60)
+    print(f"Fecha: {datetime.now()}")
+    print(
+        f"Base de datos: {DATABASE_URL.split('@')[1] if '@' in DATABASE_URL else 'N/A'}"
+    )
+    print("=" * 60)
+
+    try:
+        agregar_columna_version()
+        recrear_indices_version()
+        print("\n✅ Columna version agregada exitosamente a todas las tablas")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,83 @@
+"""
+Script para calibrar el costo del hash de contraseñas en este equipo
+Mide cuánto tarda una verificación y sugiere los parámetros que se acercan a
+la latencia objetivo sin pasarse
+
+Uso:
+    python scripts/calibrar_hash_contrasenas.py [milisegundos objetivo, por defecto 250]
+
+Los hashes existentes conservan sus parámetros; los usuarios pasan a los
+nuevos al iniciar sesión (ver PasswordManager.needs_rehash).
+"""
+
+import os
+import secrets
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.security import _pbkdf2, _scrypt
+
+OBJETIVO_MS = float(sys.argv[1]) if len(sys.argv) > 1 else 250.0
+REPETICIONES = 3
+
+
+def medir(funcion) -> float:
+    """Mejor tiempo (ms) de varias ejecuciones, para descontar ruido"""
+    mejor = float("inf")
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, (time.perf_counter() - inicio) * 1000)
+    return mejor
+
+
+def calibrar_pbkdf2(sal: bytes) -> int:
+    # El costo es lineal en las iteraciones: se extrapola desde una medición
+    base = 50000
+    ms = medir(lambda: _pbkdf2("contraseña de prueba", sal, base))
+    iteraciones = int(base * OBJETIVO_MS / ms) // 1000 * 1000
+    iteraciones = max(iteraciones, 1000)
+    ms = medir(lambda: _pbkdf2("contraseña de prueba", sal, iteraciones))
+    print(f"  pbkdf2-sha256 i={iteraciones}: {ms:.1f} ms")
+    return iteraciones
+
+
+def calibrar_scrypt(sal: bytes, r: int = 8, p: int = 1) -> int:
+    # n debe ser potencia de dos: se duplica mientras no supere el objetivo
+    log_n = 10
+    elegido = log_n
+    while log_n <= 20:
+        ms = medir(lambda: _scrypt("contraseña de prueba", sal, log_n, r, p))
+        memoria_mib = 128 * r * (1 << log_n) / (1024 * 1024)
+        print(f"  scrypt ln={log_n},r={r},p={p} ({memoria_mib:.0f} MiB): {ms:.1f} ms")
+        if ms > OBJETIVO_MS:
+            break
+        elegido = log_n
+        log_n += 1
+    return elegido
+
+
+def main():
+    print(f"Latencia objetivo por verificación: {OBJETIVO_MS:.0f} ms")
+    sal = secrets.token_bytes(16)
+
+    print("\nPBKDF2-SHA256:")
+    iteraciones = calibrar_pbkdf2(sal)
+
+    print("\nscrypt:")
+    log_n = calibrar_scrypt(sal)
+
+    print("\nVariables de entorno sugeridas:")
+    print(f"  PASSWORD_PBKDF2_ITERACIONES={iteraciones}")
+    print(f"  PASSWORD_SCRYPT_LOG_N={log_n}")
+    print("  PASSWORD_ALGORITMO=pbkdf2-sha256   (o scrypt, resistente a GPU)")
+    print(
+        "\nCada inicio de sesión ocupa un núcleo durante ese tiempo: "
+        "considere los inicios de sesión simultáneos esperados."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Script para crear los índices de reportes sobre tbl_facturas
+Ejecutar este script si la tabla ya existe (create_all no agrega índices a tablas existentes)
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL no está configurada en las variables de entorno")
+    sys.exit(1)
+
+engine = create_engine(
+    DATABASE_URL,
+    echo=True,
+    connect_args={"sslmode": "require"},
+)
+
+indices = [
+    (
+        "ix_tbl_facturas_estado_vencimiento",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tbl_facturas_estado_vencimiento "
+        "ON tbl_facturas (estado, fecha_vencimiento)",
+    ),
+]
+
+
+def crear_indices():
+    """Crear los índices sin bloquear escrituras (CONCURRENTLY requiere autocommit)"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for nombre, sql in indices:
+            print(f"\nCreando índice: {nombre}")
+            conn.execute(text(sql))
+            print(f"  ✓ Índice {nombre} listo")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Creación de índices de facturas")
+    print("=" * 60)
+    try:
+        crear_indices()
+        print("\n✓ Proceso completado")
+    except Exception as e:
+        print(f"\n✗ Error: {str(e)}")
+        sys.exit(1)
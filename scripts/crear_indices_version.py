@@ -0,0 +1,65 @@
+"""
+Script para crear los índices de versión (ETag / Last-Modified) de las tablas principales
+Ejecutar este script si las tablas ya existen (create_all no agrega índices a tablas existentes)
+Requiere la columna version (scripts/agregar_columna_version.py)
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL no está configurada en las variables de entorno")
+    sys.exit(1)
+
+engine = create_engine(
+    DATABASE_URL,
+    echo=True,
+    connect_args={"sslmode": "require"},
+)
+
+tablas = [
+    "tbl_pacientes",
+    "tbl_medicos",
+    "tbl_enfermeras",
+    "tbl_citas",
+    "tbl_hospitalizaciones",
+    "tbl_facturas",
+    "tbl_historiales_medicos",
+]
+
+indices = [
+    (
+        f"ix_{tabla}_version",
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{tabla}_version "
+        f"ON {tabla} (id) INCLUDE (activo, version, fecha_creacion, fecha_actualizacion)",
+    )
+    for tabla in tablas
+]
+
+
+def crear_indices():
+    """Crear los índices sin bloquear escrituras (CONCURRENTLY requiere autocommit)"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for nombre, sql in indices:
+            print(f"\nCreando índice: {nombre}")
+            conn.execute(text(sql))
+            print(f"  ✓ Índice {nombre} listo")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Creación de índices de versión")
+    print("=" * 60)
+    try:
+        crear_indices()
+        print("\n✓ Proceso completado")
+    except Exception as e:
+        print(f"\n✗ Error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,117 @@
+"""
+Servidor de caché mínimo compatible con el protocolo de Redis (RESP)
+Sirve para probar localmente CACHE_BACKEND=redis sin instalar Redis
+
+Uso:
+    python scripts/servidor_cache.py [puerto]
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://localhost:6379/0 python main.py
+"""
+
+import asyncio
+import sys
+import time
+
+PUERTO = int(sys.argv[1]) if len(sys.argv) > 1 else 6379
+
+# clave -> (valor, vencimiento en tiempo monotónico o None)
+datos = {}
+
+
+def _vigente(clave):
+    entrada = datos.get(clave)
+    if entrada is None:
+        return None
+    valor, vence = entrada
+    if vence is not None and vence <= time.monotonic():
+        del datos[clave]
+        return None
+    return entrada
+
+
+def _bulk(valor):
+    if valor is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(valor), valor)
+
+
+def ejecutar(comando):
+    nombre = comando[0].upper()
+    args = comando[1:]
+    if nombre == b"PING":
+        return b"+PONG\r\n"
+    if nombre in (b"AUTH", b"SELECT"):
+        return b"+OK\r\n"
+    if nombre == b"GET":
+        entrada = _vigente(args[0])
+        return _bulk(entrada[0] if entrada else None)
+    if nombre == b"MGET":
+        respuesta = [b"*%d\r\n" % len(args)]
+        for clave in args:
+            entrada = _vigente(clave)
+            respuesta.append(_bulk(entrada[0] if entrada else None))
+        return b"".join(respuesta)
+    if nombre == b"SET":
+        vence = None
+        if len(args) >= 4 and args[2].upper() == b"EX":
+            vence = time.monotonic() + int(args[3])
+        datos[args[0]] = (args[1], vence)
+        return b"+OK\r\n"
+    if nombre == b"INCR":
+        entrada = _vigente(args[0])
+        valor = int(entrada[0]) + 1 if entrada else 1
+        datos[args[0]] = (str(valor).encode(), entrada[1] if entrada else None)
+        return b":%d\r\n" % valor
+    if nombre == b"EXPIRE":
+        entrada = _vigente(args[0])
+        if entrada is None:
+            return b":0\r\n"
+        datos[args[0]] = (entrada[0], time.monotonic() + int(args[1]))
+        return b":1\r\n"
+    if nombre == b"DEL":
+        borradas = sum(1 for clave in args if datos.pop(clave, None) is not None)
+        return b":%d\r\n" % borradas
+    if nombre == b"FLUSHDB":
+        datos.clear()
+        return b"+OK\r\n"
+    return b"-ERR comando no soportado '%s'\r\n" % nombre
+
+
+async def leer_comando(lector):
+    linea = await lector.readline()
+    if not linea:
+        return None
+    if not linea.startswith(b"*"):
+        return linea.split()
+    partes = []
+    for _ in range(int(linea[1:-2])):
+        largo = int((await lector.readline())[1:-2])
+        partes.append((await lector.readexactly(largo + 2))[:-2])
+    return partes
+
+
+async def atender(lector, escritor):
+    try:
+        while True:
+            comando = await leer_comando(lector)
+            if not comando:
+                break
+            escritor.write(ejecutar(comando))
+            await escritor.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        escritor.close()
+
+
+async def main():
+    servidor = await asyncio.start_server(atender, "127.0.0.1", PUERTO)
+    print(f"Servidor de caché escuchando en 127.0.0.1:{PUERTO}")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nServidor detenido")
@@ -0,0 +1,50 @@
+"""
+Límites del control de admisión frente a la capacidad del pool
+(utils/admision.py)
+"""
+
+import logging
+
+import pytest
+from utils.admision import (
+    ADMISION_LIMITES,
+    CAPACIDAD_POOL,
+    limite_por_defecto,
+    verificar_limites,
+)
+from utils.error_handler import APIErrorHandler
+
+
+@pytest.mark.parametrize("capacidad", [5, 15, 30, 100])
+def test_limites_por_defecto_caben_en_el_pool(capacidad):
+    limites = {
+        grupo: limite_por_defecto(grupo, capacidad) for grupo in ADMISION_LIMITES
+    }
+    assert sum(limites.values()) <= capacidad
+    assert verificar_limites(limites, capacidad)
+
+
+def test_limites_configurados_caben_en_el_pool():
+    assert sum(ADMISION_LIMITES.values()) <= CAPACIDAD_POOL
+
+
+def test_avisa_si_los_limites_superan_el_pool(caplog):
+    limites = {"lectura": 10, "busqueda": 3, "escritura": 5, "exportacion": 0}
+    with caplog.at_level(logging.WARNING, logger="utils.admision"):
+        assert not verificar_limites(limites, 15)
+    assert "suman 18" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "crear, estado",
+    [
+        (APIErrorHandler.rate_limit_error, 429),
+        (APIErrorHandler.service_unavailable_error, 503),
+    ],
+)
+def test_retry_after_en_segundos_enteros(crear, estado):
+    error = crear(0.2)
+    assert error.status_code == estado
+    assert error.headers == {"Retry-After": "1"}
+    assert error.detail["details"] == {"retry_after": 1}
+    assert crear(2.1).headers == {"Retry-After": "3"}
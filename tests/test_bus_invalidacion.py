@@ -0,0 +1,34 @@
+"""
+Invalidación de la caché local por avisos de otros procesos
+(utils/bus_invalidacion.py)
+"""
+
+import uuid
+
+from utils.bus_invalidacion import _despachar
+from utils.cache import cache
+
+
+def _guardar(paciente_id):
+    etiquetas = [f"paciente:{paciente_id}"]
+    cache.guardar(f"paciente:{paciente_id}", {"id": str(paciente_id)}, etiquetas)
+    return cache.obtener(f"paciente:{paciente_id}", etiquetas)
+
+
+def test_aviso_de_paciente_invalida_su_entrada():
+    cambiado, otro = uuid.uuid4(), uuid.uuid4()
+    assert _guardar(cambiado) and _guardar(otro)
+
+    _despachar("paciente", str(cambiado))
+
+    assert cache.obtener(f"paciente:{cambiado}", [f"paciente:{cambiado}"]) is None
+    assert cache.obtener(f"paciente:{otro}", [f"paciente:{otro}"]) is not None
+
+
+def test_aviso_sin_id_vacia_la_cache_local():
+    paciente_id = uuid.uuid4()
+    assert _guardar(paciente_id)
+
+    _despachar("paciente", None)
+
+    assert cache.obtener(f"paciente:{paciente_id}", [f"paciente:{paciente_id}"]) is None
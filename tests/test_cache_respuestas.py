@@ -0,0 +1,230 @@
+"""
+Caché de respuestas HTTP (utils/cache_respuestas.py)
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import main
+import pytest
+from auth.tokens import verificar_token
+from crud.token_revocado_crud import TokenRevocadoCRUD
+from entities.cita import Cita
+from entities.token_revocado import TokenRevocado
+
+
+@pytest.fixture
+def medico_id():
+    return uuid.uuid4()
+
+
+@pytest.fixture
+def db(crear_sesion, medico_id):
+    db = crear_sesion(Cita, TokenRevocado)
+    db.add(
+        Cita(
+            paciente_id=uuid.uuid4(),
+            medico_id=medico_id,
+            fecha_cita=datetime(2026, 10, 20, 9, 0),
+            motivo="Control",
+            estado="programada",
+            activo=True,
+        )
+    )
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def auth_requerida(monkeypatch):
+    monkeypatch.setattr("auth.dependencias.AUTH_REQUERIDA", True)
+
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_segunda_peticion_se_sirve_de_cache(crear_cliente, db, medico_id):
+    cliente = crear_cliente(db)
+    url = f"/api/citas/medico/{medico_id}"
+
+    primera = cliente.get(url)
+    segunda = cliente.get(url, params={})
+    sin_cache = cliente.get(url, headers={"Cache-Control": "no-cache"})
+
+    assert primera.status_code == 200
+    assert len(primera.json()) == 1
+    assert primera.headers["x-cache"] == "MISS"
+    assert segunda.headers["x-cache"] == "HIT"
+    assert segunda.content == primera.content
+    assert "x-cache" not in sin_cache.headers
+
+
+def test_server_timing_no_se_guarda(crear_cliente, db, medico_id):
+    cliente = crear_cliente(db)
+    url = f"/api/citas/medico/{medico_id}"
+
+    primera = cliente.get(url, headers={"X-Debug-Timing": "1"})
+    segunda = cliente.get(url)
+
+    assert primera.headers["x-cache"] == "MISS"
+    assert "server-timing" in primera.headers
+    assert segunda.headers["x-cache"] == "HIT"
+    assert "server-timing" not in segunda.headers
+
+
+def test_acierto_exige_autenticacion(
+    crear_cliente, db, medico_id, auth_requerida, crear_token
+):
+    cliente = crear_cliente(db)
+    url = f"/api/citas/medico/{medico_id}"
+
+    autenticada = cliente.get(url, headers=_bearer(crear_token()))
+    assert autenticada.status_code == 200
+    assert autenticada.headers["x-cache"] == "MISS"
+
+    anonima = cliente.get(url)
+    assert anonima.status_code == 401
+    assert anonima.headers["www-authenticate"] == "Bearer"
+    assert "x-cache" not in anonima.headers
+
+    token_invalido = cliente.get(url, headers=_bearer("no-es-un-token"))
+    assert token_invalido.status_code == 401
+
+    otra = cliente.get(url, headers=_bearer(crear_token()))
+    assert otra.status_code == 200
+    assert otra.headers["x-cache"] == "HIT"
+
+
+def test_acierto_rechaza_token_revocado(
+    crear_cliente, db, medico_id, auth_requerida, crear_token
+):
+    cliente = crear_cliente(db)
+    url = f"/api/citas/medico/{medico_id}"
+    token = crear_token()
+    assert cliente.get(url, headers=_bearer(token)).status_code == 200
+
+    TokenRevocadoCRUD(db).revocar_token(
+        verificar_token(token).jti, datetime.now(timezone.utc) + timedelta(hours=1)
+    )
+
+    revocado = cliente.get(url, headers=_bearer(token))
+    assert revocado.status_code == 401
+    assert revocado.json()["detail"]["message"] == "Token revocado"
+
+
+def test_escritura_invalida_la_respuesta(crear_cliente, db, medico_id):
+    from utils.cache import cache
+
+    cliente = crear_cliente(db)
+    url = f"/api/citas/medico/{medico_id}"
+    assert cliente.get(url).headers["x-cache"] == "MISS"
+    assert cliente.get(url).headers["x-cache"] == "HIT"
+
+    cache.invalidar(f"citas:medico:{medico_id}")
+
+    assert cliente.get(url).headers["x-cache"] == "MISS"
+
+
+def test_peticion_en_curso_exige_autenticacion(
+    crear_cliente, db, medico_id, auth_requerida, crear_token
+):
+    from utils.cache_respuestas import CacheRespuestasMiddleware
+
+    crear_cliente(db)
+    liberar = asyncio.Event()
+
+    async def endpoint_lento(scope, receive, send):
+        await liberar.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"[]"})
+
+    middleware = CacheRespuestasMiddleware(endpoint_lento)
+
+    def scope(cabeceras):
+        return {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("testserver", 80),
+            "root_path": "",
+            "path": f"/api/citas/medico/{medico_id}",
+            "query_string": b"",
+            "headers": cabeceras,
+            "app": main.app,
+        }
+
+    async def pedir(cabeceras):
+        mensajes = []
+
+        async def recibir():
+            return {"type": "http.request", "body": b""}
+
+        async def enviar(mensaje):
+            mensajes.append(mensaje)
+
+        await middleware(scope(cabeceras), recibir, enviar)
+        return mensajes[0]["status"]
+
+    async def escenario():
+        token = crear_token().encode()
+        primera = asyncio.create_task(pedir([(b"authorization", b"Bearer " + token)]))
+        await asyncio.sleep(0)
+        # La segunda llega con la primera en curso y no espera su resultado
+        anonima = await asyncio.wait_for(pedir([]), timeout=1)
+        liberar.set()
+        return await primera, anonima
+
+    assert asyncio.run(escenario()) == (200, 401)
+
+
+def test_error_en_curso_no_se_comparte(crear_cliente, db, medico_id):
+    from utils.cache_respuestas import CacheRespuestasMiddleware
+
+    crear_cliente(db)
+    liberar = asyncio.Event()
+    estados = iter([503, 200])
+
+    async def endpoint(scope, receive, send):
+        estado = next(estados)
+        if estado != 200:
+            await liberar.wait()
+        await send({"type": "http.response.start", "status": estado, "headers": []})
+        await send({"type": "http.response.body", "body": b"[]"})
+
+    middleware = CacheRespuestasMiddleware(endpoint)
+
+    async def pedir():
+        mensajes = []
+
+        async def recibir():
+            return {"type": "http.request", "body": b""}
+
+        async def enviar(mensaje):
+            mensajes.append(mensaje)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("testserver", 80),
+            "root_path": "",
+            "path": f"/api/citas/medico/{medico_id}",
+            "query_string": b"",
+            "headers": [],
+            "app": main.app,
+        }
+        await middleware(scope, recibir, enviar)
+        return mensajes[0]["status"], dict(mensajes[0]["headers"]).get(b"x-cache")
+
+    async def escenario():
+        primera = asyncio.create_task(pedir())
+        await asyncio.sleep(0)
+        segunda = asyncio.create_task(pedir())
+        await asyncio.sleep(0)
+        liberar.set()
+        return await primera, await segunda
+
+    # La segunda no recibe el 503 de la primera: ejecuta el endpoint
+    assert asyncio.run(escenario()) == ((503, b"MISS"), (200, None))
@@ -0,0 +1,157 @@
+"""
+Conciliación de pagos desde un extracto CSV (FacturaCRUD.conciliar_pagos)
+"""
+
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from crud.factura_crud import FacturaCRUD
+from entities.factura import Factura
+
+
+class _Resultado:
+    def __init__(self, filas):
+        self.filas = filas
+
+    def mappings(self):
+        return iter(self.filas)
+
+
+class _SesionFacturas:
+    """
+    Sesión que responde la búsqueda de facturas por número y el UPDATE que las
+    marca como pagadas
+
+    `estados_actuales` (id -> estado) simula cambios hechos por otra
+    transacción después de la búsqueda.
+    """
+
+    def __init__(self, facturas, estados_actuales=None):
+        self.facturas = facturas
+        self.estados_actuales = estados_actuales or {}
+        self.sentencias = []
+
+    def execute(self, sentencia, parametros=None):
+        self.sentencias.append(str(sentencia))
+        if "UPDATE" in str(sentencia):
+            filas = []
+            for factura_id in parametros["ids"]:
+                estado = self.estados_actuales.get(factura_id)
+                if estado in ("pendiente", "vencida"):
+                    filas.append(SimpleNamespace(id=factura_id, estado=estado))
+            return filas
+        return _Resultado(
+            [f for f in self.facturas if f["numero_factura"] in parametros["numeros"]]
+        )
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def _factura(numero, total, estado="pagada"):
+    return {
+        "id": uuid.uuid4(),
+        "numero_factura": numero,
+        "estado": estado,
+        "activo": True,
+        "total": Decimal(total),
+        "fecha_emision": datetime(2026, 9, 1),
+        "paciente_id": uuid.uuid4(),
+    }
+
+
+@pytest.mark.parametrize(
+    "monto",
+    ["nan", "NaN", "sNaN", "inf", "Infinity", "-Infinity", "0", "-5", "abc", ""],
+)
+def test_montos_invalidos_se_reportan_sin_fallar(monto):
+    db = _SesionFacturas([])
+    resultado = FacturaCRUD(db).conciliar_pagos(
+        ["numero_factura,monto", f"F-1,{monto}"]
+    )
+
+    assert resultado["lineas_procesadas"] == 1
+    assert [l["linea"] for l in resultado["lineas_invalidas"]] == [2]
+    assert resultado["monto_aplicado"] == Decimal("0")
+    # Sin pagos válidos no se consulta la base de datos
+    assert db.sentencias == []
+
+
+def test_lineas_invalidas_no_afectan_las_validas():
+    db = _SesionFacturas([_factura("F-1", "100.00")])
+    resultado = FacturaCRUD(db).conciliar_pagos(
+        [
+            "numero_factura,monto",
+            "F-1,60",
+            "F-1,nan",
+            "F-1,Infinity",
+            "F-1,40.00",
+        ]
+    )
+
+    assert [l["linea"] for l in resultado["lineas_invalidas"]] == [3, 4]
+    assert resultado["no_conciliadas"] == [
+        {
+            "numero_factura": "F-1",
+            "monto": Decimal("100.00"),
+            "total_factura": Decimal("100.00"),
+            "lineas": [2, 5],
+            "motivo": "factura pagada",
+        }
+    ]
+
+
+def test_csv_sin_columnas_requeridas():
+    with pytest.raises(ValueError, match="numero_factura y monto"):
+        FacturaCRUD(db=None).conciliar_pagos(["factura,valor", "F-1,10"])
+
+
+def test_archivo_no_utf8_se_rechaza(crear_sesion, crear_cliente, crear_token):
+    cliente = crear_cliente(crear_sesion(Factura))
+    respuesta = cliente.post(
+        "/api/facturas/conciliacion",
+        files={
+            "archivo": (
+                "extracto.csv",
+                "numero_factura,monto\nF-ñ,10\n".encode("latin-1"),
+            )
+        },
+        headers={"Authorization": f"Bearer {crear_token(es_admin=True)}"},
+    )
+
+    assert respuesta.status_code == 400
+    assert respuesta.json()["detail"] == "El archivo debe estar codificado en UTF-8"
+
+
+def test_resumen_usa_el_estado_de_la_fila_actualizada(monkeypatch):
+    vencida = _factura("F-1", "100.00", estado="pendiente")
+    cobrada = _factura("F-2", "50.00", estado="pendiente")
+    # Entre la búsqueda y el UPDATE otra transacción venció F-1 y cobró F-2
+    db = _SesionFacturas(
+        [vencida, cobrada], {vencida["id"]: "vencida", cobrada["id"]: "pagada"}
+    )
+    registrados = []
+    monkeypatch.setattr(
+        "crud.factura_crud.FacturaResumenCRUD.registrar_cambios",
+        lambda self, cambios: registrados.extend(cambios),
+    )
+
+    resultado = FacturaCRUD(db).conciliar_pagos(
+        ["numero_factura,monto", "F-1,100", "F-2,50"]
+    )
+
+    fecha = vencida["fecha_emision"].date()
+    assert registrados == [
+        (
+            (fecha, vencida["paciente_id"], "vencida", Decimal("100.00")),
+            (fecha, vencida["paciente_id"], "pagada", Decimal("100.00")),
+        )
+    ]
+    assert resultado["facturas_pagadas"] == 1
+    assert [f["numero_factura"] for f in resultado["no_conciliadas"]] == ["F-2"]
@@ -0,0 +1,190 @@
+"""
+Peticiones condicionales (ETag, Last-Modified, 304) y control de concurrencia
+optimista con If-Match (utils/condicional.py)
+"""
+
+import uuid
+from datetime import date
+
+import pytest
+from entities.medico import Medico
+from sqlalchemy import event, text
+from utils.directorio_personal import directorio_medicos
+
+
+@pytest.fixture(autouse=True)
+def directorio_vacio():
+    directorio_medicos.invalidar()
+    yield
+    directorio_medicos.invalidar()
+
+
+@pytest.fixture
+def db(crear_sesion):
+    return crear_sesion(Medico)
+
+
+@pytest.fixture
+def medico(db):
+    medico = Medico(
+        id=uuid.uuid4(),
+        nombre="Ana",
+        apellido="Pérez",
+        email="ana.perez@hospital.com",
+        especialidad="Cardiología",
+        numero_licencia="LIC-001",
+        fecha_nacimiento=date(1980, 5, 1),
+        activo=True,
+    )
+    db.add(medico)
+    db.commit()
+    return medico
+
+
+def test_detalle_responde_304_con_el_mismo_etag(crear_cliente, db, medico):
+    cliente = crear_cliente(db)
+    url = f"/api/medicos/{medico.id}"
+
+    respuesta = cliente.get(url)
+    assert respuesta.status_code == 200
+    assert respuesta.headers["etag"] == '"v1"'
+    assert "last-modified" in respuesta.headers
+
+    por_etag = cliente.get(url, headers={"If-None-Match": '"v1"'})
+    assert por_etag.status_code == 304
+    assert por_etag.content == b""
+    assert por_etag.headers["etag"] == '"v1"'
+
+    otra_version = cliente.get(url, headers={"If-None-Match": '"v0"'})
+    assert otra_version.status_code == 200
+
+
+def test_detalle_no_mezcla_etag_nuevo_con_copia_del_directorio(
+    crear_cliente, db, medico
+):
+    cliente = crear_cliente(db)
+    url = f"/api/medicos/{medico.id}"
+    assert cliente.get(url).json()["nombre"] == "Ana"
+
+    # Escritura de otro proceso: este directorio todavía tiene la versión 1
+    db.execute(
+        text("UPDATE tbl_medicos SET nombre = 'Ana María', version = 2"),
+    )
+    db.commit()
+
+    respuesta = cliente.get(url)
+    assert respuesta.headers["etag"] == '"v2"'
+    assert respuesta.json()["nombre"] == "Ana María"
+
+
+def test_listado_responde_304(crear_cliente, db, medico):
+    cliente = crear_cliente(db)
+
+    respuesta = cliente.get("/api/medicos/")
+    assert respuesta.status_code == 200
+    etag = respuesta.headers["etag"]
+
+    assert (
+        cliente.get("/api/medicos/", headers={"If-None-Match": etag}).status_code == 304
+    )
+    filtrado = cliente.get(
+        "/api/medicos/",
+        params={"especialidad": "Pediatría"},
+        headers={"If-None-Match": etag},
+    )
+    assert filtrado.status_code == 200
+
+
+def test_etag_del_listado_depende_solo_de_la_pagina(crear_cliente, db, medico):
+    otro = Medico(
+        id=uuid.uuid4(),
+        nombre="Luis",
+        apellido="Gómez",
+        email="luis.gomez@hospital.com",
+        especialidad="Pediatría",
+        numero_licencia="LIC-002",
+        fecha_nacimiento=date(1985, 2, 3),
+        activo=True,
+    )
+    db.add(otro)
+    db.commit()
+    cliente = crear_cliente(db)
+    sentencias = []
+    event.listen(
+        db.get_bind(),
+        "before_cursor_execute",
+        lambda conn, cursor, sql, *args: sentencias.append(sql),
+    )
+
+    pagina = cliente.get("/api/medicos/", params={"limit": 1})
+    etag = pagina.headers["etag"]
+    en_pagina = pagina.json()[0]["id"]
+    fuera = str(otro.id) if en_pagina == str(medico.id) else str(medico.id)
+    # La versión se calcula sobre la página, sin agregar toda la tabla
+    assert "LIMIT" in sentencias[0] and "count(" not in sentencias[0].lower()
+
+    def actualizar(medico_id, version):
+        db.execute(
+            text("UPDATE tbl_medicos SET version = :version WHERE id = :id"),
+            {"version": version, "id": uuid.UUID(medico_id).hex},
+        )
+        db.commit()
+
+    actualizar(fuera, 2)
+    sin_cambios = cliente.get(
+        "/api/medicos/", params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+    assert sin_cambios.status_code == 304
+
+    actualizar(en_pagina, 2)
+    cambiada = cliente.get(
+        "/api/medicos/", params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+    assert cambiada.status_code == 200
+    assert cambiada.headers["etag"] != etag
+
+
+def test_put_con_if_match_vigente_actualiza(crear_cliente, db, medico):
+    cliente = crear_cliente(db)
+
+    respuesta = cliente.put(
+        f"/api/medicos/{medico.id}",
+        json={"consultorio": "B-12"},
+        headers={"If-Match": '"v1"'},
+    )
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["consultorio"] == "B-12"
+    assert respuesta.headers["etag"] == '"v2"'
+
+
+def test_put_con_version_vieja_responde_409_con_la_actual(crear_cliente, db, medico):
+    cliente = crear_cliente(db)
+    url = f"/api/medicos/{medico.id}"
+    primera = cliente.put(
+        url, json={"consultorio": "B-12"}, headers={"If-Match": '"v1"'}
+    )
+    assert primera.status_code == 200
+
+    # Segunda escritura basada en la misma lectura: no pisa la primera
+    conflicto = cliente.put(
+        url, json={"consultorio": "C-3"}, headers={"If-Match": '"v1"'}
+    )
+
+    assert conflicto.status_code == 409
+    assert conflicto.headers["etag"] == '"v2"'
+    assert conflicto.json()["actual"]["consultorio"] == "B-12"
+    db.expire_all()
+    assert db.get(Medico, medico.id).consultorio == "B-12"
+
+
+def test_put_con_etag_que_no_es_de_version_responde_409(crear_cliente, db, medico):
+    cliente = crear_cliente(db)
+
+    respuesta = cliente.put(
+        f"/api/medicos/{medico.id}",
+        json={"consultorio": "B-12"},
+        headers={"If-Match": '"3f1c9a"'},
+    )
+
+    assert respuesta.status_code == 409
@@ -0,0 +1,157 @@
+"""
+Corrida de facturación mensual (crud/facturacion_crud.py)
+
+El procesamiento por lotes usa SQL de PostgreSQL (bloqueos consultivos,
+INSERT ... ON CONFLICT); aquí se prueban el cálculo de los montos, la
+elección de tarifas y el control de la corrida sin base de datos real.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from crud.facturacion_crud import FacturacionCRUD, _limites_periodo
+from entities.tarifa import Tarifa
+
+
+def _tarifa(codigo, tipo_origen, precio, especialidad=None, impuesto=0, **kwargs):
+    return Tarifa(
+        codigo=codigo,
+        descripcion=f"Tarifa {codigo}",
+        tipo_origen=tipo_origen,
+        especialidad=especialidad,
+        precio_unitario=Decimal(precio),
+        porcentaje_impuesto=Decimal(impuesto),
+        **kwargs,
+    )
+
+
+def _item(tipo_origen, cantidad=1, especialidad=None):
+    return {
+        "tipo_origen": tipo_origen,
+        "cantidad": cantidad,
+        "especialidad": especialidad,
+        "descripcion": "Servicio",
+    }
+
+
+def test_limites_periodo():
+    assert _limites_periodo("2026-03") == (datetime(2026, 3, 1), datetime(2026, 4, 1))
+    assert _limites_periodo("2025-12") == (datetime(2025, 12, 1), datetime(2026, 1, 1))
+    with pytest.raises(ValueError):
+        _limites_periodo("2026/03")
+
+
+def test_calcular_detalles_usa_tarifa_por_especialidad_y_redondea():
+    tarifas = {
+        ("cita", None): _tarifa("CG", "cita", "50.00", impuesto="10"),
+        ("cita", "Cardiología"): _tarifa("CC", "cita", "80.005", "Cardiología", "19"),
+        ("hospitalizacion", None): _tarifa("HG", "hospitalizacion", "120.50"),
+    }
+    items = [
+        _item("cita", especialidad="Cardiología"),
+        _item("cita", especialidad="Pediatría"),
+        _item("hospitalizacion", cantidad=3),
+    ]
+
+    detalles, subtotal, impuestos = FacturacionCRUD._calcular_detalles(items, tarifas)
+
+    assert [d["subtotal"] for d in detalles] == [
+        Decimal("80.01"),
+        Decimal("50.00"),
+        Decimal("361.50"),
+    ]
+    assert [d["descripcion"] for d in detalles] == [
+        "Tarifa CC - Servicio",
+        "Tarifa CG - Servicio",
+        "Tarifa HG - Servicio",
+    ]
+    assert subtotal == Decimal("491.51")
+    # 80.01 * 19 % = 15.2019 -> 15.20; 50.00 * 10 % = 5.00
+    assert impuestos == Decimal("20.20")
+
+
+def test_cargar_tarifas_elige_la_mas_reciente(crear_sesion):
+    db = crear_sesion(Tarifa)
+    ahora = datetime.now()
+    db.add_all(
+        [
+            _tarifa("C-2025", "cita", "40", fecha_creacion=ahora - timedelta(days=365)),
+            _tarifa("C-2026", "cita", "45", fecha_creacion=ahora),
+            _tarifa("C-OLD", "cita", "10", fecha_creacion=ahora, activo=False),
+            _tarifa("H-B", "hospitalizacion", "200", fecha_creacion=ahora),
+            _tarifa("H-A", "hospitalizacion", "100", fecha_creacion=ahora),
+        ]
+    )
+    db.commit()
+
+    tarifas = FacturacionCRUD(db)._cargar_tarifas()
+
+    assert tarifas[("cita", None)].codigo == "C-2026"
+    # A igual fecha de creación desempata el código
+    assert tarifas[("hospitalizacion", None)].codigo == "H-A"
+
+
+def test_cargar_tarifas_exige_tarifa_general(crear_sesion):
+    db = crear_sesion(Tarifa)
+    db.add(_tarifa("CC", "cita", "80", especialidad="Cardiología"))
+    db.add(_tarifa("HG", "hospitalizacion", "100"))
+    db.commit()
+
+    with pytest.raises(ValueError, match="tarifa general activa para 'cita'"):
+        FacturacionCRUD(db)._cargar_tarifas()
+
+
+def test_ejecutar_corrida_procesa_lotes_hasta_agotar(monkeypatch):
+    corrida = SimpleNamespace(periodo="2026-09", estado="en_proceso")
+    db = SimpleNamespace(
+        commit=lambda: None, rollback=lambda: None, refresh=lambda o: None
+    )
+    crud = FacturacionCRUD(db)
+    lotes = iter([(500, 700), (120, 130), (0, 0)])
+    llamadas = []
+
+    def procesar_lote(corrida_lote, desde, hasta, tarifas):
+        llamadas.append((desde, hasta))
+        return next(lotes)
+
+    monkeypatch.setattr(crud, "iniciar_corrida", lambda periodo, usuario: corrida)
+    monkeypatch.setattr(crud, "obtener_corrida", lambda periodo: corrida)
+    monkeypatch.setattr(crud, "_cargar_tarifas", lambda: {})
+    monkeypatch.setattr(crud, "_procesar_lote", procesar_lote)
+
+    resultado = crud.ejecutar_corrida("2026-09")
+
+    assert resultado.estado == "completada"
+    assert resultado.fecha_fin is not None
+    assert llamadas == [(datetime(2026, 9, 1), datetime(2026, 10, 1))] * 3
+
+
+def test_ejecutar_corrida_fallida_queda_registrada(monkeypatch):
+    corrida = SimpleNamespace(periodo="2026-09", estado="en_proceso", error=None)
+    db = SimpleNamespace(commit=lambda: None, rollback=lambda: None)
+    crud = FacturacionCRUD(db)
+
+    def sin_tarifas():
+        raise ValueError("No hay una tarifa general activa para 'cita'")
+
+    monkeypatch.setattr(crud, "iniciar_corrida", lambda periodo, usuario: corrida)
+    monkeypatch.setattr(crud, "obtener_corrida", lambda periodo: corrida)
+    monkeypatch.setattr(crud, "_cargar_tarifas", sin_tarifas)
+
+    with pytest.raises(ValueError):
+        crud.ejecutar_corrida("2026-09")
+    assert corrida.estado == "fallida"
+    assert "tarifa general" in corrida.error
+
+
+def test_ejecutar_corrida_completada_no_se_repite(monkeypatch):
+    crud = FacturacionCRUD(db=None)
+    corrida = SimpleNamespace(periodo="2026-09", estado="completada")
+    monkeypatch.setattr(crud, "iniciar_corrida", lambda periodo, usuario: corrida)
+    monkeypatch.setattr(
+        crud, "_cargar_tarifas", lambda: pytest.fail("no debe volver a facturar")
+    )
+
+    assert crud.ejecutar_corrida("2026-09") is corrida
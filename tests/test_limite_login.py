@@ -0,0 +1,98 @@
+"""
+Límite de intentos de inicio de sesión (auth/limite_login.py)
+"""
+
+import asyncio
+
+import pytest
+from auth import limite_login as modulo
+from auth.limite_login import LimiteLogin, LoginBloqueadoError
+from crud.usuario_crud import UsuarioCRUD
+from utils.cache import BackendMemoria
+
+
+@pytest.fixture
+def limite(monkeypatch):
+    limite = LimiteLogin(BackendMemoria())
+    monkeypatch.setattr("apis.auth.limite_login", limite)
+    return limite
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """Contar las verificaciones de contraseña (siempre incorrectas)"""
+    llamadas = []
+
+    def autenticar_usuario(self, nombre_usuario, contrasena):
+        llamadas.append(nombre_usuario)
+        return None
+
+    monkeypatch.setattr(UsuarioCRUD, "autenticar_usuario", autenticar_usuario)
+    return llamadas
+
+
+def _login(cliente, usuario="ana"):
+    return cliente.post(
+        "/api/auth/login", json={"nombre_usuario": usuario, "contraseña": "mala"}
+    )
+
+
+def test_bloqueo_crece_exponencialmente(monkeypatch):
+    monkeypatch.setattr(modulo, "LOGIN_FALLOS_USUARIO", 3)
+    monkeypatch.setattr(modulo, "LOGIN_BLOQUEO_INICIAL", 1)
+    monkeypatch.setattr(modulo, "LOGIN_BLOQUEO_MAXIMO", 5)
+
+    assert [LimiteLogin._bloqueo(n, 3) for n in range(1, 8)] == [0, 0, 1, 2, 4, 5, 5]
+
+
+def test_fallos_bloquean_y_el_exito_reinicia(monkeypatch):
+    monkeypatch.setattr(modulo, "LOGIN_FALLOS_USUARIO", 2)
+    limite = LimiteLogin(BackendMemoria())
+
+    async def escenario():
+        await limite.verificar("ana", "10.0.0.1")
+        await limite.registrar_fallo("Ana ", "10.0.0.1")
+        await limite.verificar("ana", "10.0.0.1")
+        await limite.registrar_fallo("ana", "10.0.0.2")
+        # El bloqueo es por usuario aunque cambie la IP
+        with pytest.raises(LoginBloqueadoError) as error:
+            await limite.verificar("ana", "10.0.0.3")
+        assert 0 < error.value.espera <= modulo.LOGIN_BLOQUEO_INICIAL
+        # Otro usuario desde otra IP no se ve afectado
+        await limite.verificar("luis", "10.0.0.4")
+
+        await limite.registrar_exito("ana")
+        await limite.verificar("ana", "10.0.0.3")
+
+    asyncio.run(escenario())
+
+
+def test_rafaga_por_ip(monkeypatch):
+    monkeypatch.setattr(modulo, "LOGIN_INTENTOS_IP_POR_MINUTO", 3)
+    limite = LimiteLogin(BackendMemoria())
+
+    async def escenario():
+        for usuario in ("a", "b", "c"):
+            await limite.verificar(usuario, "10.0.0.1")
+        with pytest.raises(LoginBloqueadoError):
+            await limite.verificar("d", "10.0.0.1")
+        await limite.verificar("d", "10.0.0.2")
+
+    asyncio.run(escenario())
+
+
+def test_login_bloqueado_responde_429_sin_calcular_el_hash(
+    crear_cliente, limite, hashes, monkeypatch
+):
+    monkeypatch.setattr(modulo, "LOGIN_FALLOS_USUARIO", 3)
+    cliente = crear_cliente(None)
+
+    estados = [_login(cliente).status_code for _ in range(3)]
+    bloqueado = _login(cliente)
+
+    assert estados == [401, 401, 401]
+    assert bloqueado.status_code == 429
+    assert int(bloqueado.headers["retry-after"]) >= 1
+    assert bloqueado.json()["detail"]["error_type"] == "RATE_LIMIT_ERROR"
+    # El cuarto intento se rechazó antes de verificar la contraseña
+    assert len(hashes) == 3
@@ -0,0 +1,179 @@
+"""
+Réplicas de lectura y cachés (database/replicas.py)
+
+Las cachés compartidas se llenan desde la primaria y no se usan mientras el
+cliente lee de la primaria tras una escritura.
+"""
+
+import time
+import uuid
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+from crud.medico_crud import MedicoCRUD
+from database.replicas import CABECERA_LECTURA_PRIMARIA, balanceador, get_read_db
+from entities.cita import Cita
+from entities.medico import Medico
+from entities.paciente import Paciente
+from utils.cache import cache
+from utils.directorio_personal import directorio_medicos
+
+
+@pytest.fixture(autouse=True)
+def directorio_vacio():
+    directorio_medicos.invalidar()
+    yield
+    directorio_medicos.invalidar()
+
+
+@pytest.fixture
+def primaria(crear_sesion, monkeypatch):
+    db = crear_sesion(Medico, Cita, Paciente)
+    monkeypatch.setattr("database.replicas.SessionLocal", lambda: db)
+    return db
+
+
+@pytest.fixture
+def replica(crear_sesion, monkeypatch):
+    db = crear_sesion(Medico, Cita, Paciente)
+    db.info["replica"] = True
+    monkeypatch.setattr(
+        balanceador, "elegir", lambda: SimpleNamespace(sesiones=lambda: db)
+    )
+    return db
+
+
+def _medico(medico_id, nombre):
+    return Medico(
+        id=medico_id,
+        nombre=nombre,
+        apellido="Pérez",
+        email="ana.perez@hospital.com",
+        especialidad="Cardiología",
+        numero_licencia="LIC-001",
+        fecha_nacimiento=date(1980, 5, 1),
+        activo=True,
+    )
+
+
+def _cita(medico_id, motivo):
+    return Cita(
+        paciente_id=uuid.uuid4(),
+        medico_id=medico_id,
+        fecha_cita=datetime(2026, 10, 20, 9, 0),
+        motivo=motivo,
+        estado="programada",
+        activo=True,
+    )
+
+
+def test_directorio_se_llena_desde_la_primaria(primaria, replica):
+    medico_id = uuid.uuid4()
+    primaria.add(_medico(medico_id, "Ana María"))
+    primaria.commit()
+    # La réplica todavía no recibió el cambio de nombre
+    replica.add(_medico(medico_id, "Ana"))
+    replica.commit()
+
+    registro = MedicoCRUD(replica).obtener_del_directorio("id", medico_id)
+    lista = MedicoCRUD(replica).listar_por_especialidad_directorio("Cardiología")
+
+    assert registro.nombre == "Ana María"
+    assert [r.nombre for r in lista] == ["Ana María"]
+
+
+@pytest.fixture
+def cliente(crear_cliente, primaria):
+    cliente = crear_cliente(primaria)
+    # get_read_db real, con la primaria y la réplica de las pruebas
+    del cliente.app.dependency_overrides[get_read_db]
+    return cliente
+
+
+def test_cache_de_respuestas_se_llena_desde_la_primaria(cliente, primaria, replica):
+    medico_id = uuid.uuid4()
+    primaria.add_all([_cita(medico_id, "Control"), _cita(medico_id, "Urgencia")])
+    primaria.commit()
+    replica.add(_cita(medico_id, "Control"))
+    replica.commit()
+    url = f"/api/citas/medico/{medico_id}"
+
+    llenada = cliente.get(url)
+    servida = cliente.get(url)
+    sin_cache = cliente.get(url, headers={"Cache-Control": "no-cache"})
+
+    assert llenada.headers["x-cache"] == "MISS"
+    assert len(llenada.json()) == 2
+    assert servida.headers["x-cache"] == "HIT"
+    # Las lecturas que no llenan la caché siguen yendo a la réplica
+    assert len(sin_cache.json()) == 1
+
+
+def test_tras_una_escritura_se_omiten_las_caches(cliente, primaria, replica):
+    medico_id = uuid.uuid4()
+    primaria.add(_cita(medico_id, "Control"))
+    primaria.add(_medico(medico_id, "Ana"))
+    primaria.commit()
+    replica.add(_medico(medico_id, "Ana"))
+    replica.commit()
+    citas = f"/api/citas/medico/{medico_id}"
+    assert cliente.get(citas).headers["x-cache"] == "MISS"
+    assert cliente.get(f"/api/medicos/{medico_id}").json()["nombre"] == "Ana"
+
+    # Escritura del cliente que todavía no invalidó nada en este proceso
+    primaria.add(_cita(medico_id, "Urgencia"))
+    primaria.query(Medico).update({"nombre": "Ana María", "version": 2})
+    primaria.commit()
+    marca = {CABECERA_LECTURA_PRIMARIA: f"{time.time() + 3:.3f}"}
+
+    respuesta_citas = cliente.get(citas, headers=marca)
+    respuesta_medico = cliente.get(f"/api/medicos/{medico_id}", headers=marca)
+
+    assert "x-cache" not in respuesta_citas.headers
+    assert len(respuesta_citas.json()) == 2
+    assert respuesta_medico.json()["nombre"] == "Ana María"
+    assert respuesta_medico.headers["etag"] == '"v2"'
+
+
+def _paciente(paciente_id, nombre, version=1):
+    return Paciente(
+        id=paciente_id,
+        nombre=nombre,
+        apellido="Gómez",
+        email="luis.gomez@correo.com",
+        fecha_nacimiento=date(1990, 3, 2),
+        activo=True,
+        version=version,
+    )
+
+
+def test_cache_de_pacientes_se_llena_desde_la_primaria(cliente, primaria, replica):
+    paciente_id = uuid.uuid4()
+    primaria.add(_paciente(paciente_id, "Luis Alberto", version=2))
+    primaria.commit()
+    replica.add(_paciente(paciente_id, "Luis"))
+    replica.commit()
+    url = f"/api/pacientes/{paciente_id}"
+
+    assert cliente.get(url).json()["nombre"] == "Luis Alberto"
+    guardado = cache.obtener(f"paciente:{paciente_id}", [f"paciente:{paciente_id}"])
+    assert guardado["nombre"] == "Luis Alberto"
+
+
+def test_tras_una_escritura_se_omite_la_cache_de_pacientes(cliente, primaria, replica):
+    paciente_id = uuid.uuid4()
+    primaria.add(_paciente(paciente_id, "Luis"))
+    primaria.commit()
+    replica.add(_paciente(paciente_id, "Luis"))
+    replica.commit()
+    url = f"/api/pacientes/{paciente_id}"
+    assert cliente.get(url).json()["nombre"] == "Luis"
+
+    # Escritura que todavía no invalidó la entrada en este proceso
+    primaria.query(Paciente).update({"nombre": "Luis Alberto", "version": 2})
+    primaria.commit()
+    marca = {CABECERA_LECTURA_PRIMARIA: f"{time.time() + 3:.3f}"}
+
+    assert cliente.get(url, headers=marca).json()["nombre"] == "Luis Alberto"
+    assert cliente.get(url).json()["nombre"] == "Luis"
@@ -0,0 +1,152 @@
+"""
+Revocación de tokens de acceso (auth/revocacion.py y auth/dependencias.py)
+"""
+
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from auth.revocacion import RegistroRevocaciones, clave_token, clave_usuario
+from auth.tokens import TOKEN_MINUTOS, verificar_token
+from crud.token_revocado_crud import TokenRevocadoCRUD, actualizar_revocaciones
+from entities.medico import Medico
+from entities.refresh_token import RefreshToken
+from entities.token_revocado import TokenRevocado
+from entities.usuario import Usuario
+
+
+@pytest.fixture
+def db(crear_sesion):
+    return crear_sesion(Usuario, RefreshToken, TokenRevocado, Medico)
+
+
+@pytest.fixture
+def cliente(crear_cliente, db, monkeypatch):
+    monkeypatch.setattr("auth.dependencias.AUTH_REQUERIDA", True)
+    return crear_cliente(db)
+
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_filtro_sin_falsos_negativos():
+    registro = RegistroRevocaciones(1000, 0.01)
+    usuario_id = uuid.uuid4()
+    registro.agregar(clave_token("abc"))
+    registro.agregar(clave_usuario(usuario_id))
+
+    assert registro.posiblemente_revocado("abc", uuid.uuid4())
+    assert registro.posiblemente_revocado("otro", usuario_id)
+    assert not registro.posiblemente_revocado("otro", uuid.uuid4())
+
+
+def test_reconstruccion_conserva_las_revocaciones_concurrentes():
+    registro = RegistroRevocaciones(1000, 0.01)
+    registro.iniciar_reconstruccion()
+    # Llega mientras se lee la base de datos y no está en lo que se leyó
+    registro.agregar(clave_token("durante"))
+    registro.reemplazar([clave_token("cargada")], datetime.now(timezone.utc))
+
+    assert registro.posiblemente_revocado("durante", uuid.uuid4())
+    assert registro.posiblemente_revocado("cargada", uuid.uuid4())
+    assert not registro.reconstruir_pendiente
+
+
+def test_token_revocado_se_rechaza(cliente, db, crear_token):
+    token = crear_token()
+    assert cliente.get("/api/medicos/", headers=_bearer(token)).status_code == 200
+
+    TokenRevocadoCRUD(db).revocar_token(
+        verificar_token(token).jti, datetime.now(timezone.utc) + timedelta(hours=1)
+    )
+
+    respuesta = cliente.get("/api/medicos/", headers=_bearer(token))
+    assert respuesta.status_code == 401
+    assert respuesta.json()["detail"]["message"] == "Token revocado"
+    assert (
+        cliente.get("/api/medicos/", headers=_bearer(crear_token())).status_code == 200
+    )
+
+
+def test_revocar_usuario_solo_afecta_tokens_anteriores(cliente, crear_token):
+    usuario_id = uuid.uuid4()
+    anterior = crear_token(usuario_id=usuario_id)
+
+    respuesta = cliente.post(
+        f"/api/auth/revocar/{usuario_id}", headers=_bearer(crear_token(es_admin=True))
+    )
+    assert respuesta.status_code == 200
+
+    assert cliente.get("/api/medicos/", headers=_bearer(anterior)).status_code == 401
+    nuevo = crear_token(usuario_id=usuario_id)
+    assert cliente.get("/api/medicos/", headers=_bearer(nuevo)).status_code == 200
+
+
+def test_revocar_usuario_exige_admin(cliente, crear_token):
+    respuesta = cliente.post(
+        f"/api/auth/revocar/{uuid.uuid4()}", headers=_bearer(crear_token())
+    )
+    assert respuesta.status_code == 403
+
+
+def test_falso_positivo_del_filtro_se_confirma_en_la_bd(
+    cliente, revocaciones, crear_token
+):
+    token = crear_token()
+    # El filtro dice "posiblemente revocado" pero la BD no tiene la revocación
+    revocaciones.agregar(clave_token(verificar_token(token).jti))
+
+    assert cliente.get("/api/medicos/", headers=_bearer(token)).status_code == 200
+    assert revocaciones.posibles_aciertos == 1
+
+
+def test_revocacion_de_usuario_programa_la_reconstruccion():
+    registro = RegistroRevocaciones(1000, 0.01)
+    assert not registro.vencio_revocacion_usuario()
+
+    registro.agregar(clave_token("abc"))
+    assert registro.vencimiento_usuarios is None
+
+    registro.agregar(clave_usuario(uuid.uuid4()))
+    assert registro.vencimiento_usuarios == pytest.approx(
+        time.time() + TOKEN_MINUTOS * 60, abs=5
+    )
+    assert not registro.vencio_revocacion_usuario()
+
+
+def test_filtro_se_reconstruye_al_vencer_una_revocacion_de_usuario(
+    db, revocaciones, monkeypatch
+):
+    monkeypatch.setattr("crud.token_revocado_crud.SessionLocal", lambda: db)
+    vencida, vigente = uuid.uuid4(), uuid.uuid4()
+    ahora = datetime.now(timezone.utc)
+    expira_vigente = ahora + timedelta(minutes=10)
+    db.add_all(
+        [
+            TokenRevocado(
+                clave=clave_usuario(vencida),
+                emitidos_antes=ahora - timedelta(hours=1),
+                expira=ahora - timedelta(minutes=1),
+            ),
+            TokenRevocado(
+                clave=clave_usuario(vigente),
+                emitidos_antes=ahora,
+                expira=expira_vigente,
+            ),
+        ]
+    )
+    db.commit()
+    actualizar_revocaciones()
+    revocaciones.agregar(clave_usuario(vencida))
+    # Recién reconstruido: solo el vencimiento de la revocación lo vuelve a hacer
+    revocaciones.vencimiento_usuarios = time.time() - 1
+
+    actualizar_revocaciones()
+
+    assert not revocaciones.posiblemente_revocado(None, vencida)
+    assert revocaciones.posiblemente_revocado(None, vigente)
+    assert revocaciones.vencimiento_usuarios == pytest.approx(
+        expira_vigente.timestamp(), abs=1
+    )
@@ -0,0 +1,88 @@
+"""
+Clases de timeout por ruta y respuesta a las consultas canceladas
+(utils/timeout_sql.py)
+"""
+
+import pytest
+from crud.cita_crud import CitaCRUD
+from entities.cita import Cita
+from fastapi.routing import APIRoute
+from sqlalchemy.exc import OperationalError
+from utils.consultas_sql import ConsultaCanceladaError, consultas_peticion
+from utils.timeout_sql import SQLSTATE_CANCELADA, clase_de_ruta, timeout_sql
+
+import main
+
+
+class _ErrorDriver(Exception):
+    pgcode = SQLSTATE_CANCELADA
+
+
+def _ruta(path: str, metodo: str) -> APIRoute:
+    for ruta in main.app.routes:
+        if isinstance(ruta, APIRoute) and ruta.path == path and metodo in ruta.methods:
+            return ruta
+    raise AssertionError(f"No existe {metodo} {path}")
+
+
+@pytest.mark.parametrize(
+    "metodo, path, clase",
+    [
+        ("GET", "/api/medicos/{medico_id}", "lectura"),
+        ("GET", "/api/citas/fecha/{fecha}", "lectura"),
+        ("POST", "/api/citas/", "escritura"),
+        ("PUT", "/api/citas/{cita_id}", "escritura"),
+        ("GET", "/api/medicos/buscar/{nombre}", "busqueda"),
+        ("GET", "/api/enfermeras/buscar/{nombre}", "busqueda"),
+        ("GET", "/api/facturas/{factura_id}/pdf", "exportacion"),
+        ("POST", "/api/facturas/resumen/recalcular", "exportacion"),
+    ],
+)
+def test_clase_de_ruta(metodo, path, clase):
+    assert clase_de_ruta(_ruta(path, metodo), metodo) == clase
+
+
+def test_timeout_sql_rechaza_clase_desconocida():
+    with pytest.raises(ValueError):
+        timeout_sql("reportes")
+
+
+@pytest.fixture
+def cliente(crear_sesion, crear_cliente, crear_token):
+    cliente = crear_cliente(crear_sesion(Cita))
+    cliente.headers["Authorization"] = f"Bearer {crear_token()}"
+    return cliente
+
+
+def test_statement_timeout_responde_504_sin_sql(cliente, monkeypatch):
+    def vencida(self, fecha):
+        raise OperationalError("SELECT secreto FROM citas", {}, _ErrorDriver())
+
+    monkeypatch.setattr(CitaCRUD, "obtener_citas_por_fecha", vencida)
+    respuesta = cliente.get("/api/citas/fecha/2024-01-01")
+
+    assert respuesta.status_code == 504
+    assert respuesta.json()["detail"]["error_type"] == "TIMEOUT_ERROR"
+    assert "secreto" not in respuesta.text
+
+
+def test_cliente_desconectado_responde_503(cliente, monkeypatch):
+    def cancelada(self, fecha):
+        consultas_peticion.get().cancelada = True
+        raise ConsultaCanceladaError("El cliente se desconectó")
+
+    monkeypatch.setattr(CitaCRUD, "obtener_citas_por_fecha", cancelada)
+    respuesta = cliente.get("/api/citas/fecha/2024-01-01")
+
+    assert respuesta.status_code == 503
+    assert respuesta.json()["detail"]["error_type"] == "SERVICE_UNAVAILABLE"
+
+
+def test_otros_errores_siguen_en_500(cliente, monkeypatch):
+    def falla(self, fecha):
+        raise OperationalError("SELECT 1", {}, Exception("conexión perdida"))
+
+    monkeypatch.setattr(CitaCRUD, "obtener_citas_por_fecha", falla)
+    respuesta = cliente.get("/api/citas/fecha/2024-01-01")
+
+    assert respuesta.status_code == 500
@@ -0,0 +1,255 @@
+"""
+Control de admisión: límite de peticiones concurrentes por grupo de rutas
+
+Cuando el pool de conexiones se agota todas las peticiones esperan el
+checkout hasta el timeout. Limitar cuántas peticiones de cada grupo avanzan a
+la vez, y rechazar con 503 las que tendrían que esperar demasiado, mantiene
+acotada la latencia de las que sí se atienden.
+
+Cada petición admitida puede ocupar una conexión, así que la suma de los
+límites no debería superar la capacidad del pool (DB_POOL_SIZE +
+DB_MAX_OVERFLOW): los límites por defecto son una parte de esa capacidad y al
+importar el módulo se avisa si los configurados la exceden.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from database.pool import DB_MAX_OVERFLOW, DB_POOL_SIZE
+from fastapi.responses import JSONResponse
+from utils.error_handler import APIErrorHandler
+from utils.rutas import resolver_ruta
+from utils.timeout_sql import clase_de_ruta
+
+logger = logging.getLogger(__name__)
+
+ADMISION_HABILITADA = os.getenv("ADMISION_HABILITADA", "true").lower() == "true"
+# Conexiones que puede abrir el pool de cada engine
+CAPACIDAD_POOL = DB_POOL_SIZE + DB_MAX_OVERFLOW
+# Parte de la capacidad del pool que toca a cada grupo si no se fija su límite
+_PROPORCIONES = {
+    "lectura": 0.35,
+    "busqueda": 0.15,
+    "escritura": 0.25,
+    "exportacion": 0.1,
+    "auth": 0.15,
+}
+
+
+def limite_por_defecto(grupo: str, capacidad: int = CAPACIDAD_POOL) -> int:
+    """Límite de un grupo según la capacidad del pool (al menos 1)"""
+    return max(1, int(capacidad * _PROPORCIONES[grupo]))
+
+
+# Peticiones simultáneas por grupo; 0 es sin límite
+ADMISION_LIMITES = {
+    grupo: int(os.getenv(f"ADMISION_{grupo.upper()}", limite_por_defecto(grupo)))
+    for grupo in _PROPORCIONES
+}
+# Segundos que una petición puede esperar turno antes de recibir 503
+ADMISION_ESPERA_MAXIMA = float(os.getenv("ADMISION_ESPERA_MAXIMA", 1.0))
+# Rutas que no usan la base de datos y se atienden siempre
+RUTAS_LIBRES = {
+    "/",
+    "/api/auth/estado",
+    "/metrics",
+    "/metrics/pool",
+    "/metrics/admision",
+    "/metricas/directorio",
+    "/docs",
+    "/redoc",
+    "/openapi.json",
+}
+# Duración inicial estimada de una petición, hasta medir las reales
+_DURACION_INICIAL = 0.05
+_PESO_MEDICION = 0.2
+
+
+class SobrecargaError(Exception):
+    """La petición no fue admitida; `espera` es la espera estimada en segundos"""
+
+    def __init__(self, espera: float):
+        super().__init__("Servidor saturado")
+        self.espera = espera
+
+
+class GrupoAdmision:
+    """
+    Semáforo con cola FIFO y estimación de espera
+
+    Solo se usa desde el event loop, así que no necesita locks. La espera se
+    estima con la cola delante y la duración media (móvil exponencial) de las
+    peticiones del grupo; si supera ADMISION_ESPERA_MAXIMA se rechaza sin
+    hacer cola.
+    """
+
+    def __init__(self, nombre: str, limite: int):
+        self.nombre = nombre
+        self.limite = limite
+        self.en_curso = 0
+        self.duracion_media = _DURACION_INICIAL
+        self.admitidas = 0
+        self.rechazadas = 0
+        self._cola: Deque[asyncio.Future] = deque()
+
+    def espera_estimada(self) -> float:
+        return (len(self._cola) + 1) / self.limite * self.duracion_media
+
+    async def entrar(self) -> None:
+        """
+        Esperar un lugar en el grupo
+
+        Raises:
+            SobrecargaError: Si la espera estimada o la real superan el máximo
+        """
+        if self.en_curso < self.limite and not self._cola:
+            self.en_curso += 1
+            self.admitidas += 1
+            return
+        estimada = self.espera_estimada()
+        if estimada > ADMISION_ESPERA_MAXIMA:
+            self.rechazadas += 1
+            raise SobrecargaError(estimada)
+
+        turno = asyncio.get_running_loop().create_future()
+        self._cola.append(turno)
+        try:
+            await asyncio.wait_for(turno, ADMISION_ESPERA_MAXIMA)
+        except asyncio.TimeoutError:
+            self._quitar(turno)
+            self.rechazadas += 1
+            raise SobrecargaError(self.espera_estimada())
+        except asyncio.CancelledError:
+            if turno.done() and not turno.cancelled():
+                # Ya se le había cedido el lugar: devolverlo
+                self.salir()
+            else:
+                self._quitar(turno)
+            raise
+        self.admitidas += 1
+
+    def salir(self, duracion: Optional[float] = None) -> None:
+        """Liberar el lugar, cediéndolo al primero de la cola si lo hay"""
+        if duracion is not None:
+            self.duracion_media += _PESO_MEDICION * (duracion - self.duracion_media)
+        while self._cola:
+            turno = self._cola.popleft()
+            if not turno.done():
+                # El lugar pasa directamente: en_curso no cambia
+                turno.set_result(None)
+                return
+        self.en_curso -= 1
+
+    def _quitar(self, turno: asyncio.Future) -> None:
+        try:
+            self._cola.remove(turno)
+        except ValueError:
+            pass
+
+    def estadisticas(self) -> dict:
+        return {
+            "limite": self.limite,
+            "en_curso": self.en_curso,
+            "en_cola": len(self._cola),
+            "duracion_media_ms": round(self.duracion_media * 1000, 3),
+            "admitidas": self.admitidas,
+            "rechazadas": self.rechazadas,
+        }
+
+
+def verificar_limites(limites: Dict[str, int], capacidad: int = CAPACIDAD_POOL) -> bool:
+    """
+    Si la suma de los límites cabe en el pool; si no, registrar un aviso
+
+    Con límites que suman más que la capacidad, las peticiones admitidas
+    vuelven a esperar el checkout del pool hasta DB_POOL_TIMEOUT.
+    """
+    total = sum(limite for limite in limites.values() if limite > 0)
+    if total <= capacidad:
+        return True
+    logger.warning(
+        f"Los límites de admisión suman {total} peticiones y el pool admite "
+        f"{capacidad} conexiones (DB_POOL_SIZE + DB_MAX_OVERFLOW); ajuste "
+        "ADMISION_* o el tamaño del pool"
+    )
+    return False
+
+
+if ADMISION_HABILITADA:
+    verificar_limites(ADMISION_LIMITES)
+
+grupos_admision: Dict[str, GrupoAdmision] = {
+    nombre: GrupoAdmision(nombre, limite)
+    for nombre, limite in ADMISION_LIMITES.items()
+    if limite > 0
+}
+
+
+def grupo_de_ruta(ruta, metodo: str) -> Optional[str]:
+    """Grupo de admisión de una ruta, o None si no se limita"""
+    if ruta is None or ruta.path in RUTAS_LIBRES:
+        return None
+    if ruta.path.startswith("/api/auth"):
+        return "auth"
+    return clase_de_ruta(ruta, metodo)
+
+
+def estadisticas_admision() -> dict:
+    """Estado de cada grupo de admisión"""
+    return {
+        "habilitada": ADMISION_HABILITADA,
+        "espera_maxima_segundos": ADMISION_ESPERA_MAXIMA,
+        "grupos": {
+            nombre: grupo.estadisticas() for nombre, grupo in grupos_admision.items()
+        },
+    }
+
+
+class AdmisionMiddleware:
+    """
+    Middleware ASGI que admite cada petición según el límite de su grupo
+
+    Las rutas sin grupo (RUTAS_LIBRES, rutas inexistentes) y los grupos sin
+    límite pasan directamente. Una petición rechazada recibe 503 con
+    Retry-After igual a la espera estimada.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISION_HABILITADA:
+            await self.app(scope, receive, send)
+            return
+
+        ruta, _ = resolver_ruta(scope)
+        grupo = grupos_admision.get(grupo_de_ruta(ruta, scope["method"]))
+        if grupo is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await grupo.entrar()
+        except SobrecargaError as e:
+            logger.warning(
+                f"Petición rechazada por sobrecarga ({grupo.nombre}): "
+                f"{scope['method']} {scope['path']}"
+            )
+            error = APIErrorHandler.service_unavailable_error(e.espera)
+            respuesta = JSONResponse(
+                {"detail": error.detail},
+                status_code=error.status_code,
+                headers=error.headers,
+            )
+            await respuesta(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            grupo.salir(time.perf_counter() - inicio)
@@ -0,0 +1,188 @@
+"""
+Invalidación de cachés entre procesos con LISTEN/NOTIFY de PostgreSQL
+"""
+
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import psycopg2
+from database.config import DATABASE_URL
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CANAL = os.getenv("INVALIDACION_CANAL", "invalidacion_cache")
+HABILITADA = os.getenv("INVALIDACION_HABILITADA", "true").lower() == "true"
+# LISTEN necesita una conexión directa: no funciona a través de PgBouncer en
+# modo transacción (como el host "-pooler" de Neon)
+URL_ESCUCHA = os.getenv("INVALIDACION_DATABASE_URL", DATABASE_URL)
+INTERVALO_VERIFICACION = float(os.getenv("INVALIDACION_INTERVALO_VERIFICACION", 30))
+ESPERA_MAXIMA_RECONEXION = 60.0
+
+# Identifica a este proceso para ignorar sus propias notificaciones
+ORIGEN = uuid.uuid4().hex
+
+_manejadores: Dict[str, List[Callable[[Optional[str]], None]]] = defaultdict(list)
+_escucha: Optional["_Escucha"] = None
+
+
+def registrar_manejador(
+    entidad: str, manejador: Callable[[Optional[str]], None]
+) -> None:
+    """
+    Registrar la función que invalida la caché local de una entidad
+
+    El manejador recibe el id afectado, o None cuando hay que vaciar todo lo
+    de esa entidad (altas, o tras una reconexión en la que se pudieron perder
+    notificaciones).
+    """
+    _manejadores[entidad].append(manejador)
+
+
+def publicar(db: Session, entidad: str, entidad_id=None) -> None:
+    """
+    Avisar a los demás procesos que una entidad cambió
+
+    Se debe llamar antes del commit: PostgreSQL entrega la notificación solo
+    si la transacción se confirma.
+    """
+    if not HABILITADA:
+        return
+    carga = json.dumps(
+        {
+            "entidad": entidad,
+            "id": str(entidad_id) if entidad_id is not None else None,
+            "origen": ORIGEN,
+        }
+    )
+    db.execute(
+        text("SELECT pg_notify(:canal, :carga)"), {"canal": CANAL, "carga": carga}
+    )
+
+
+def _despachar(entidad: str, entidad_id: Optional[str]) -> None:
+    for manejador in _manejadores.get(entidad, []):
+        try:
+            manejador(entidad_id)
+        except Exception as e:
+            logger.error(f"Error al invalidar caché de {entidad}: {str(e)}")
+
+
+def _vaciar_todo() -> None:
+    for entidad in list(_manejadores):
+        _despachar(entidad, None)
+
+
+class _Escucha(threading.Thread):
+    """Hilo que escucha el canal de invalidación con una conexión propia"""
+
+    def __init__(self, url: str):
+        super().__init__(name="bus-invalidacion", daemon=True)
+        self.url = url
+        self._detener = threading.Event()
+        self.conectado = threading.Event()
+
+    def _conectar(self):
+        url = make_url(self.url).set(drivername="postgresql")
+        parametros = {} if "sslmode" in url.query else {"sslmode": "require"}
+        conexion = psycopg2.connect(
+            url.render_as_string(hide_password=False), **parametros
+        )
+        conexion.set_session(autocommit=True)
+        with conexion.cursor() as cursor:
+            cursor.execute(f'LISTEN "{CANAL}"')
+        return conexion
+
+    def _procesar(self, conexion) -> None:
+        conexion.poll()
+        while conexion.notifies:
+            notificacion = conexion.notifies.pop(0)
+            try:
+                carga = json.loads(notificacion.payload)
+            except ValueError:
+                logger.warning(
+                    f"Notificación de invalidación inválida: {notificacion.payload}"
+                )
+                continue
+            if carga.get("origen") == ORIGEN:
+                continue
+            _despachar(carga.get("entidad"), carga.get("id"))
+
+    def _escuchar(self, conexion) -> None:
+        ultima_actividad = time.monotonic()
+        while not self._detener.is_set():
+            listos, _, _ = select.select([conexion], [], [], 1.0)
+            if listos:
+                self._procesar(conexion)
+                ultima_actividad = time.monotonic()
+            elif time.monotonic() - ultima_actividad > INTERVALO_VERIFICACION:
+                # select no detecta una conexión caída: se verifica con una consulta
+                with conexion.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                self._procesar(conexion)
+                ultima_actividad = time.monotonic()
+
+    def run(self) -> None:
+        espera = 1.0
+        primera_conexion = True
+        while not self._detener.is_set():
+            conexion = None
+            try:
+                conexion = self._conectar()
+                if not primera_conexion:
+                    # Lo notificado mientras no había conexión se perdió
+                    _vaciar_todo()
+                    logger.info(
+                        "Bus de invalidación reconectado; cachés locales vaciadas"
+                    )
+                primera_conexion = False
+                espera = 1.0
+                self.conectado.set()
+                self._escuchar(conexion)
+            except Exception as e:
+                self.conectado.clear()
+                logger.warning(
+                    f"Bus de invalidación desconectado: {str(e)}; reintento en {espera:.0f} s"
+                )
+                # Sin conexión no se reciben avisos: mejor no servir datos viejos
+                _vaciar_todo()
+                primera_conexion = False
+                self._detener.wait(espera)
+                espera = min(espera * 2, ESPERA_MAXIMA_RECONEXION)
+            finally:
+                if conexion is not None:
+                    try:
+                        conexion.close()
+                    except Exception:
+                        pass
+
+    def detener(self) -> None:
+        self._detener.set()
+
+
+def iniciar_escucha() -> None:
+    """Iniciar el hilo que recibe las invalidaciones de otros procesos"""
+    global _escucha
+    if not HABILITADA or _escucha is not None:
+        return
+    _escucha = _Escucha(URL_ESCUCHA)
+    _escucha.start()
+    logger.info(f"Bus de invalidación escuchando el canal '{CANAL}'")
+
+
+def detener_escucha() -> None:
+    """Detener el hilo de escucha (al apagar la aplicación)"""
+    global _escucha
+    if _escucha is not None:
+        _escucha.detener()
+        _escucha.join(timeout=5)
+        _escucha = None
@@ -0,0 +1,552 @@
+"""
+Caché compartida con invalidación por etiquetas (memoria o servidor Redis)
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria").lower()
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", 0.5))
+CACHE_TTL = int(os.getenv("CACHE_TTL", 60))
+CACHE_PREFIJO = os.getenv("CACHE_PREFIJO", "hospital")
+CACHE_MEMORIA_MAX_ENTRADAS = int(os.getenv("CACHE_MEMORIA_MAX_ENTRADAS", 10000))
+
+# Cambiarla cuando cambie la forma de los datos guardados: las entradas
+# anteriores dejan de leerse y vencen solas
+VERSION_ESQUEMA = "v1"
+
+# Vida de los contadores de etiquetas; debe superar el TTL de cualquier
+# entrada para que un contador vencido (versión 0) no revalide entradas viejas
+ETIQUETA_TTL = 86400
+
+
+class ErrorCache(Exception):
+    """Error devuelto por el servidor de caché"""
+
+
+class BackendCache(ABC):
+    """
+    Operaciones mínimas que necesita la caché, en versión síncrona y asíncrona
+
+    leer: valores de varias claves (None si no existen)
+    escribir: guardar un valor con vencimiento en segundos
+    incrementar: sumar 1 a contadores (se crean en 0), renovar su vencimiento y
+        devolver sus valores nuevos
+    eliminar: borrar valores y contadores
+    """
+
+    @abstractmethod
+    def leer(self, claves: Sequence[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    def escribir(self, clave: str, valor: bytes, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    def incrementar(self, claves: Sequence[str], ttl: int) -> List[int]:
+        ...
+
+    @abstractmethod
+    def eliminar(self, claves: Sequence[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def aleer(self, claves: Sequence[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    async def aescribir(self, clave: str, valor: bytes, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def aincrementar(self, claves: Sequence[str], ttl: int) -> List[int]:
+        ...
+
+    @abstractmethod
+    async def aeliminar(self, claves: Sequence[str]) -> None:
+        ...
+
+
+class BackendMemoria(BackendCache):
+    """Backend en memoria del proceso (un solo worker o desarrollo)"""
+
+    def __init__(self, max_entradas: int = CACHE_MEMORIA_MAX_ENTRADAS):
+        self.max_entradas = max(1, max_entradas)
+        self._datos: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        # Los contadores van aparte para que el límite de entradas no los
+        # descarte: perder un contador volvería válidas entradas invalidadas
+        self._contadores: Dict[str, Tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def leer(self, claves):
+        ahora = time.monotonic()
+        valores = []
+        with self._lock:
+            for clave in claves:
+                origen = self._datos if clave in self._datos else self._contadores
+                entrada = origen.get(clave)
+                if entrada is not None and entrada[0] <= ahora:
+                    del origen[clave]
+                    entrada = None
+                valores.append(entrada[1] if entrada else None)
+        return valores
+
+    def escribir(self, clave, valor, ttl):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def incrementar(self, claves, ttl):
+        ahora = time.monotonic()
+        valores = []
+        with self._lock:
+            for clave in claves:
+                entrada = self._contadores.get(clave)
+                actual = int(entrada[1]) if entrada and entrada[0] > ahora else 0
+                self._contadores[clave] = (ahora + ttl, str(actual + 1).encode())
+                valores.append(actual + 1)
+            if len(self._contadores) > 2 * self.max_entradas:
+                self._contadores = {
+                    c: e for c, e in self._contadores.items() if e[0] > ahora
+                }
+        return valores
+
+    def eliminar(self, claves):
+        with self._lock:
+            for clave in claves:
+                self._datos.pop(clave, None)
+                self._contadores.pop(clave, None)
+
+    def vaciar(self) -> None:
+        """Descartar todas las entradas y contadores de este proceso"""
+        with self._lock:
+            self._datos.clear()
+            self._contadores.clear()
+
+    async def aleer(self, claves):
+        return self.leer(claves)
+
+    async def aescribir(self, clave, valor, ttl):
+        self.escribir(clave, valor, ttl)
+
+    async def aincrementar(self, claves, ttl):
+        return self.incrementar(claves, ttl)
+
+    async def aeliminar(self, claves):
+        self.eliminar(claves)
+
+
+def _codificar_comando(*partes) -> bytes:
+    """Codificar un comando en el protocolo RESP"""
+    salida = [b"*%d\r\n" % len(partes)]
+    for parte in partes:
+        if isinstance(parte, str):
+            parte = parte.encode("utf-8")
+        elif isinstance(parte, int):
+            parte = str(parte).encode()
+        salida.append(b"$%d\r\n%s\r\n" % (len(parte), parte))
+    return b"".join(salida)
+
+
+def _interpretar_linea(linea: bytes):
+    """Tipo y contenido de la primera línea de una respuesta RESP"""
+    if not linea:
+        raise ConnectionError("El servidor de caché cerró la conexión")
+    return linea[:1], linea[1:-2]
+
+
+def _leer_respuesta(archivo):
+    tipo, resto = _interpretar_linea(archivo.readline())
+    if tipo == b"+":
+        return resto.decode()
+    if tipo == b"-":
+        raise ErrorCache(resto.decode())
+    if tipo == b":":
+        return int(resto)
+    if tipo == b"$":
+        largo = int(resto)
+        return None if largo < 0 else archivo.read(largo + 2)[:-2]
+    if tipo == b"*":
+        largo = int(resto)
+        return None if largo < 0 else [_leer_respuesta(archivo) for _ in range(largo)]
+    raise ErrorCache(f"Respuesta RESP desconocida: {tipo!r}")
+
+
+async def _aleer_respuesta(lector: asyncio.StreamReader):
+    tipo, resto = _interpretar_linea(await lector.readline())
+    if tipo == b"+":
+        return resto.decode()
+    if tipo == b"-":
+        raise ErrorCache(resto.decode())
+    if tipo == b":":
+        return int(resto)
+    if tipo == b"$":
+        largo = int(resto)
+        return None if largo < 0 else (await lector.readexactly(largo + 2))[:-2]
+    if tipo == b"*":
+        largo = int(resto)
+        if largo < 0:
+            return None
+        return [await _aleer_respuesta(lector) for _ in range(largo)]
+    raise ErrorCache(f"Respuesta RESP desconocida: {tipo!r}")
+
+
+class BackendRedis(BackendCache):
+    """
+    Backend para servidores que hablan el protocolo de Redis (RESP2)
+
+    Mantiene un pool de sockets para el cliente síncrono y otro de streams
+    de asyncio para el asíncrono; los comandos de una operación se envían
+    juntos (pipeline) y se leen todas las respuestas al final.
+    """
+
+    def __init__(
+        self, url: str = CACHE_REDIS_URL, timeout: float = CACHE_REDIS_TIMEOUT
+    ):
+        datos = urlparse(url)
+        if datos.scheme not in ("redis", ""):
+            raise ValueError(f"URL de caché no soportada: {url}")
+        self.host = datos.hostname or "localhost"
+        self.puerto = datos.port or 6379
+        self.clave_acceso = datos.password
+        self.base = int(datos.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._conexiones: List[Tuple[socket.socket, Any]] = []
+        # Los streams de asyncio pertenecen al event loop que los creó
+        self._aconexiones = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _comandos_inicio(self) -> List[tuple]:
+        comandos = []
+        if self.clave_acceso:
+            comandos.append(("AUTH", self.clave_acceso))
+        if self.base:
+            comandos.append(("SELECT", self.base))
+        return comandos
+
+    def _conectar(self):
+        conexion = socket.create_connection(
+            (self.host, self.puerto), timeout=self.timeout
+        )
+        conexion.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        archivo = conexion.makefile("rb")
+        inicio = self._comandos_inicio()
+        if inicio:
+            conexion.sendall(b"".join(_codificar_comando(*c) for c in inicio))
+            for _ in inicio:
+                _leer_respuesta(archivo)
+        return conexion, archivo
+
+    def _ejecutar(self, comandos: List[tuple]) -> list:
+        with self._lock:
+            conexion = self._conexiones.pop() if self._conexiones else None
+        if conexion is None:
+            conexion = self._conectar()
+        sock, archivo = conexion
+        try:
+            sock.sendall(b"".join(_codificar_comando(*c) for c in comandos))
+            respuestas = [_leer_respuesta(archivo) for _ in comandos]
+        except Exception:
+            sock.close()
+            raise
+        with self._lock:
+            self._conexiones.append(conexion)
+        return respuestas
+
+    async def _aconectar(self):
+        lector, escritor = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.puerto), self.timeout
+        )
+        inicio = self._comandos_inicio()
+        if inicio:
+            escritor.write(b"".join(_codificar_comando(*c) for c in inicio))
+            for _ in inicio:
+                await _aleer_respuesta(lector)
+        return lector, escritor
+
+    async def _aejecutar(self, comandos: List[tuple]) -> list:
+        libres = self._aconexiones.setdefault(asyncio.get_running_loop(), [])
+        conexion = libres.pop() if libres else None
+        if conexion is None:
+            conexion = await self._aconectar()
+        lector, escritor = conexion
+
+        async def _enviar():
+            escritor.write(b"".join(_codificar_comando(*c) for c in comandos))
+            await escritor.drain()
+            return [await _aleer_respuesta(lector) for _ in comandos]
+
+        try:
+            respuestas = await asyncio.wait_for(_enviar(), self.timeout)
+        except BaseException:
+            escritor.close()
+            raise
+        libres.append(conexion)
+        return respuestas
+
+    def leer(self, claves):
+        return self._ejecutar([("MGET", *claves)])[0]
+
+    def escribir(self, clave, valor, ttl):
+        self._ejecutar([("SET", clave, valor, "EX", ttl)])
+
+    def incrementar(self, claves, ttl):
+        comandos = []
+        for clave in claves:
+            comandos += [("INCR", clave), ("EXPIRE", clave, ttl)]
+        return self._ejecutar(comandos)[::2]
+
+    def eliminar(self, claves):
+        self._ejecutar([("DEL", *claves)])
+
+    async def aleer(self, claves):
+        return (await self._aejecutar([("MGET", *claves)]))[0]
+
+    async def aescribir(self, clave, valor, ttl):
+        await self._aejecutar([("SET", clave, valor, "EX", ttl)])
+
+    async def aincrementar(self, claves, ttl):
+        comandos = []
+        for clave in claves:
+            comandos += [("INCR", clave), ("EXPIRE", clave, ttl)]
+        return (await self._aejecutar(comandos))[::2]
+
+    async def aeliminar(self, claves):
+        await self._aejecutar([("DEL", *claves)])
+
+
+class Cache:
+    """
+    Caché de datos JSON con invalidación por etiquetas
+
+    Cada etiqueta (por ejemplo "paciente:<id>") tiene un contador de versión.
+    Una entrada guarda las versiones de sus etiquetas al momento de leer la
+    base de datos y solo es válida mientras sigan iguales: invalidar una
+    etiqueta es incrementar su contador, y las entradas viejas vencen solas
+    por TTL. Una lectura es una sola ida al servidor (MGET de la clave y sus
+    etiquetas).
+
+    Los errores del backend no fallan la petición: se registran y se
+    consulta la base de datos como si no hubiera caché.
+    """
+
+    def __init__(
+        self, backend: BackendCache, prefijo: str = CACHE_PREFIJO, ttl: int = CACHE_TTL
+    ):
+        self.backend = backend
+        self.prefijo = prefijo
+        self.ttl = ttl
+
+    def _clave(self, clave: str) -> str:
+        return f"{self.prefijo}:{VERSION_ESQUEMA}:{clave}"
+
+    def _clave_etiqueta(self, etiqueta: str) -> str:
+        return f"{self.prefijo}:etiqueta:{etiqueta}"
+
+    def _claves_lectura(self, clave: str, etiquetas: Sequence[str]) -> List[str]:
+        return [self._clave(clave)] + [self._clave_etiqueta(e) for e in etiquetas]
+
+    @staticmethod
+    def _interpretar(
+        valores: list, etiquetas: Sequence[str]
+    ) -> Tuple[bool, Any, List[int]]:
+        """Separar la entrada de las versiones actuales y validar que coincidan"""
+        versiones = [int(v) if v is not None else 0 for v in valores[1:]]
+        if valores[0] is None:
+            return False, None, versiones
+        sobre = json.loads(valores[0])
+        if sobre["e"] != dict(zip(etiquetas, versiones)):
+            return False, None, versiones
+        return True, sobre["d"], versiones
+
+    def _serializar(
+        self, datos: Any, etiquetas: Sequence[str], versiones: List[int]
+    ) -> bytes:
+        return json.dumps({"e": dict(zip(etiquetas, versiones)), "d": datos}).encode(
+            "utf-8"
+        )
+
+    def obtener(self, clave: str, etiquetas: Sequence[str] = ()) -> Optional[Any]:
+        """Obtener un valor si existe y ninguna de sus etiquetas fue invalidada"""
+        try:
+            return self._interpretar(
+                self.backend.leer(self._claves_lectura(clave, etiquetas)), etiquetas
+            )[1]
+        except Exception as e:
+            logger.warning(f"Caché no disponible al leer {clave}: {str(e)}")
+            return None
+
+    def guardar(
+        self,
+        clave: str,
+        datos: Any,
+        etiquetas: Sequence[str] = (),
+        ttl: Optional[int] = None,
+    ) -> None:
+        """
+        Guardar un valor con las versiones actuales de sus etiquetas
+
+        Si los datos se leyeron de la base de datos antes de este llamado, una
+        invalidación intermedia se pierde; obtener_o_calcular evita ese caso.
+        """
+        try:
+            versiones = self._interpretar(
+                self.backend.leer(self._claves_lectura(clave, etiquetas)), etiquetas
+            )[2]
+            self.backend.escribir(
+                self._clave(clave),
+                self._serializar(datos, etiquetas, versiones),
+                ttl or self.ttl,
+            )
+        except Exception as e:
+            logger.warning(f"Caché no disponible al guardar {clave}: {str(e)}")
+
+    def obtener_o_calcular(
+        self,
+        clave: str,
+        etiquetas: Sequence[str],
+        calcular: Callable[[], Any],
+        ttl: Optional[int] = None,
+    ) -> Any:
+        """
+        Obtener un valor de la caché o calcularlo y guardarlo
+
+        Las versiones de las etiquetas se leen antes de calcular, así que una
+        escritura concurrente deja la entrada nueva ya invalidada. Los
+        resultados None no se guardan.
+        """
+        try:
+            encontrado, datos, versiones = self._interpretar(
+                self.backend.leer(self._claves_lectura(clave, etiquetas)), etiquetas
+            )
+        except Exception as e:
+            logger.warning(f"Caché no disponible al leer {clave}: {str(e)}")
+            return calcular()
+        if encontrado:
+            return datos
+        datos = calcular()
+        if datos is not None:
+            try:
+                self.backend.escribir(
+                    self._clave(clave),
+                    self._serializar(datos, etiquetas, versiones),
+                    ttl or self.ttl,
+                )
+            except Exception as e:
+                logger.warning(f"Caché no disponible al guardar {clave}: {str(e)}")
+        return datos
+
+    def invalidar(self, *etiquetas: str) -> None:
+        """Invalidar todas las entradas que dependen de alguna de las etiquetas"""
+        if not etiquetas:
+            return
+        try:
+            self.backend.incrementar(
+                [self._clave_etiqueta(e) for e in etiquetas], ETIQUETA_TTL
+            )
+        except Exception as e:
+            logger.error(
+                f"No se pudo invalidar la caché ({', '.join(etiquetas)}): {str(e)}"
+            )
+
+    async def aobtener(
+        self, clave: str, etiquetas: Sequence[str] = ()
+    ) -> Optional[Any]:
+        """Versión asíncrona de obtener"""
+        try:
+            valores = await self.backend.aleer(self._claves_lectura(clave, etiquetas))
+            return self._interpretar(valores, etiquetas)[1]
+        except Exception as e:
+            logger.warning(f"Caché no disponible al leer {clave}: {str(e)}")
+            return None
+
+    async def aguardar(
+        self,
+        clave: str,
+        datos: Any,
+        etiquetas: Sequence[str] = (),
+        ttl: Optional[int] = None,
+    ) -> None:
+        """Versión asíncrona de guardar"""
+        try:
+            valores = await self.backend.aleer(self._claves_lectura(clave, etiquetas))
+            versiones = self._interpretar(valores, etiquetas)[2]
+            await self.backend.aescribir(
+                self._clave(clave),
+                self._serializar(datos, etiquetas, versiones),
+                ttl or self.ttl,
+            )
+        except Exception as e:
+            logger.warning(f"Caché no disponible al guardar {clave}: {str(e)}")
+
+    async def aobtener_o_calcular(
+        self,
+        clave: str,
+        etiquetas: Sequence[str],
+        calcular: Callable[[], Any],
+        ttl: Optional[int] = None,
+    ) -> Any:
+        """Versión asíncrona de obtener_o_calcular (calcular puede ser una corrutina)"""
+        try:
+            valores = await self.backend.aleer(self._claves_lectura(clave, etiquetas))
+            encontrado, datos, versiones = self._interpretar(valores, etiquetas)
+        except Exception as e:
+            logger.warning(f"Caché no disponible al leer {clave}: {str(e)}")
+            encontrado, versiones = False, None
+        if encontrado:
+            return datos
+        datos = calcular()
+        if inspect.isawaitable(datos):
+            datos = await datos
+        if datos is not None and versiones is not None:
+            try:
+                await self.backend.aescribir(
+                    self._clave(clave),
+                    self._serializar(datos, etiquetas, versiones),
+                    ttl or self.ttl,
+                )
+            except Exception as e:
+                logger.warning(f"Caché no disponible al guardar {clave}: {str(e)}")
+        return datos
+
+    async def ainvalidar(self, *etiquetas: str) -> None:
+        """Versión asíncrona de invalidar"""
+        if not etiquetas:
+            return
+        try:
+            await self.backend.aincrementar(
+                [self._clave_etiqueta(e) for e in etiquetas], ETIQUETA_TTL
+            )
+        except Exception as e:
+            logger.error(
+                f"No se pudo invalidar la caché ({', '.join(etiquetas)}): {str(e)}"
+            )
+
+
+def crear_cache() -> Cache:
+    """Crear la caché según CACHE_BACKEND (memoria o redis)"""
+    if CACHE_BACKEND == "redis":
+        return Cache(BackendRedis(CACHE_REDIS_URL))
+    if CACHE_BACKEND != "memoria":
+        raise ValueError(f"CACHE_BACKEND inválido: {CACHE_BACKEND} (memoria o redis)")
+    return Cache(BackendMemoria())
+
+
+cache = crear_cache()
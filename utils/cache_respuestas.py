@@ -0,0 +1,278 @@
+"""
+Caché de respuestas HTTP completas para rutas GET marcadas explícitamente
+"""
+
+import asyncio
+import hashlib
+import logging
+from contextlib import AsyncExitStack
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import parse_qsl, urlencode
+
+from database.replicas import leer_de_primaria, usar_primaria
+from fastapi import HTTPException, Request
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import solve_dependencies
+from fastapi.responses import JSONResponse
+from utils.cache import cache
+from utils.rutas import resolver_ruta
+
+logger = logging.getLogger(__name__)
+
+# Cabeceras que dependen de la conexión y no se guardan
+_CABECERAS_EXCLUIDAS = {b"date", b"server", b"connection", b"transfer-encoding"}
+# Cabeceras de la petición que ejecutó el endpoint: solo las recibe ella
+_CABECERAS_PROPIAS = {b"server-timing"}
+
+
+class ConfiguracionCache:
+    """TTL y etiquetas (plantillas con los parámetros de la ruta) de una ruta"""
+
+    __slots__ = ("ttl", "etiquetas")
+
+    def __init__(self, ttl: int, etiquetas: Sequence[str]):
+        self.ttl = ttl
+        self.etiquetas = tuple(etiquetas)
+
+
+def cachear_respuesta(ttl: int, etiquetas: Sequence[str] = ()):
+    """
+    Marcar un endpoint GET para guardar su respuesta en caché
+
+    Se aplica debajo del decorador de la ruta. Las etiquetas pueden usar los
+    parámetros de la ruta, por ejemplo "citas:medico:{medico_id}"; las
+    escrituras de los CRUD invalidan esas mismas etiquetas.
+    """
+
+    def decorador(endpoint):
+        endpoint.configuracion_cache = ConfiguracionCache(ttl, etiquetas)
+        return endpoint
+
+    return decorador
+
+
+class _Respuesta:
+    __slots__ = ("estado", "cabeceras", "cuerpo")
+
+    def __init__(self, estado: int, cabeceras: List[List[bytes]], cuerpo: bytes):
+        self.estado = estado
+        self.cabeceras = cabeceras
+        self.cuerpo = cuerpo
+
+    def compartible(self) -> "_Respuesta":
+        """Copia sin las cabeceras propias de la petición que la calculó"""
+        return _Respuesta(
+            self.estado,
+            [[k, v] for k, v in self.cabeceras if k.lower() not in _CABECERAS_PROPIAS],
+            self.cuerpo,
+        )
+
+    def a_datos(self) -> dict:
+        return {
+            "estado": self.estado,
+            "cabeceras": [
+                [k.decode("latin-1"), v.decode("latin-1")]
+                for k, v in self.compartible().cabeceras
+            ],
+            "cuerpo": self.cuerpo.decode("utf-8"),
+        }
+
+    @classmethod
+    def desde_datos(cls, datos: dict) -> "_Respuesta":
+        return cls(
+            datos["estado"],
+            [[k.encode("latin-1"), v.encode("latin-1")] for k, v in datos["cabeceras"]],
+            datos["cuerpo"].encode("utf-8"),
+        )
+
+    async def enviar(self, send, estado_cache: str) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.estado,
+                "headers": self.cabeceras + [[b"x-cache", estado_cache.encode()]],
+            }
+        )
+        await send({"type": "http.response.body", "body": self.cuerpo})
+
+
+async def autorizar_ruta(ruta, scope) -> Optional[JSONResponse]:
+    """
+    Ejecutar las dependencias de la ruta y de su router (autenticación,
+    scopes, límites) sin ejecutar el endpoint
+
+    Devuelve la respuesta de error si alguna rechaza la petición, o None si
+    la petición puede recibir una respuesta guardada.
+    """
+    # APIRoute pone las dependencias de la ruta y del router al principio
+    dependant = Dependant(
+        path=ruta.path_format,
+        dependencies=ruta.dependant.dependencies[: len(ruta.dependencies)],
+    )
+    async with AsyncExitStack() as pila:
+        # Las dependencias con yield (get_db) se cierran al salir de la pila
+        peticion = Request({**scope, "fastapi_astack": pila})
+        try:
+            _, errores, _, _, _ = await solve_dependencies(
+                request=peticion,
+                dependant=dependant,
+                dependency_overrides_provider=ruta.dependency_overrides_provider,
+            )
+        except HTTPException as e:
+            return JSONResponse(
+                {"detail": e.detail}, status_code=e.status_code, headers=e.headers
+            )
+    if errores:
+        return JSONResponse({"detail": errores}, status_code=422)
+    return None
+
+
+class CacheRespuestasMiddleware:
+    """
+    Middleware ASGI que sirve desde la caché las rutas marcadas con
+    @cachear_respuesta
+
+    - La clave es la plantilla de la ruta, sus parámetros y el query string
+      normalizado (parámetros ordenados), así que ?a=1&b=2 y ?b=2&a=1
+      comparten entrada.
+    - Se guardan los bytes ya serializados; solo se guardan respuestas 200.
+    - Si llegan varias peticiones iguales sin entrada en caché, solo la
+      primera ejecuta el endpoint y las demás reciben su misma respuesta si
+      fue un 200; si no, cada una ejecuta el endpoint.
+    - `Cache-Control: no-cache` en la petición omite la caché, igual que la
+      marca de lectura en la primaria tras una escritura (database/replicas.py).
+    - El endpoint que llena la caché lee de la primaria, no de una réplica.
+    - Antes de servir una respuesta que no calculó la propia petición se
+      ejecutan las dependencias de la ruta (autenticar_peticion), así que un
+      acierto exige las mismas credenciales, scopes y límites que el endpoint.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._en_curso: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _resolver_ruta(scope):
+        ruta, hijo = resolver_ruta(scope)
+        if ruta is None:
+            return None, {}, None
+        configuracion = getattr(
+            getattr(ruta, "endpoint", None), "configuracion_cache", None
+        )
+        return ruta, hijo.get("path_params", {}), configuracion
+
+    @staticmethod
+    def _omitir(scope) -> bool:
+        for nombre, valor in scope.get("headers", []):
+            if nombre == b"cache-control" and b"no-cache" in valor.lower():
+                return True
+        # Tras una escritura el cliente debe ver sus cambios, no la caché
+        return leer_de_primaria(Request(scope))
+
+    @staticmethod
+    def _clave(ruta, path_params: dict, query_string: bytes) -> str:
+        consulta = urlencode(
+            sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+        )
+        parametros = urlencode(sorted((k, str(v)) for k, v in path_params.items()))
+        resumen = hashlib.sha256(f"{parametros}?{consulta}".encode()).hexdigest()
+        return f"respuesta:{ruta.path}:{resumen}"
+
+    async def _ejecutar(self, scope, receive) -> _Respuesta:
+        """Ejecutar la aplicación y capturar la respuesta completa"""
+        inicio = {}
+        cuerpo = []
+
+        async def capturar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                inicio.update(mensaje)
+            elif mensaje["type"] == "http.response.body":
+                cuerpo.append(mensaje.get("body", b""))
+
+        await self.app(scope, receive, capturar)
+        cabeceras = [
+            [k, v]
+            for k, v in inicio.get("headers", [])
+            if k.lower() not in _CABECERAS_EXCLUIDAS
+        ]
+        return _Respuesta(inicio.get("status", 500), cabeceras, b"".join(cuerpo))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or self._omitir(scope):
+            await self.app(scope, receive, send)
+            return
+
+        ruta, path_params, configuracion = self._resolver_ruta(scope)
+        if configuracion is None:
+            await self.app(scope, receive, send)
+            return
+
+        clave = self._clave(ruta, path_params, scope.get("query_string", b""))
+        try:
+            etiquetas = [e.format(**path_params) for e in configuracion.etiquetas]
+        except KeyError as e:
+            logger.error(f"Etiqueta de caché inválida en {ruta.path}: {str(e)}")
+            await self.app(scope, receive, send)
+            return
+
+        en_curso = self._en_curso.get(clave)
+        if en_curso is not None:
+            rechazo = await autorizar_ruta(ruta, scope)
+            if rechazo is not None:
+                await rechazo(scope, receive, send)
+                return
+            # asyncio.wait no cancela el cálculo si esta petición se cancela
+            await asyncio.wait([en_curso])
+            compartida = None
+            if not en_curso.cancelled() and en_curso.exception() is None:
+                compartida = en_curso.result()
+            if compartida is not None:
+                await compartida.enviar(send, "HIT")
+            else:
+                await self.app(scope, receive, send)
+            return
+
+        futuro = asyncio.get_running_loop().create_future()
+        # Marca la excepción como recuperada aunque no haya peticiones esperando
+        futuro.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._en_curso[clave] = futuro
+        calculada: Optional[_Respuesta] = None
+        try:
+
+            async def calcular():
+                nonlocal calculada
+                # Una réplica atrasada dejaría la entrada con datos viejos
+                usar_primaria(scope)
+                calculada = await self._ejecutar(scope, receive)
+                if calculada.estado != 200:
+                    return None
+                try:
+                    return calculada.a_datos()
+                except UnicodeDecodeError:
+                    return None
+
+            datos = await cache.aobtener_o_calcular(
+                clave, etiquetas, calcular, ttl=configuracion.ttl
+            )
+            respuesta = calculada or _Respuesta.desde_datos(datos)
+            # Un error (401, 429, 503...) es de esta petición: las que esperan
+            # ejecutan el endpoint por su cuenta
+            futuro.set_result(
+                respuesta.compartible() if respuesta.estado == 200 else None
+            )
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            del self._en_curso[clave]
+
+        if calculada is None:
+            # Acierto: esta petición todavía no pasó por la autenticación
+            rechazo = await autorizar_ruta(ruta, scope)
+            if rechazo is not None:
+                await rechazo(scope, receive, send)
+                return
+        await respuesta.enviar(send, "MISS" if calculada else "HIT")
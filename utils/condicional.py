@@ -0,0 +1,215 @@
+"""
+Peticiones condicionales HTTP (ETag, Last-Modified, 304) y control de
+concurrencia optimista con la columna `version` de las entidades
+"""
+
+import hashlib
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional
+
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.orm.exc import StaleDataError
+
+_ETAG_VERSION = re.compile(r'^"v(\d+)"$')
+
+
+class Version:
+    """Validadores HTTP de una entidad o de una lista"""
+
+    __slots__ = ("etag", "ultima_modificacion")
+
+    def __init__(self, etag: str, ultima_modificacion: Optional[datetime]):
+        self.etag = etag
+        self.ultima_modificacion = ultima_modificacion
+
+
+def _marca_tiempo(modelo):
+    # fecha_actualizacion queda en NULL hasta la primera modificación
+    return func.coalesce(modelo.fecha_actualizacion, modelo.fecha_creacion)
+
+
+def _etag(*partes) -> str:
+    resumen = hashlib.sha256("|".join(str(p) for p in partes).encode()).hexdigest()
+    return f'"{resumen[:32]}"'
+
+
+def _version_detalle(version: int, marca: Optional[datetime]) -> Version:
+    # El ETag de una entidad es su columna version, así If-Match la indica
+    return Version(f'"v{version}"', marca)
+
+
+def version_entidad(db: Session, modelo, entidad_id) -> Optional[Version]:
+    """
+    Versión de una entidad consultando solo `version` y su marca de tiempo
+
+    No carga la entidad: con el índice de versión (ver
+    scripts/crear_indices_version.py) es un index-only scan.
+    """
+    fila = db.execute(
+        select(modelo.version, _marca_tiempo(modelo)).where(modelo.id == entidad_id)
+    ).first()
+    if fila is None:
+        return None
+    return _version_detalle(fila[0], fila[1])
+
+
+def version_de(entidad) -> Version:
+    """Versión de una entidad ya cargada (por ejemplo, tras actualizarla)"""
+    return _version_detalle(
+        entidad.version, entidad.fecha_actualizacion or entidad.fecha_creacion
+    )
+
+
+def version_lista(
+    consulta: Query, modelo, skip: int = 0, limit: Optional[int] = None
+) -> Version:
+    """
+    Versión de la página de una lista que devuelve el endpoint
+
+    Ejecuta la consulta con sus filtros, offset y límite leyendo solo id,
+    `version` y la marca de tiempo de cada fila, en lugar de agregar todas
+    las filas que cumplen los filtros. Cualquier escritura incrementa la
+    versión de su fila, y un alta o baja cambia las filas de la página.
+    """
+    filas = (
+        consulta.with_entities(modelo.id, modelo.version, _marca_tiempo(modelo))
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    maxima = max((fila[2] for fila in filas if fila[2] is not None), default=None)
+    return Version(_etag(skip, *(f"{i}:{v}:{m}" for i, v, m in filas)), maxima)
+
+
+def _coincide(cabecera: str, etag: str, debil: bool) -> bool:
+    for candidato in cabecera.split(","):
+        candidato = candidato.strip()
+        if candidato == "*":
+            return True
+        if debil and candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == etag:
+            return True
+    return False
+
+
+def _sin_cambios(request: Request, version: Version) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110)
+        return _coincide(if_none_match, version.etag, debil=True)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and version.ultima_modificacion is not None:
+        try:
+            fecha = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if fecha.tzinfo is None:
+            fecha = fecha.replace(tzinfo=timezone.utc)
+        # Last-Modified tiene resolución de segundos
+        return version.ultima_modificacion.replace(microsecond=0) <= fecha
+    return False
+
+
+def _cabeceras(version: Version) -> dict:
+    cabeceras = {"ETag": version.etag, "Cache-Control": "private, no-cache"}
+    if version.ultima_modificacion is not None:
+        cabeceras["Last-Modified"] = format_datetime(
+            version.ultima_modificacion.astimezone(timezone.utc), usegmt=True
+        )
+    return cabeceras
+
+
+def responder_condicional(
+    request: Request, response: Response, version: Version
+) -> Optional[Response]:
+    """
+    Agregar ETag y Last-Modified a la respuesta
+
+    Devuelve una respuesta 304 (sin cuerpo) si el cliente ya tiene esta
+    versión; el endpoint debe devolverla sin consultar ni serializar nada más.
+    """
+    cabeceras = _cabeceras(version)
+    if _sin_cambios(request, version):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+    response.headers.update(cabeceras)
+    return None
+
+
+def version_if_match(request: Request) -> Optional[int]:
+    """
+    Versión que el cliente exige con If-Match al escribir
+
+    None si no envía la cabecera o envía "*"; un ETag que no es de versión
+    (por ejemplo, uno viejo o de un listado) nunca coincide.
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return None
+    for candidato in if_match.split(","):
+        candidato = candidato.strip()
+        if candidato == "*":
+            return None
+        coincidencia = _ETAG_VERSION.match(candidato)
+        if coincidencia:
+            return int(coincidencia.group(1))
+    return 0
+
+
+class ConflictoVersionError(ValueError):
+    """La entidad cambió desde la versión que leyó el cliente"""
+
+    def __init__(self, entidad):
+        super().__init__(
+            "El recurso fue modificado por otra petición; "
+            "revise la versión actual antes de volver a actualizarlo"
+        )
+        self.entidad = entidad
+
+
+def verificar_version(entidad, version_esperada: Optional[int]) -> None:
+    """Rechazar la escritura si el cliente leyó otra versión de la entidad"""
+    if version_esperada is not None and entidad.version != version_esperada:
+        raise ConflictoVersionError(entidad)
+
+
+def confirmar_version(db: Session, recargar: Callable) -> None:
+    """
+    Confirmar una escritura protegida por `version_id_col`
+
+    El UPDATE lleva `WHERE version = <versión leída>`: si otra transacción
+    confirmó antes, no afecta filas y SQLAlchemy lanza StaleDataError. Se
+    traduce a ConflictoVersionError con la entidad vigente (`recargar`).
+    """
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise ConflictoVersionError(recargar())
+
+
+def respuesta_conflicto(error: ConflictoVersionError, esquema) -> JSONResponse:
+    """Respuesta 409 con la representación vigente y su ETag"""
+    actual = error.entidad
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={
+            "detail": str(error),
+            "actual": (
+                esquema.model_validate(actual).model_dump(mode="json")
+                if actual is not None
+                else None
+            ),
+        },
+        headers=_cabeceras(version_de(actual)) if actual is not None else None,
+    )
+
+
+def agregar_version(response: Response, entidad) -> None:
+    """Agregar el ETag nuevo a la respuesta de una escritura"""
+    response.headers.update(_cabeceras(version_de(entidad)))
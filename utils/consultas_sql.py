@@ -0,0 +1,208 @@
+"""
+Instrumentación de las consultas SQL por petición
+
+Los eventos del engine cuentan las sentencias, el tiempo total en la base de
+datos y la sentencia más lenta de la petición en curso, y registran las que
+superan SQL_LENTA_MS con la sentencia normalizada, la forma de sus parámetros
+y opcionalmente su plan.
+"""
+
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SQL_LENTA_MS = float(os.getenv("SQL_LENTA_MS", 200))
+# EXPLAIN ANALYZE vuelve a ejecutar la consulta: solo para diagnosticar
+SQL_EXPLAIN = os.getenv("SQL_EXPLAIN", "false").lower() == "true"
+# Muchas sentencias en una sola petición suelen ser un N+1
+SQL_CONSULTAS_AVISO = int(os.getenv("SQL_CONSULTAS_AVISO", 50))
+
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"(%\(\w+\)s)(?:\s*,\s*%\(\w+\)s)+")
+_ESPACIOS = re.compile(r"\s+")
+
+
+class ConsultaCanceladaError(Exception):
+    """El cliente se desconectó y la petición ya no debe ejecutar sentencias"""
+
+
+class EstadisticasConsultas:
+    """Sentencias ejecutadas durante una petición y sus límites"""
+
+    __slots__ = (
+        "cantidad",
+        "segundos",
+        "mas_lenta",
+        "sql_mas_lenta",
+        "espera_pool",
+        "fin_endpoint",
+        "timeout_ms",
+        "cancelada",
+        "conexion_en_curso",
+    )
+
+    def __init__(self):
+        self.cantidad = 0
+        self.segundos = 0.0
+        self.mas_lenta = 0.0
+        self.sql_mas_lenta: Optional[str] = None
+        # Tiempo esperando una conexión del pool (o abriéndola)
+        self.espera_pool = 0.0
+        # perf_counter al terminar el endpoint, para separar la serialización
+        self.fin_endpoint: Optional[float] = None
+        # statement_timeout de cada transacción (ver utils/timeout_sql.py)
+        self.timeout_ms: Optional[int] = None
+        self.cancelada = False
+        # Conexión DBAPI con una sentencia en ejecución, para cancelarla
+        self.conexion_en_curso = None
+
+    def registrar(self, sql: str, segundos: float) -> None:
+        self.cantidad += 1
+        self.segundos += segundos
+        if segundos > self.mas_lenta:
+            self.mas_lenta = segundos
+            self.sql_mas_lenta = sql
+
+
+# Fuera de una petición (tareas programadas, scripts) no se acumula nada
+consultas_peticion: ContextVar[Optional[EstadisticasConsultas]] = ContextVar(
+    "consultas_peticion", default=None
+)
+
+
+def normalizar_sql(sql: str) -> str:
+    """Sentencia sin literales ni listas de parámetros, en una sola línea"""
+    sql = _CADENAS.sub("?", sql)
+    sql = _NUMEROS.sub("?", sql)
+    sql = _LISTAS.sub(r"\1, ...", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+def forma_parametros(parametros, executemany: bool = False) -> str:
+    """Tipos de los parámetros, sin sus valores"""
+    if executemany and parametros:
+        return f"{len(parametros)} x {forma_parametros(parametros[0])}"
+    if isinstance(parametros, dict):
+        return str({clave: type(valor).__name__ for clave, valor in parametros.items()})
+    if isinstance(parametros, (list, tuple)):
+        return str([type(valor).__name__ for valor in parametros])
+    return type(parametros).__name__
+
+
+def _explicar(conn, sql: str, parametros) -> str:
+    """Plan de una consulta; un error no afecta la transacción de la petición"""
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT explicar_consulta")
+        try:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", parametros)
+            plan = "\n".join(fila[0] for fila in cursor.fetchall())
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT explicar_consulta")
+            return f"(no se pudo obtener el plan: {str(e)})"
+        cursor.execute("RELEASE SAVEPOINT explicar_consulta")
+        return plan
+    finally:
+        cursor.close()
+
+
+def _al_empezar(conn):
+    estadisticas = consultas_peticion.get()
+    if (
+        estadisticas is None
+        or not estadisticas.timeout_ms
+        or conn.dialect.name != "postgresql"
+    ):
+        return
+    # SET LOCAL dura hasta el fin de la transacción y vuelve al valor de la
+    # conexión, así que no se arrastra a otra petición que la reutilice
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"SET LOCAL statement_timeout = {int(estadisticas.timeout_ms)}")
+    finally:
+        cursor.close()
+
+
+def _antes(conn, cursor, sql, parametros, contexto, executemany):
+    estadisticas = consultas_peticion.get()
+    if estadisticas is not None:
+        if estadisticas.cancelada:
+            raise ConsultaCanceladaError("El cliente se desconectó")
+        estadisticas.conexion_en_curso = conn.connection.dbapi_connection
+    conn.info.setdefault("inicio_consultas", []).append(time.perf_counter())
+
+
+def _despues(conn, cursor, sql, parametros, contexto, executemany):
+    segundos = time.perf_counter() - conn.info["inicio_consultas"].pop()
+    estadisticas = consultas_peticion.get()
+    if estadisticas is not None:
+        estadisticas.conexion_en_curso = None
+        estadisticas.registrar(sql, segundos)
+    if segundos * 1000 < SQL_LENTA_MS:
+        return
+    mensaje = (
+        f"Consulta lenta ({segundos * 1000:.1f} ms): {normalizar_sql(sql)} "
+        f"parámetros={forma_parametros(parametros, executemany)}"
+    )
+    # Solo las lecturas: EXPLAIN ANALYZE ejecuta la sentencia otra vez
+    if SQL_EXPLAIN and not executemany and sql.lstrip().upper().startswith("SELECT"):
+        mensaje += "\n" + _explicar(conn, sql, parametros)
+    logger.warning(mensaje)
+
+
+def _al_fallar(contexto):
+    estadisticas = consultas_peticion.get()
+    if estadisticas is not None:
+        # La conexión puede volver al pool: no debe quedar como cancelable
+        estadisticas.conexion_en_curso = None
+    if contexto.connection is not None:
+        contexto.connection.info.get("inicio_consultas", []).clear()
+
+
+def instrumentar_engine(engine) -> None:
+    """Registrar los eventos de medición en un engine"""
+    event.listen(engine, "begin", _al_empezar)
+    event.listen(engine, "before_cursor_execute", _antes)
+    event.listen(engine, "after_cursor_execute", _despues)
+    event.listen(engine, "handle_error", _al_fallar)
+
+
+class ConsultasMiddleware:
+    """
+    Middleware ASGI que abre las estadísticas de consultas de cada petición
+
+    Quedan en `scope["state"]["consultas"]` (request.state.consultas) para el
+    resto de la petición. Los endpoints síncronos corren en el pool de hilos
+    con una copia del contexto, que apunta al mismo objeto.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estadisticas = EstadisticasConsultas()
+        scope.setdefault("state", {})["consultas"] = estadisticas
+        token = consultas_peticion.set(estadisticas)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            consultas_peticion.reset(token)
+            if estadisticas.cantidad > SQL_CONSULTAS_AVISO:
+                logger.warning(
+                    f"{scope['method']} {scope['path']} ejecutó "
+                    f"{estadisticas.cantidad} consultas en "
+                    f"{estadisticas.segundos * 1000:.1f} ms; la más lenta: "
+                    f"{normalizar_sql(estadisticas.sql_mas_lenta or '')}"
+                )
@@ -0,0 +1,230 @@
+"""
+Caché en memoria del directorio de médicos y enfermeras
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from database.replicas import leer_de_primaria
+from fastapi import Header, Request
+from utils.bus_invalidacion import registrar_manejador
+
+DIRECTORIO_TTL = float(os.getenv("DIRECTORIO_TTL", 300))
+DIRECTORIO_MAX_ENTRADAS = int(os.getenv("DIRECTORIO_MAX_ENTRADAS", 5000))
+
+
+class _Registro:
+    """Copia inmutable y compacta (con __slots__) de una entidad del personal"""
+
+    __slots__ = ()
+
+    def __init__(self, entidad):
+        for campo in self.__slots__:
+            object.__setattr__(self, campo, getattr(entidad, campo))
+
+    def __setattr__(self, campo, valor):
+        raise AttributeError("Los registros del directorio son de solo lectura")
+
+
+class RegistroMedico(_Registro):
+    __slots__ = (
+        "id",
+        "nombre",
+        "apellido",
+        "email",
+        "telefono",
+        "especialidad",
+        "numero_licencia",
+        "fecha_nacimiento",
+        "consultorio",
+        "direccion",
+        "activo",
+        "fecha_creacion",
+        "fecha_actualizacion",
+        "id_usuario_creacion",
+        "id_usuario_edicion",
+        "version",
+    )
+
+
+class RegistroEnfermera(_Registro):
+    __slots__ = (
+        "id",
+        "nombre",
+        "apellido",
+        "email",
+        "telefono",
+        "numero_licencia",
+        "turno",
+        "activo",
+        "fecha_creacion",
+        "fecha_actualizacion",
+        "id_usuario_creacion",
+        "id_usuario_edicion",
+        "version",
+    )
+
+
+class DirectorioPersonal:
+    """
+    Caché por proceso de consultas del directorio del personal
+
+    Guarda registros individuales por sus índices únicos (id, email,
+    numero_licencia) y listas por sus índices secundarios (especialidad,
+    turno). Cada entrada vence a los `ttl` segundos y, al superar
+    `max_entradas`, se descarta la usada hace más tiempo (LRU).
+
+    Cualquier escritura del CRUD invalida el directorio completo: el personal
+    cambia pocas veces al día y así no hay que rastrear qué listas contenían
+    al registro modificado.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        registro: type,
+        indices_unicos: Iterable[str],
+        ttl: float = DIRECTORIO_TTL,
+        max_entradas: int = DIRECTORIO_MAX_ENTRADAS,
+    ):
+        self.nombre = nombre
+        self.registro = registro
+        self.indices_unicos = tuple(indices_unicos)
+        self.ttl = ttl
+        self.max_entradas = max(1, max_entradas)
+        self._entradas: "OrderedDict[Tuple[str, object], Tuple[float, object]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+
+    def _leer(self, clave: Tuple[str, object]):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                expira, valor = entrada
+                if expira > time.monotonic():
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, valor
+                del self._entradas[clave]
+            self.fallos += 1
+            return False, None
+
+    def _guardar(
+        self, generacion: int, entradas: List[Tuple[Tuple[str, object], object]]
+    ):
+        with self._lock:
+            # Una invalidación durante la carga deja el resultado obsoleto
+            if generacion != self._generacion:
+                return
+            expira = time.monotonic() + self.ttl
+            for clave, valor in entradas:
+                self._entradas[clave] = (expira, valor)
+                self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def _entradas_unicas(self, registro) -> List[Tuple[Tuple[str, object], object]]:
+        return [
+            ((indice, getattr(registro, indice)), registro)
+            for indice in self.indices_unicos
+        ]
+
+    def obtener(self, indice: str, valor, cargar: Callable, omitir: bool = False):
+        """
+        Obtener un registro por un índice único
+
+        Args:
+            indice: Campo único (id, email, numero_licencia)
+            valor: Valor buscado
+            cargar: Función que consulta la entidad en la base de datos
+            omitir: Consultar la base de datos sin usar la caché
+        """
+        if not omitir:
+            encontrado, registro = self._leer((indice, valor))
+            if encontrado:
+                return registro
+        generacion = self._generacion
+        entidad = cargar()
+        if entidad is None:
+            return None
+        registro = self.registro(entidad)
+        self._guardar(generacion, self._entradas_unicas(registro))
+        return registro
+
+    def listar(
+        self, indice: str, valor, cargar: Callable, omitir: bool = False
+    ) -> list:
+        """
+        Obtener la lista de registros de un índice secundario
+
+        Los registros cargados también quedan disponibles por sus índices únicos.
+        """
+        if not omitir:
+            encontrado, registros = self._leer((indice, valor))
+            if encontrado:
+                return list(registros)
+        generacion = self._generacion
+        registros = tuple(self.registro(entidad) for entidad in cargar())
+        entradas = [((indice, valor), registros)]
+        for registro in registros:
+            entradas.extend(self._entradas_unicas(registro))
+        self._guardar(generacion, entradas)
+        return list(registros)
+
+    def invalidar(self) -> None:
+        """Vaciar el directorio (se llama después de cada escritura)"""
+        with self._lock:
+            self._entradas.clear()
+            self._generacion += 1
+            self.invalidaciones += 1
+
+    def estadisticas(self) -> Dict[str, float]:
+        """Aciertos, fallos y ocupación de la caché"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4)
+                if consultas
+                else 0.0,
+                "desalojos": self.desalojos,
+                "invalidaciones": self.invalidaciones,
+            }
+
+
+directorio_medicos = DirectorioPersonal(
+    "medicos", RegistroMedico, ("id", "email", "numero_licencia")
+)
+directorio_enfermeras = DirectorioPersonal(
+    "enfermeras", RegistroEnfermera, ("id", "email", "numero_licencia")
+)
+
+# Escrituras hechas por otros procesos (ver utils/bus_invalidacion.py)
+registrar_manejador("medico", lambda _id: directorio_medicos.invalidar())
+registrar_manejador("enfermera", lambda _id: directorio_enfermeras.invalidar())
+
+
+def omitir_cache(request: Request, cache_control: Optional[str] = Header(None)) -> bool:
+    """
+    Dependencia: `Cache-Control: no-cache` consulta la base de datos directamente
+
+    También mientras el cliente lee de la primaria tras una escritura, para
+    que vea sus propios cambios.
+    """
+    if cache_control and "no-cache" in cache_control.lower():
+        return True
+    return leer_de_primaria(request)
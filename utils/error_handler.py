@@ -3,6 +3,7 @@ Manejador de errores personalizado para la API
 """
 
 import logging
+import math
 from typing import Any, Dict, Optional
 
 from fastapi import HTTPException, status
@@ -111,6 +112,58 @@ class APIErrorHandler:
             status_code=status.HTTP_403_FORBIDDEN,
         )
 
+    @staticmethod
+    def _error_con_reintento(
+        error_type: str, message: str, retry_after: float, status_code: int
+    ) -> HTTPException:
+        """Error con Retry-After en segundos enteros (al menos 1)"""
+        segundos = max(1, math.ceil(retry_after))
+        error = APIErrorHandler.create_error_response(
+            error_type=error_type,
+            message=message,
+            details={"retry_after": segundos},
+            status_code=status_code,
+        )
+        error.headers = {"Retry-After": str(segundos)}
+        return error
+
+    @staticmethod
+    def rate_limit_error(
+        retry_after: float,
+        message: str = "Demasiadas peticiones, intente más tarde",
+    ) -> HTTPException:
+        """Error por exceder el límite de peticiones (con Retry-After)"""
+        return APIErrorHandler._error_con_reintento(
+            "RATE_LIMIT_ERROR",
+            message,
+            retry_after,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+    @staticmethod
+    def service_unavailable_error(
+        retry_after: float,
+        message: str = "Servidor saturado, intente más tarde",
+    ) -> HTTPException:
+        """Error por sobrecarga del servidor (con Retry-After)"""
+        return APIErrorHandler._error_con_reintento(
+            "SERVICE_UNAVAILABLE",
+            message,
+            retry_after,
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    @staticmethod
+    def timeout_error(
+        message: str = "La operación excedió el tiempo máximo permitido",
+    ) -> HTTPException:
+        """Error por una consulta cancelada al vencer su tiempo máximo"""
+        return APIErrorHandler.create_error_response(
+            error_type="TIMEOUT_ERROR",
+            message=message,
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        )
+
     @staticmethod
     def server_error(operation: str, original_error: str) -> HTTPException:
         """Error interno del servidor"""
@@ -0,0 +1,53 @@
+"""
+Filtro de Bloom en memoria para pruebas de pertenencia aproximadas
+"""
+
+import hashlib
+import math
+
+
+class FiltroBloom:
+    """
+    Conjunto aproximado sin falsos negativos
+
+    `contiene` puede responder True para un elemento que no se agregó (con
+    probabilidad cercana a `tasa_falsos_positivos` mientras no se superen
+    `capacidad` elementos), pero nunca False para uno agregado. No permite
+    eliminar: para descartar elementos se construye un filtro nuevo.
+    """
+
+    def __init__(self, capacidad: int, tasa_falsos_positivos: float = 0.001):
+        capacidad = max(1, capacidad)
+        self.capacidad = capacidad
+        self.bits = max(
+            8,
+            int(-capacidad * math.log(tasa_falsos_positivos) / (math.log(2) ** 2)),
+        )
+        self.funciones = max(1, round(self.bits / capacidad * math.log(2)))
+        self._arreglo = bytearray((self.bits + 7) // 8)
+        self.elementos = 0
+
+    def _hashes(self, elemento: str):
+        # Doble hash (Kirsch-Mitzenmacher): k posiciones a partir de un digest
+        digest = hashlib.blake2b(elemento.encode("utf-8"), digest_size=16).digest()
+        return (
+            int.from_bytes(digest[:8], "little"),
+            int.from_bytes(digest[8:], "little") | 1,
+        )
+
+    def agregar(self, elemento: str) -> None:
+        h1, h2 = self._hashes(elemento)
+        arreglo, bits = self._arreglo, self.bits
+        for i in range(self.funciones):
+            posicion = (h1 + i * h2) % bits
+            arreglo[posicion >> 3] |= 1 << (posicion & 7)
+        self.elementos += 1
+
+    def contiene(self, elemento: str) -> bool:
+        h1, h2 = self._hashes(elemento)
+        arreglo, bits = self._arreglo, self.bits
+        for i in range(self.funciones):
+            posicion = (h1 + i * h2) % bits
+            if not arreglo[posicion >> 3] & (1 << (posicion & 7)):
+                return False
+        return True
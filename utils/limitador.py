@@ -0,0 +1,57 @@
+"""
+Limitador de peticiones en memoria con el algoritmo de cubeta de fichas
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class LimitadorTokens:
+    """
+    Cubetas de fichas por clave (por ejemplo, por API key)
+
+    Cada cubeta se llena a `por_segundo` fichas por segundo hasta `capacidad`
+    y cada petición consume una ficha, así que se permiten ráfagas de hasta
+    `capacidad` peticiones con un promedio de `por_segundo`. Los límites son
+    por proceso: con N workers el límite efectivo es N veces mayor.
+    """
+
+    def __init__(self, max_claves: int = 10000):
+        self.max_claves = max(1, max_claves)
+        # clave -> [fichas disponibles, instante de la última recarga]
+        self._cubetas: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, clave: Hashable, capacidad: float, por_segundo: float) -> float:
+        """
+        Consumir una ficha de la cubeta de `clave`
+
+        Returns:
+            0 si se permite la petición; si no, los segundos que faltan para
+            tener una ficha disponible
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            cubeta = self._cubetas.get(clave)
+            if cubeta is None:
+                cubeta = [capacidad, ahora]
+                self._cubetas[clave] = cubeta
+                while len(self._cubetas) > self.max_claves:
+                    self._cubetas.popitem(last=False)
+            else:
+                self._cubetas.move_to_end(clave)
+                cubeta[0] = min(
+                    capacidad, cubeta[0] + (ahora - cubeta[1]) * por_segundo
+                )
+                cubeta[1] = ahora
+            if cubeta[0] >= 1:
+                cubeta[0] -= 1
+                return 0.0
+            return (1 - cubeta[0]) / por_segundo
+
+    def reiniciar(self, clave: Hashable) -> None:
+        """Olvidar la cubeta de una clave"""
+        with self._lock:
+            self._cubetas.pop(clave, None)
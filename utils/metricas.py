@@ -0,0 +1,241 @@
+"""
+Métricas HTTP por ruta en formato de exposición de Prometheus
+"""
+
+import asyncio
+import bisect
+import glob
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from utils.rutas import resolver_ruta
+
+logger = logging.getLogger(__name__)
+
+# Con varios workers de uvicorn cada uno vuelca sus métricas en este directorio
+# y /metrics las suma; vacío, /metrics muestra solo las del proceso que responde
+METRICAS_DIR = os.getenv("METRICAS_DIR", "")
+METRICAS_INTERVALO = float(os.getenv("METRICAS_INTERVALO", 5))
+METRICAS_PREFIJO = "hospital"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIN_RUTA = "<sin_ruta>"
+# Starlette agrega "; charset=utf-8" a las respuestas text/*
+TIPO_CONTENIDO = "text/plain; version=0.0.4"
+
+
+class MetricasHTTP:
+    """
+    Acumulados de las peticiones de este proceso
+
+    Solo se modifican desde el event loop (el middleware corre ahí aunque los
+    endpoints síncronos usen el pool de hilos), así que no necesitan locks.
+    Por cada (ruta, método, estado) se guarda [cantidad, suma de segundos,
+    conteo por bucket]; los buckets se acumulan al exponer.
+    """
+
+    def __init__(self):
+        self.peticiones: Dict[Tuple[str, str, str], list] = {}
+        self.en_curso: Dict[Tuple[str, str], int] = {}
+        self.inicio = time.time()
+
+    def empezar(self, ruta: str, metodo: str) -> None:
+        clave = (ruta, metodo)
+        self.en_curso[clave] = self.en_curso.get(clave, 0) + 1
+
+    def terminar(self, ruta: str, metodo: str, estado: int, segundos: float) -> None:
+        clave = (ruta, metodo)
+        self.en_curso[clave] -= 1
+        serie = self.peticiones.get((ruta, metodo, str(estado)))
+        if serie is None:
+            serie = [0, 0.0] + [0] * (len(BUCKETS) + 1)
+            self.peticiones[(ruta, metodo, str(estado))] = serie
+        serie[0] += 1
+        serie[1] += segundos
+        serie[2 + bisect.bisect_left(BUCKETS, segundos)] += 1
+
+    def instantanea(self) -> dict:
+        """Copia serializable de los acumulados"""
+        return {
+            "pid": os.getpid(),
+            "peticiones": [
+                [*clave, *serie] for clave, serie in self.peticiones.items()
+            ],
+            "en_curso": [[*clave, valor] for clave, valor in self.en_curso.items()],
+        }
+
+
+metricas = MetricasHTTP()
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _archivo_propio() -> str:
+    return os.path.join(METRICAS_DIR, f"metricas_{os.getpid()}.json")
+
+
+def _escribir(datos: dict) -> None:
+    temporal = _archivo_propio() + ".tmp"
+    with open(temporal, "w") as archivo:
+        json.dump(datos, archivo)
+    # Reemplazo atómico: los demás workers nunca leen un archivo a medias
+    os.replace(temporal, _archivo_propio())
+
+
+def _leer_instantaneas() -> List[dict]:
+    """Instantáneas de los otros workers (la propia se toma en vivo)"""
+    instantaneas = []
+    for ruta_archivo in glob.glob(os.path.join(METRICAS_DIR, "metricas_*.json")):
+        if ruta_archivo == _archivo_propio():
+            continue
+        try:
+            with open(ruta_archivo) as archivo:
+                instantaneas.append(json.load(archivo))
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer {ruta_archivo}: {str(e)}")
+    return instantaneas
+
+
+def _etiquetas(**valores) -> str:
+    partes = []
+    for nombre, valor in valores.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"')
+        partes.append(f'{nombre}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def exponer(instantaneas: List[dict]) -> str:
+    """Sumar las instantáneas y generar el texto de exposición de Prometheus"""
+    peticiones: Dict[tuple, list] = {}
+    en_curso: Dict[tuple, int] = {}
+    for instantanea in instantaneas:
+        for ruta, metodo, estado, *serie in instantanea["peticiones"]:
+            total = peticiones.setdefault((ruta, metodo, estado), [0] * len(serie))
+            for i, valor in enumerate(serie):
+                total[i] += valor
+        # Las peticiones en curso de un worker que terminó ya no existen
+        if instantanea["pid"] == os.getpid() or _proceso_vivo(instantanea["pid"]):
+            for ruta, metodo, valor in instantanea["en_curso"]:
+                en_curso[(ruta, metodo)] = en_curso.get((ruta, metodo), 0) + valor
+
+    nombre = f"{METRICAS_PREFIJO}_http_peticiones"
+    lineas = [
+        f"# HELP {nombre}_total Peticiones HTTP atendidas",
+        f"# TYPE {nombre}_total counter",
+    ]
+    for (ruta, metodo, estado), serie in sorted(peticiones.items()):
+        etiquetas = _etiquetas(ruta=ruta, metodo=metodo, estado=estado)
+        lineas.append(f"{nombre}_total{etiquetas} {serie[0]}")
+
+    lineas += [
+        f"# HELP {nombre}_en_curso Peticiones HTTP en curso",
+        f"# TYPE {nombre}_en_curso gauge",
+    ]
+    for (ruta, metodo), valor in sorted(en_curso.items()):
+        lineas.append(
+            f"{nombre}_en_curso{_etiquetas(ruta=ruta, metodo=metodo)} {valor}"
+        )
+
+    nombre = f"{METRICAS_PREFIJO}_http_duracion_segundos"
+    lineas += [
+        f"# HELP {nombre} Duración de las peticiones HTTP",
+        f"# TYPE {nombre} histogram",
+    ]
+    for (ruta, metodo, estado), serie in sorted(peticiones.items()):
+        base = dict(ruta=ruta, metodo=metodo, estado=estado)
+        acumulado = 0
+        for limite, cantidad in zip(BUCKETS + ("+Inf",), serie[2:]):
+            acumulado += cantidad
+            etiquetas = _etiquetas(**base, le=limite)
+            lineas.append(f"{nombre}_bucket{etiquetas} {acumulado}")
+        lineas.append(f"{nombre}_sum{_etiquetas(**base)} {serie[1]}")
+        lineas.append(f"{nombre}_count{_etiquetas(**base)} {serie[0]}")
+    return "\n".join(lineas) + "\n"
+
+
+def generar_metricas() -> str:
+    """Texto de /metrics: este proceso más los demás workers si hay METRICAS_DIR"""
+    instantaneas = [metricas.instantanea()]
+    if METRICAS_DIR:
+        instantaneas += _leer_instantaneas()
+    return exponer(instantaneas)
+
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP
+
+    Las etiquetas usan la plantilla de la ruta (/api/pacientes/{paciente_id}),
+    no la ruta recibida, para que la cantidad de series no crezca con los ids.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ruta, _ = resolver_ruta(scope)
+        plantilla = ruta.path if ruta is not None else SIN_RUTA
+        metodo = scope["method"]
+        estado = 500
+        metricas.empezar(plantilla, metodo)
+        inicio = time.perf_counter()
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            metricas.terminar(plantilla, metodo, estado, time.perf_counter() - inicio)
+
+
+_volcado: Optional[asyncio.Task] = None
+
+
+async def _volcar_periodicamente() -> None:
+    while True:
+        await asyncio.sleep(METRICAS_INTERVALO)
+        try:
+            # La instantánea se toma en el event loop; solo la escritura va al pool
+            await run_in_threadpool(_escribir, metricas.instantanea())
+        except Exception as e:
+            logger.error(f"No se pudieron volcar las métricas: {str(e)}")
+
+
+def iniciar_volcado() -> None:
+    """Volcar las métricas de este worker a METRICAS_DIR cada METRICAS_INTERVALO"""
+    global _volcado
+    if not METRICAS_DIR or _volcado is not None:
+        return
+    os.makedirs(METRICAS_DIR, exist_ok=True)
+    _volcado = asyncio.create_task(_volcar_periodicamente())
+
+
+async def detener_volcado() -> None:
+    """Detener el volcado y escribir los acumulados finales"""
+    global _volcado
+    if _volcado is None:
+        return
+    _volcado.cancel()
+    await asyncio.gather(_volcado, return_exceptions=True)
+    _volcado = None
+    _escribir(metricas.instantanea())
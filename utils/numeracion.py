@@ -0,0 +1,103 @@
+"""
+Generación de números consecutivos con secuencias de PostgreSQL
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import List
+
+from database.config import engine
+from sqlalchemy import text
+
+TAMANO_BLOQUE = int(os.getenv("NUMERACION_TAMANO_BLOQUE", 50))
+REINICIO_ANUAL = os.getenv("NUMERACION_REINICIO_ANUAL", "true").lower() == "true"
+
+
+class GeneradorNumeros:
+    """
+    Generador de números con prefijo respaldado por una secuencia de PostgreSQL
+
+    Cada proceso reserva bloques de números con un solo nextval (la secuencia
+    incrementa de a un bloque) y los entrega desde memoria, así que solo hay
+    una ida a la base de datos por bloque. Los números de un bloque que no se
+    alcanzan a usar antes de reiniciar el proceso quedan como huecos.
+
+    Con reinicio anual se usa una secuencia por año (seq_<nombre>_<año>) y el
+    formato es PREFIJO-AÑO-NNNNNN; sin reinicio, PREFIJO-NNNNNN.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        prefijo: str,
+        tamano_bloque: int = TAMANO_BLOQUE,
+        reinicio_anual: bool = REINICIO_ANUAL,
+    ):
+        self.nombre = nombre
+        self.prefijo = prefijo
+        self.tamano_bloque = max(1, tamano_bloque)
+        self.reinicio_anual = reinicio_anual
+        self._lock = threading.Lock()
+        self._año = None
+        self._siguiente = 0
+        self._fin_bloque = 0
+
+    def _nombre_secuencia(self, año: int) -> str:
+        if self.reinicio_anual:
+            return f"seq_{self.nombre}_{año}"
+        return f"seq_{self.nombre}"
+
+    def _reservar_bloque(self, año: int) -> None:
+        """Reservar el siguiente bloque de la secuencia (crea la secuencia si no existe)."""
+        secuencia = self._nombre_secuencia(año)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(
+                text(
+                    f"CREATE SEQUENCE IF NOT EXISTS {secuencia} "
+                    f"START WITH 1 INCREMENT BY {self.tamano_bloque}"
+                )
+            )
+            inicio = conn.execute(text(f"SELECT nextval('{secuencia}')")).scalar()
+            # El incremento real manda si la secuencia se creó con otro tamaño de bloque
+            incremento = conn.execute(
+                text(
+                    "SELECT increment_by FROM pg_sequences "
+                    "WHERE schemaname = current_schema() AND sequencename = :secuencia"
+                ),
+                {"secuencia": secuencia},
+            ).scalar()
+        self._año = año
+        self._siguiente = inicio
+        self._fin_bloque = inicio + (incremento or self.tamano_bloque)
+
+    def _formatear(self, año: int, numero: int) -> str:
+        if self.reinicio_anual:
+            return f"{self.prefijo}-{año}-{numero:06d}"
+        return f"{self.prefijo}-{numero:06d}"
+
+    def siguientes(self, cantidad: int) -> List[str]:
+        """Obtener varios números consecutivos del bloque actual y de los siguientes."""
+        numeros = []
+        with self._lock:
+            año = datetime.now().year
+            if self._año != año:
+                self._fin_bloque = self._siguiente = 0
+            while len(numeros) < cantidad:
+                if self._siguiente >= self._fin_bloque:
+                    self._reservar_bloque(año)
+                numeros.append(self._formatear(año, self._siguiente))
+                self._siguiente += 1
+        return numeros
+
+    def siguiente(self) -> str:
+        """Obtener el siguiente número."""
+        return self.siguientes(1)[0]
+
+
+numeros_factura = GeneradorNumeros(
+    "numero_factura", os.getenv("NUMERACION_FACTURA_PREFIJO", "FAC")
+)
+numeros_historial = GeneradorNumeros(
+    "numero_historial", os.getenv("NUMERACION_HISTORIAL_PREFIJO", "HC")
+)
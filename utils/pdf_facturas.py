@@ -0,0 +1,257 @@
+"""
+Generación de facturas en PDF con un pool de procesos y caché en disco
+"""
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+DIRECTORIO_CACHE = os.getenv(
+    "FACTURAS_PDF_DIR", os.path.join(tempfile.gettempdir(), "facturas_pdf")
+)
+PROCESOS = int(os.getenv("FACTURAS_PDF_PROCESOS", os.cpu_count() or 1))
+
+LINEAS_POR_PAGINA = 48
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def datos_para_pdf(factura) -> dict:
+    """
+    Extraer de una factura (con paciente y detalles cargados) los datos del PDF
+
+    El resultado es serializable, se envía al proceso que renderiza y su hash
+    es la clave de la caché.
+    """
+    paciente = factura.paciente
+    return {
+        "id": str(factura.id),
+        "numero_factura": factura.numero_factura,
+        "fecha_emision": factura.fecha_emision.strftime("%Y-%m-%d"),
+        "fecha_vencimiento": factura.fecha_vencimiento.strftime("%Y-%m-%d"),
+        "estado": factura.estado,
+        "paciente": f"{paciente.nombre} {paciente.apellido}" if paciente else "",
+        "email": paciente.email if paciente else "",
+        "direccion": (paciente.direccion or "") if paciente else "",
+        "detalles": [
+            {
+                "descripcion": d.descripcion,
+                "cantidad": str(d.cantidad),
+                "precio_unitario": str(d.precio_unitario),
+                "subtotal": str(d.subtotal),
+            }
+            for d in sorted(factura.detalles, key=lambda d: str(d.id))
+            if d.activo is not False
+        ],
+        "subtotal": str(factura.subtotal),
+        "impuestos": str(factura.impuestos or 0),
+        "total": str(factura.total),
+        "notas": factura.notas or "",
+        "fecha_actualizacion": str(
+            factura.fecha_actualizacion or factura.fecha_creacion
+        ),
+    }
+
+
+def clave_cache(datos: dict) -> str:
+    """Hash del contenido de la factura (incluye fecha_actualizacion)"""
+    contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _texto_pdf(texto: str) -> bytes:
+    """Codificar y escapar un texto para un literal de cadena PDF (WinAnsi)"""
+    crudo = texto.encode("cp1252", errors="replace")
+    return crudo.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _lineas_factura(datos: dict) -> List[Tuple[int, str]]:
+    """Líneas de texto de la factura como (tamaño de fuente, texto)"""
+    lineas = [
+        (16, f"Factura {datos['numero_factura']}"),
+        (10, ""),
+        (10, f"Fecha de emisión: {datos['fecha_emision']}"),
+        (10, f"Fecha de vencimiento: {datos['fecha_vencimiento']}"),
+        (10, f"Estado: {datos['estado']}"),
+        (10, ""),
+        (10, f"Paciente: {datos['paciente']}"),
+        (10, f"Email: {datos['email']}"),
+    ]
+    if datos["direccion"]:
+        lineas.append((10, f"Dirección: {datos['direccion']}"))
+    lineas += [
+        (10, ""),
+        (10, f"{'Descripción':<50} {'Cant.':>8} {'P. unit.':>12} {'Subtotal':>12}"),
+        (10, "-" * 85),
+    ]
+    for d in datos["detalles"]:
+        lineas.append(
+            (
+                10,
+                f"{d['descripcion'][:50]:<50} {d['cantidad']:>8} "
+                f"{d['precio_unitario']:>12} {d['subtotal']:>12}",
+            )
+        )
+    lineas += [
+        (10, "-" * 85),
+        (10, f"{'Subtotal:':>72} {datos['subtotal']:>12}"),
+        (10, f"{'Impuestos:':>72} {datos['impuestos']:>12}"),
+        (12, f"{'Total:':>60} {datos['total']:>12}"),
+    ]
+    if datos["notas"]:
+        lineas += [(10, ""), (10, f"Notas: {datos['notas']}")]
+    return lineas
+
+
+def renderizar_factura_pdf(datos: dict) -> bytes:
+    """
+    Renderizar una factura como PDF de texto (sin dependencias externas)
+
+    Se ejecuta en los procesos del pool: no debe tocar la base de datos.
+    """
+    lineas = _lineas_factura(datos)
+    paginas = [
+        lineas[i : i + LINEAS_POR_PAGINA]
+        for i in range(0, len(lineas), LINEAS_POR_PAGINA)
+    ]
+
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, se completa al final
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+    ]
+    ids_paginas = []
+    for pagina in paginas:
+        contenido = [b"BT", b"50 800 Td", b"14 TL"]
+        for tamano, texto in pagina:
+            contenido.append(b"/F1 %d Tf (%s) Tj T*" % (tamano, _texto_pdf(texto)))
+        contenido.append(b"ET")
+        flujo = b"\n".join(contenido)
+        objetos.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(flujo), flujo))
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objetos)
+        )
+        ids_paginas.append(len(objetos))
+    objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in ids_paginas),
+        len(ids_paginas),
+    )
+
+    salida = bytearray(b"%PDF-1.4\n")
+    posiciones = []
+    for numero, objeto in enumerate(objetos, start=1):
+        posiciones.append(len(salida))
+        salida += b"%d 0 obj\n%s\nendobj\n" % (numero, objeto)
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicion in posiciones:
+        salida += b"%010d 00000 n \n" % posicion
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objetos) + 1,
+        inicio_xref,
+    )
+    return bytes(salida)
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PROCESOS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def cerrar_pool() -> None:
+    """Cerrar el pool de procesos (al apagar la aplicación)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _ruta_cache(clave: str) -> str:
+    return os.path.join(DIRECTORIO_CACHE, f"{clave}.pdf")
+
+
+def _guardar_en_cache(clave: str, contenido: bytes) -> str:
+    """Guardar el PDF en la caché de forma atómica"""
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    ruta = _ruta_cache(clave)
+    fd, temporal = tempfile.mkstemp(dir=DIRECTORIO_CACHE, suffix=".tmp")
+    with os.fdopen(fd, "wb") as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+async def obtener_pdf_factura(datos: dict) -> Tuple[str, str]:
+    """
+    Obtener la ruta del PDF de una factura, renderizándolo si no está en caché
+
+    Returns:
+        Tupla con (ruta del archivo, clave de caché usada como ETag)
+    """
+    clave = clave_cache(datos)
+    ruta = _ruta_cache(clave)
+    if not os.path.exists(ruta):
+        loop = asyncio.get_running_loop()
+        contenido = await loop.run_in_executor(
+            _obtener_pool(), renderizar_factura_pdf, datos
+        )
+        ruta = await loop.run_in_executor(None, _guardar_en_cache, clave, contenido)
+    return ruta, clave
+
+
+class _SalidaZip:
+    """Destino de escritura para zipfile que acumula los bytes por entregar"""
+
+    def __init__(self):
+        self.pendiente = bytearray()
+
+    def write(self, datos) -> int:
+        self.pendiente += datos
+        return len(datos)
+
+    def flush(self) -> None:
+        pass
+
+    def extraer(self) -> bytes:
+        datos = bytes(self.pendiente)
+        self.pendiente.clear()
+        return datos
+
+
+async def _pdf_con_datos(datos: dict) -> Tuple[dict, str]:
+    ruta, _ = await obtener_pdf_factura(datos)
+    return datos, ruta
+
+
+async def generar_zip_facturas(lista_datos: List[dict]) -> AsyncIterator[bytes]:
+    """
+    Renderizar varias facturas en paralelo y entregarlas como un ZIP en streaming
+
+    Cada PDF se agrega al ZIP apenas termina de generarse.
+    """
+    salida = _SalidaZip()
+    tareas = [asyncio.ensure_future(_pdf_con_datos(datos)) for datos in lista_datos]
+    try:
+        with zipfile.ZipFile(
+            salida, mode="w", compression=zipfile.ZIP_STORED
+        ) as archivo_zip:
+            for completada in asyncio.as_completed(tareas):
+                datos, ruta = await completada
+                with open(ruta, "rb") as pdf:
+                    archivo_zip.writestr(f"{datos['numero_factura']}.pdf", pdf.read())
+                yield salida.extraer()
+        yield salida.extraer()
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
@@ -0,0 +1,62 @@
+"""
+Resolución de la ruta (plantilla) de una petición fuera del router
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from starlette.routing import Match, Mount
+
+
+def _clave(path: str) -> Tuple[str, ...]:
+    return tuple(path.strip("/").split("/")[:2])
+
+
+class ResolutorRutas:
+    """
+    Busca la ruta que atenderá una petición sin recorrer todas las rutas
+
+    Las rutas se agrupan por sus dos primeros segmentos ("/api/pacientes");
+    solo se prueban las del grupo de la petición y las que tienen parámetros
+    en esos segmentos, respetando el orden de registro (el mismo que usa el
+    router).
+    """
+
+    def __init__(self, rutas: list):
+        self._grupos: Dict[Tuple[str, ...], List[Tuple[int, object]]] = {}
+        self._comodines: List[Tuple[int, object]] = []
+        for indice, ruta in enumerate(rutas):
+            path = getattr(ruta, "path", None)
+            # Un Mount atiende también las rutas debajo de su prefijo
+            clave = None if path is None or isinstance(ruta, Mount) else _clave(path)
+            if clave is None or any("{" in segmento for segmento in clave):
+                self._comodines.append((indice, ruta))
+            else:
+                self._grupos.setdefault(clave, []).append((indice, ruta))
+
+    def resolver(self, scope) -> Tuple[Optional[object], dict]:
+        """(ruta, scope hijo con path_params) o (None, {}) si ninguna coincide"""
+        candidatas = self._grupos.get(_clave(scope["path"]), [])
+        if self._comodines:
+            candidatas = sorted(candidatas + self._comodines, key=lambda c: c[0])
+        for _, ruta in candidatas:
+            coincidencia, hijo = ruta.matches(scope)
+            if coincidencia == Match.FULL:
+                return ruta, hijo
+        return None, {}
+
+
+def resolver_ruta(scope) -> Tuple[Optional[object], dict]:
+    """Ruta de la aplicación del scope que coincide con la petición"""
+    # Varios middlewares la consultan: se resuelve una vez por petición
+    resuelta = scope.get("ruta_resuelta")
+    if resuelta is not None and resuelta[0] == scope["path"]:
+        return resuelta[1], resuelta[2]
+    estado = scope["app"].state
+    resolutor = getattr(estado, "resolutor_rutas", None)
+    if resolutor is None:
+        # Las rutas ya están registradas cuando llega la primera petición
+        resolutor = ResolutorRutas(scope["app"].router.routes)
+        estado.resolutor_rutas = resolutor
+    ruta, hijo = resolutor.resolver(scope)
+    scope["ruta_resuelta"] = (scope["path"], ruta, hijo)
+    return ruta, hijo
@@ -0,0 +1,50 @@
+"""
+Tareas periódicas en segundo plano
+"""
+
+import asyncio
+import logging
+from typing import Callable, Dict
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+_tareas: Dict[str, asyncio.Task] = {}
+
+
+def programar_tarea(nombre: str, intervalo_segundos: float, funcion: Callable) -> None:
+    """
+    Ejecutar una función síncrona cada cierto intervalo
+
+    La función corre en el pool de hilos para no bloquear el event loop.
+    Un intervalo menor o igual a cero deshabilita la tarea.
+
+    Args:
+        nombre: Identificador de la tarea
+        intervalo_segundos: Segundos entre ejecuciones
+        funcion: Función sin argumentos a ejecutar
+    """
+    if intervalo_segundos <= 0 or nombre in _tareas:
+        return
+
+    async def _bucle():
+        while True:
+            await asyncio.sleep(intervalo_segundos)
+            try:
+                await run_in_threadpool(funcion)
+            except Exception as e:
+                logger.error(
+                    f"Error en tarea programada {nombre}: {str(e)}", exc_info=True
+                )
+
+    _tareas[nombre] = asyncio.create_task(_bucle())
+    logger.info(f"Tarea programada '{nombre}' cada {intervalo_segundos} segundos")
+
+
+async def detener_tareas() -> None:
+    """Cancelar todas las tareas programadas"""
+    for tarea in _tareas.values():
+        tarea.cancel()
+    await asyncio.gather(*_tareas.values(), return_exceptions=True)
+    _tareas.clear()
@@ -0,0 +1,114 @@
+"""
+Cabecera Server-Timing con el desglose del tiempo de cada petición
+
+Las herramientas de desarrollo del navegador muestran la cabecera sin nada
+extra: tiempo en la base de datos y cantidad de consultas, espera por una
+conexión del pool, código de la aplicación y serialización de la respuesta.
+"""
+
+import functools
+import inspect
+import os
+import time
+from typing import Callable
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+from utils.consultas_sql import EstadisticasConsultas, consultas_peticion
+
+# true: en todas las respuestas; si no, solo cuando la petición trae la
+# cabecera de depuración y SERVER_TIMING_CABECERA lo permite
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+SERVER_TIMING_CABECERA = os.getenv("SERVER_TIMING_CABECERA", "true").lower() == "true"
+CABECERA_DEPURACION = "x-debug-timing"
+
+
+def _activo(request: Request) -> bool:
+    if SERVER_TIMING:
+        return True
+    return SERVER_TIMING_CABECERA and request.headers.get(CABECERA_DEPURACION) in (
+        "1",
+        "true",
+    )
+
+
+def _medir_endpoint(llamada: Callable) -> Callable:
+    """Anotar cuándo termina el endpoint, antes de serializar la respuesta"""
+
+    def anotar():
+        estadisticas = consultas_peticion.get()
+        if estadisticas is not None:
+            estadisticas.fin_endpoint = time.perf_counter()
+
+    if inspect.iscoroutinefunction(llamada):
+
+        @functools.wraps(llamada)
+        async def envoltura(*args, **kwargs):
+            try:
+                return await llamada(*args, **kwargs)
+            finally:
+                anotar()
+
+    else:
+
+        @functools.wraps(llamada)
+        def envoltura(*args, **kwargs):
+            try:
+                return llamada(*args, **kwargs)
+            finally:
+                anotar()
+
+    return envoltura
+
+
+def cabecera_server_timing(
+    estadisticas: EstadisticasConsultas, inicio: float, fin: float
+) -> str:
+    """
+    Valor de Server-Timing
+
+    app es el tiempo hasta que termina el endpoint (dependencias incluidas)
+    sin contar la base de datos ni la espera del pool; serialize es lo que
+    tarda después en armarse la respuesta.
+    """
+    fin_endpoint = estadisticas.fin_endpoint or fin
+    db = estadisticas.segundos * 1000
+    pool = estadisticas.espera_pool * 1000
+    app = max(0.0, (fin_endpoint - inicio) * 1000 - db - pool)
+    serializacion = max(0.0, (fin - fin_endpoint) * 1000)
+    return (
+        f"db;dur={db:.1f}, "
+        f'db_count;desc="{estadisticas.cantidad}", '
+        f"pool_wait;dur={pool:.1f}, "
+        f"app;dur={app:.1f}, "
+        f"serialize;dur={serializacion:.1f}"
+    )
+
+
+class RutaMedida(APIRoute):
+    """
+    APIRoute que agrega Server-Timing a sus respuestas
+
+    Usa las estadísticas de ConsultasMiddleware; sin ese middleware las
+    respuestas salen sin la cabecera.
+    """
+
+    def get_route_handler(self) -> Callable:
+        if not getattr(self.dependant.call, "_medido", False):
+            self.dependant.call = _medir_endpoint(self.dependant.call)
+            self.dependant.call._medido = True
+        manejador = super().get_route_handler()
+
+        async def manejador_medido(request: Request):
+            estadisticas = consultas_peticion.get()
+            if estadisticas is None or not _activo(request):
+                return await manejador(request)
+            inicio = time.perf_counter()
+            estadisticas.fin_endpoint = None
+            respuesta = await manejador(request)
+            respuesta.headers["Server-Timing"] = cabecera_server_timing(
+                estadisticas, inicio, time.perf_counter()
+            )
+            return respuesta
+
+        return manejador_medido
@@ -0,0 +1,191 @@
+"""
+Límite de duración de las sentencias SQL por tipo de ruta y cancelación de la
+consulta en curso cuando el cliente se desconecta
+"""
+
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from utils.consultas_sql import (
+    ConsultaCanceladaError,
+    EstadisticasConsultas,
+    consultas_peticion,
+)
+from utils.error_handler import APIErrorHandler
+from utils.rutas import resolver_ruta
+
+logger = logging.getLogger(__name__)
+
+# statement_timeout en milisegundos por clase de ruta; 0 deja el del servidor
+TIMEOUTS_SQL = {
+    "lectura": int(os.getenv("SQL_TIMEOUT_LECTURA_MS", 2000)),
+    "busqueda": int(os.getenv("SQL_TIMEOUT_BUSQUEDA_MS", 5000)),
+    "escritura": int(os.getenv("SQL_TIMEOUT_ESCRITURA_MS", 10000)),
+    "exportacion": int(os.getenv("SQL_TIMEOUT_EXPORTACION_MS", 30000)),
+}
+METODOS_LECTURA = ("GET", "HEAD")
+# SQLSTATE query_canceled: statement_timeout o cancelación (pg_cancel_backend)
+SQLSTATE_CANCELADA = "57014"
+
+
+def timeout_sql(clase: str):
+    """
+    Asignar a un endpoint una clase de timeout distinta de la que le toca
+
+    Se aplica debajo del decorador de la ruta, por ejemplo
+    @timeout_sql("exportacion") en las descargas de reportes.
+    """
+    if clase not in TIMEOUTS_SQL:
+        raise ValueError(f"Clase de timeout inválida: {clase}")
+
+    def decorador(endpoint):
+        endpoint.clase_timeout_sql = clase
+        return endpoint
+
+    return decorador
+
+
+def clase_de_ruta(ruta, metodo: str) -> str:
+    """Clase de timeout: la del decorador, o según el método y la ruta"""
+    clase = getattr(getattr(ruta, "endpoint", None), "clase_timeout_sql", None)
+    if clase is not None:
+        return clase
+    if metodo not in METODOS_LECTURA:
+        return "escritura"
+    if ruta is not None and "/buscar/" in ruta.path:
+        return "busqueda"
+    return "lectura"
+
+
+def cancelar_consultas(estadisticas: EstadisticasConsultas) -> None:
+    """Impedir más sentencias en la petición y cancelar la que esté corriendo"""
+    estadisticas.cancelada = True
+    conexion = estadisticas.conexion_en_curso
+    cancelar = getattr(conexion, "cancel", None)
+    if cancelar is None:
+        return
+    try:
+        # psycopg2 envía la cancelación por otra conexión; es seguro entre hilos
+        cancelar()
+    except Exception as e:
+        logger.warning(f"No se pudo cancelar la consulta: {str(e)}")
+
+
+def consulta_cancelada(error: Optional[BaseException]) -> bool:
+    """
+    Si el error, o alguno de los que lo causaron, es una sentencia cancelada
+
+    Recorre la cadena de excepciones porque los endpoints convierten cualquier
+    error en un HTTPException 500 con su texto.
+    """
+    vistos = set()
+    while error is not None and id(error) not in vistos:
+        vistos.add(id(error))
+        if isinstance(error, ConsultaCanceladaError):
+            return True
+        # El error del driver, directo o envuelto por SQLAlchemy (.orig)
+        for candidato in (error, getattr(error, "orig", None)):
+            if getattr(candidato, "pgcode", None) == SQLSTATE_CANCELADA:
+                return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def error_consulta_cancelada(request: Request) -> HTTPException:
+    """
+    Error para una petición con una consulta cancelada, sin el texto del SQL
+
+    503 si se canceló porque el cliente se desconectó (nadie la va a leer) y
+    504 si venció el statement_timeout de su clase.
+    """
+    estadisticas = getattr(request.state, "consultas", None)
+    if estadisticas is not None and estadisticas.cancelada:
+        return APIErrorHandler.service_unavailable_error(
+            0, "La petición se canceló porque el cliente se desconectó"
+        )
+    logger.warning(f"statement_timeout vencido en {request.method} {request.url.path}")
+    return APIErrorHandler.timeout_error(
+        "La consulta excedió el tiempo máximo de la operación"
+    )
+
+
+class _Receptor:
+    """
+    Lee los mensajes del cliente en segundo plano para notar la desconexión
+
+    La aplicación recibe los mismos mensajes desde la cola; una vez
+    desconectado el cliente, cada lectura devuelve http.disconnect.
+    """
+
+    def __init__(self, receive):
+        self._receive = receive
+        self._cola: asyncio.Queue = asyncio.Queue()
+        self._desconexion: Optional[dict] = None
+
+    async def vigilar(self, al_desconectar) -> None:
+        while True:
+            mensaje = await self._receive()
+            await self._cola.put(mensaje)
+            if mensaje["type"] == "http.disconnect":
+                self._desconexion = mensaje
+                al_desconectar()
+                return
+
+    async def receive(self) -> dict:
+        if self._desconexion is not None and self._cola.empty():
+            return self._desconexion
+        return await self._cola.get()
+
+
+class TimeoutSqlMiddleware:
+    """
+    Middleware ASGI que fija el statement_timeout de la petición y, en las
+    lecturas, cancela la consulta si el cliente se va antes de la respuesta
+
+    Va dentro de ConsultasMiddleware. Los límites rigen hasta enviar la
+    respuesta: las tareas en segundo plano posteriores no los heredan.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        estadisticas = consultas_peticion.get()
+        if scope["type"] != "http" or estadisticas is None:
+            await self.app(scope, receive, send)
+            return
+
+        ruta, _ = resolver_ruta(scope)
+        estadisticas.timeout_ms = TIMEOUTS_SQL[clase_de_ruta(ruta, scope["method"])]
+        respondida = False
+
+        async def enviar(mensaje):
+            nonlocal respondida
+            await send(mensaje)
+            if mensaje["type"] == "http.response.body" and not mensaje.get(
+                "more_body", False
+            ):
+                respondida = True
+                estadisticas.timeout_ms = None
+
+        if scope["method"] not in METODOS_LECTURA:
+            await self.app(scope, receive, enviar)
+            return
+
+        def al_desconectar():
+            if not respondida:
+                logger.info(
+                    f"Cliente desconectado en {scope['method']} {scope['path']}, "
+                    "se cancelan sus consultas"
+                )
+                cancelar_consultas(estadisticas)
+
+        receptor = _Receptor(receive)
+        vigilancia = asyncio.create_task(receptor.vigilar(al_desconectar))
+        try:
+            await self.app(scope, receptor.receive, enviar)
+        finally:
+            vigilancia.cancel()